@@ -0,0 +1,146 @@
+import os
+import re
+import sqlite3 # Persistent storage of the answers.
+import threading
+import time
+import numpy as np # Vectorized cosine similarity for the semantic lookup.
+from bm25_index import tokenize # Same word tokens as the keyword search.
+
+# Helper function: Normalizes a question, so that trivial differences (case, spaces, punctuation at the end) do not matter:
+def normalize_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question.strip().lower()).rstrip('?!. ')
+
+# Helper function: Tokens of a question that contain digits (years, figures, "co2", "scope 1"). Questions that differ in them
+# ask for different facts, even if their embeddings are almost identical (e.g. "CO2-Emissionen 2022" and "... 2023"):
+def key_terms(question: str) -> frozenset:
+    return frozenset(token for token in tokenize(question) if any(character.isdigit() for character in token))
+
+# This class stores answers of /chat per PDF and question. A question is found again if it is identical after
+# normalization (exact tier) or if its embedding is very similar to that of a stored question (semantic tier):
+class AnswerCache:
+    # Constructor for the AnswerCache class.
+    def __init__(self, db_path: str, max_entries: int = 50000, similarity_threshold: float = 0.97):
+        self.db_path = db_path # Path to the SQLite file.
+        self.max_entries = max_entries # Upper limit for the number of stored answers.
+        self.similarity_threshold = similarity_threshold # Minimum cosine similarity for the semantic tier (None = disabled).
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock() # The connection is shared between the request threads.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "pdf_id TEXT NOT NULL, "
+            "question TEXT NOT NULL, "
+            "embedding BLOB, "
+            "answer TEXT NOT NULL, "
+            "last_used REAL NOT NULL, "
+            "PRIMARY KEY (pdf_id, question))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used)")
+        self._conn.commit()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get_exact(self, pdf_id: str, question: str) -> str:
+        """
+        Sucht eine Antwort zur (normalisierten) Frage. Gibt None zurück, wenn keine gespeichert ist.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE pdf_id = ? AND question = ?",
+                (pdf_id, normalize_question(question))
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(pdf_id, normalize_question(question))
+            self.exact_hits += 1
+            return row[0]
+
+    def get_similar(self, pdf_id: str, question: str, question_embedding: list[float]) -> str:
+        """
+        Sucht die Antwort zur ähnlichsten gespeicherten Frage derselben PDF. Nur Fragen mit denselben
+        Zahlen-Token (key_terms, z. B. Jahreszahlen) kommen in Frage.
+        Gibt None zurück, wenn keine Frage die Ähnlichkeitsschwelle erreicht (wird als Fehlzugriff gezählt).
+        """
+        with self._lock:
+            if self.similarity_threshold is None or question_embedding is None:
+                self.misses += 1
+                return None
+            terms = key_terms(question)
+            rows = [
+                row for row in self._conn.execute(
+                    "SELECT question, embedding, answer FROM answers WHERE pdf_id = ? AND embedding IS NOT NULL",
+                    (pdf_id,)
+                ).fetchall()
+                if key_terms(row[0]) == terms
+            ]
+            if not rows:
+                self.misses += 1
+                return None
+
+            stored = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            query = np.asarray(question_embedding, dtype=np.float32)
+            similarities = stored @ query / (np.linalg.norm(stored, axis=1) * np.linalg.norm(query) + 1e-12)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            self._touch(pdf_id, rows[best][0])
+            self.semantic_hits += 1
+            return rows[best][2]
+
+    def put(self, pdf_id: str, question: str, answer: str, question_embedding: list[float] = None):
+        """
+        Speichert eine Antwort und entfernt die am längsten nicht genutzten Einträge,
+        wenn mehr als max_entries Antworten gespeichert sind.
+        """
+        blob = np.asarray(question_embedding, dtype=np.float32).tobytes() if question_embedding is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (pdf_id, question, embedding, answer, last_used) VALUES (?, ?, ?, ?, ?)",
+                (pdf_id, normalize_question(question), blob, answer, time.time())
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def _touch(self, pdf_id: str, normalized_question: str):
+        self._conn.execute(
+            "UPDATE answers SET last_used = ? WHERE pdf_id = ? AND question = ?",
+            (time.time(), pdf_id, normalized_question)
+        )
+        self._conn.commit()
+
+    def invalidate(self, pdf_id: str):
+        """
+        Entfernt alle Antworten zu einer PDF (z. B. wenn sie gelöscht wird).
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE pdf_id = ?", (pdf_id,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Gibt Kennzahlen des Caches zurück (Anzahl, Treffer je Stufe, Trefferquote).
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            # A lookup ends either with an exact hit, a semantic hit or a miss.
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0
+            }
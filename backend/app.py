@@ -3,22 +3,37 @@
 #import sys
 #sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
-import re
+import time # For measuring the startup, the duration of requests and processing stages.
+# Start of the import, for the startup profile in /ready:
+APP_IMPORT_STARTED = time.perf_counter()
+
+import csv # For the CSV export of /extractions.
+import io
 import json
 import traceback # For detailed stack traces (error information).
-from flask import Flask, request, jsonify, send_from_directory # Flask core modules for web applications.
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context # Flask core modules for web applications.
 from dotenv import load_dotenv # Loading environment variables from .env file.
 import os # For interaction with the operating system.
-import uuid # For generating unique IDs.
+import threading # For protecting shared state between request threads.
 from flask_cors import CORS # Enables Cross-Origin Resource Sharing, important for frontend communication.
 import shutil # For deleting directories and their contents.
-import chromadb # Persistent vector database.
 
 # Imports of local modules:
-from pdf_processing import read_pdf, split_text_into_sections # Functions for PDF processing.
-from llm_service import get_llm_response # Function for communication with the LLM.
-from langchain_community.vectorstores import Chroma # LangChain integration for ChromaDB.
+from pdf_processing import PdfReadError, content_pdf_id, iter_pdf_pages, iter_chunks, iter_chunk_batches # Functions for PDF processing.
+from llm_service import get_client, get_llm_response, stream_llm_response, ERROR_ANSWER # Functions for communication with the LLM.
 from embeddingWrapper import SAIAEmbeddings # Wrapper for the SAIA Embedding Service.
+from answer_cache import AnswerCache # Persistent cache for answers of /chat.
+from bm25_index import BM25Index, is_keyword_query, reciprocal_rank_fusion # Keyword search for hybrid retrieval.
+from bounded_cache import BoundedLRUCache # Thread-safe LRU cache with size limits.
+from compact_vector_store import CompactVectorStore, VECTOR_DTYPES # Memory-mapped alternative to the per-PDF ChromaDB collections.
+from context_builder import build_context, count_tokens # Token-aware packing of the retrieved chunks.
+from embedding_cache import EmbeddingCache # Persistent storage of already calculated embeddings.
+from extraction import EXTRACTION_FIELDS, extract_fields_map_reduce, extract_fields_retrieval # Extraction of the JSON fields.
+from extraction_store import ExtractionStore # Queryable store of the extracted fields of all PDFs.
+from vector_store_writer import compact_store_path, open_vector_store_writer # Batchwise writing of the Vector Stores.
+from job_queue import JobQueue, JOB_QUEUED, JOB_RUNNING # Background worker pool for PDF processing.
+import metrics # Latency histograms and counters, exported in the Prometheus format under /metrics.
+from metrics import BYTES, HTTP_REQUEST_SECONDS, STAGE_SECONDS, TOKENS, TimedIterator, timed
 
 # Initialize Flask application:
 app = Flask(__name__)
@@ -32,13 +47,110 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 VECTOR_DB_DIR = "chroma_db_data"
 os.makedirs(VECTOR_DB_DIR, exist_ok=True)
 
+COMPACT_VECTOR_DIR = 'compact_vectors'
+
 JSON_OUTPUT_FOLDER = 'extracted_jsons'
 os.makedirs(JSON_OUTPUT_FOLDER, exist_ok=True)
 
-# Defines the maximum character length of the context sent to the LLM:
-# The GWDG LLM (based on Llama 3.1 8B) has approx. 8000 tokens. 1 token is approx. 4 characters.
-# 8000 * 4 = 32000 characters. 28000 characters leave a buffer.
-MAX_CONTEXT_CHAR_LIMIT = 28000
+JOBS_FOLDER = 'ingest_jobs'
+
+BM25_INDEX_FOLDER = 'bm25_indexes'
+os.makedirs(BM25_INDEX_FOLDER, exist_ok=True)
+
+ANSWER_CACHE_DIR = 'answer_cache'
+
+EMBEDDING_CACHE_DIR = 'embedding_cache'
+
+EXTRACTION_STORE_DIR = 'extraction_store'
+
+# Embedding configuration: maximum number of stored embeddings, texts per request and parallel requests:
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# Concurrent query embeddings (e.g. of many /chat requests) are collected for this many milliseconds and sent together (0 = off):
+EMBEDDING_QUERY_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_QUERY_BATCH_WAIT_MS", "5"))
+
+# Maximum number of PDFs that are processed in parallel in the background:
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "2"))
+
+# Finished jobs can be queried via /jobs/<job_id> for this many hours, at most JOB_MAX_FINISHED of them are kept:
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+
+# Number of processes used to extract the pages of a single PDF in parallel (1 = serial):
+PDF_READ_WORKERS = int(os.getenv("PDF_READ_WORKERS", "1"))
+
+# Number of chunks that are embedded and stored together while the rest of the PDF is still being read,
+# and the number of batches that may be read ahead (bounds the memory of an upload independently of its length):
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_PREFETCH_BATCHES = int(os.getenv("INGEST_PREFETCH_BATCHES", "2"))
+
+# Token budget of the context of each chunk group in the map-reduce extraction, counted with tiktoken:
+# The GWDG LLM (based on Llama 3.1 8B) has approx. 8000 tokens. The rest is left for the system prompt
+# with the JSON schema (approx. 200 tokens) and the JSON answer with all fields (up to approx. 2500 tokens).
+EXTRACTION_CONTEXT_TOKEN_BUDGET = int(os.getenv("EXTRACTION_CONTEXT_TOKEN_BUDGET", "5000"))
+
+# Token budget of the context in /chat, counted with tiktoken. The rest of the approx. 8000 tokens
+# is left for the system prompt, the question and the answer:
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+# Chunk size and overlap in tokens (well below the 4096-token input limit of e5-mistral-7b-instruct):
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+
+# Maximum number of concurrent LLM requests for the JSON extraction of a single PDF:
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "4"))
+
+# Extraction mode: "map_reduce" evaluates the whole document in chunk groups,
+# "retrieval" only evaluates the top EXTRACTION_TOP_K chunks per field (constant cost per document).
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "map_reduce")
+EXTRACTION_TOP_K = int(os.getenv("EXTRACTION_TOP_K", "4"))
+# Repetitions of extraction requests without valid JSON. If a request still fails, the job fails and no JSON file is written:
+EXTRACTION_RETRIES = int(os.getenv("EXTRACTION_RETRIES", "1"))
+
+# Limits of the in-memory Vector Store cache. VECTOR_STORE_CACHE_MAX_MB only applies to the "compact" backend,
+# whose vectors are mapped by the process. A cached ChromaDB wrapper only references a collection whose vectors
+# are held by the ChromaDB client, so with the "chroma" backend the cache is only bounded by the number of entries:
+VECTOR_STORE_CACHE_MAX_ENTRIES = int(os.getenv("VECTOR_STORE_CACHE_MAX_ENTRIES", "64"))
+VECTOR_STORE_CACHE_MAX_MB = int(os.getenv("VECTOR_STORE_CACHE_MAX_MB", "1024"))
+VECTOR_STORE_CACHE_TTL_SECONDS = float(os.getenv("VECTOR_STORE_CACHE_TTL_SECONDS", "3600"))
+
+# Backend of the per-PDF Vector Stores: "chroma" stores one ChromaDB collection per PDF, "compact" one memory-mapped
+# NumPy matrix (float16 or int8) with a JSON sidecar file per PDF, searched in-process (see compact_vector_store.py):
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+COMPACT_VECTOR_DTYPE = os.getenv("COMPACT_VECTOR_DTYPE", "float16")
+
+if VECTOR_STORE_BACKEND not in ("chroma", "compact") or COMPACT_VECTOR_DTYPE not in VECTOR_DTYPES:
+    print(f"FEHLER: Ungültige Konfiguration VECTOR_STORE_BACKEND='{VECTOR_STORE_BACKEND}' / COMPACT_VECTOR_DTYPE='{COMPACT_VECTOR_DTYPE}'.")
+    raise ValueError("VECTOR_STORE_BACKEND must be 'chroma' or 'compact', COMPACT_VECTOR_DTYPE 'float16' or 'int8'.")
+
+# Shared collection that additionally contains the chunks of all PDFs (with 'pdf_id' metadata) for cross-document search:
+SHARED_COLLECTION_ENABLED = os.getenv("SHARED_COLLECTION_ENABLED", "true").lower() == "true"
+SHARED_COLLECTION_NAME = "all_documents"
+# Maximum number of results of /search per request (parameter k):
+SEARCH_MAX_RESULTS = 100
+
+# Retrieval for /chat: "vector" uses only the semantic search, "hybrid" combines it with the BM25 keyword search.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Number of candidates per search method before the fusion:
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+
+# Answer cache for /chat: maximum number of answers and minimum similarity of two questions for the semantic tier (0 = only exact matches):
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "50000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97"))
+
+# Page size of /extractions (default and maximum, the export formats are not paginated):
+EXTRACTIONS_PAGE_SIZE = 50
+EXTRACTIONS_MAX_PAGE_SIZE = 1000
+
+# Number of Vector Stores of the most recently uploaded PDFs that are loaded at startup:
+VECTOR_STORE_WARMUP_COUNT = int(os.getenv("VECTOR_STORE_WARMUP_COUNT", "16"))
+# Load the heavy dependencies in a background thread after the start (otherwise on first use, the app is ready immediately):
+BACKGROUND_WARMUP = os.getenv("BACKGROUND_WARMUP", "true").lower() == "true"
+
+# Maximum number of concurrent requests to the expensive routes (upload, chat, search). Further requests get 503:
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "24"))
+LIMITED_ENDPOINTS = {"upload_pdf", "chat_with_pdf", "chat_with_pdf_stream", "search_documents"}
 
 # Load API key and initialize embedding service:
 load_dotenv()
@@ -49,80 +161,350 @@ if not api_key:
     raise ValueError("API Key nicht gefunden! Bitte in .env setzen.")
 
 
-embeddings = SAIAEmbeddings(api_key)
+# Identical text chunks (e.g. from re-uploaded reports) reuse their stored embeddings:
+embeddings = SAIAEmbeddings(
+    api_key,
+    cache=EmbeddingCache(os.path.join(EMBEDDING_CACHE_DIR, "embeddings.sqlite3"), max_entries=EMBEDDING_CACHE_MAX_ENTRIES),
+    batch_size=EMBEDDING_BATCH_SIZE,
+    max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+    query_batch_wait=EMBEDDING_QUERY_BATCH_WAIT_MS / 1000
+)
+
+# Helper function: Memory footprint of a cached Vector Store. Only the compact backend holds its vectors itself,
+# a ChromaDB wrapper is counted as 0 bytes (see VECTOR_STORE_CACHE_MAX_MB):
+def estimate_vector_store_bytes(vector_store) -> int:
+    if isinstance(vector_store, CompactVectorStore):
+        return vector_store.nbytes
+    return 0
+
+# In-memory cache for Vector Stores, bounded by number of entries, estimated memory and age:
+vector_stores_cache = BoundedLRUCache(
+    max_entries=VECTOR_STORE_CACHE_MAX_ENTRIES,
+    max_bytes=VECTOR_STORE_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=VECTOR_STORE_CACHE_TTL_SECONDS,
+    size_fn=estimate_vector_store_bytes
+)
 
-# In-memory cache for Vector Stores:
-vector_stores_cache = {}
+# One ChromaDB client for the whole process, shared by all requests and jobs. ChromaDB and LangChain's Chroma class
+# are imported on first use (or by the warm-up thread), because importing them takes most of the startup time:
+_chroma_client = None
+_chroma_client_lock = threading.Lock()
+
+def get_chroma_client():
+    """
+    Gibt den gemeinsamen ChromaDB-Client zurück und erstellt ihn beim ersten Aufruf.
+    """
+    global _chroma_client
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            import chromadb # Persistent vector database.
+            _chroma_client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
+        return _chroma_client
+
+# In-memory cache for the BM25 indexes of the PDFs:
+bm25_indexes_cache = BoundedLRUCache(max_entries=VECTOR_STORE_CACHE_MAX_ENTRIES, ttl_seconds=VECTOR_STORE_CACHE_TTL_SECONDS)
+
+# Answers of /chat are deterministic (temperature 0.0) for the same question and PDF and can therefore be reused:
+answer_cache = AnswerCache(
+    os.path.join(ANSWER_CACHE_DIR, "answers.sqlite3"),
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY or None
+)
+
+# The extracted fields of all PDFs in one indexed table, queried by /extractions. JSON files of earlier uploads
+# that are not stored yet are imported at startup:
+extraction_store = ExtractionStore(os.path.join(EXTRACTION_STORE_DIR, "extractions.sqlite3"))
+imported_extractions = extraction_store.import_folder(JSON_OUTPUT_FOLDER)
+if imported_extractions:
+    print(f"{imported_extractions} JSON-Dateien in den Extraktions-Speicher übernommen.")
+
+# Job queue for processing uploaded PDFs in the background:
+job_queue = JobQueue(JOBS_FOLDER, max_workers=INGEST_MAX_WORKERS,
+                     retention_seconds=JOB_RETENTION_HOURS * 3600, max_finished_jobs=JOB_MAX_FINISHED)
+
+# Jobs that are currently processing a PDF, by PDF ID (so that identical uploads share one job):
+active_ingest_jobs = {}
+active_ingest_jobs_lock = threading.Lock()
 
 # Helper function: Load or create Vector Store:
-def get_or_create_vector_store(pdf_id: str, text_chunks: list[str] = None):
+def get_or_create_vector_store(pdf_id: str):
     """
     Lädt eine ChromaDB-Sammlung aus dem Cache oder von der Festplatte.
-    Erstellt sie neu, wenn sie nicht existiert oder leer ist und text_chunks bereitgestellt werden.
+    Neue Vector Stores werden beim Upload mit open_ingest_writer() batchweise geschrieben.
 
     Args:
         pdf_id (str): Die eindeutige ID der PDF (und somit der ChromaDB-Sammlung).
-        text_chunks (list[str], optional): Eine Liste von Text-Chunks, die zum Erstellen
-                                            einer neuen Sammlung verwendet werden, falls diese nicht existiert.
-                                            Standardmäßig None.
 
     Returns:
-        Chroma: Die geladene oder neu erstellte ChromaDB-Instanz.
+        Chroma | CompactVectorStore: Die geladene Instanz (je nach VECTOR_STORE_BACKEND).
 
     Raises:
-        Exception: Wenn der Vector Store nicht gefunden/erstellt werden kann oder Text-Chunks fehlen.
+        Exception: Wenn der Vector Store nicht gefunden werden kann.
     """
 
     # 1. Check the in-memory cache first:
-    if pdf_id in vector_stores_cache:
-        return vector_stores_cache[pdf_id]
+    cached_vector_store = vector_stores_cache.get(pdf_id)
+    if cached_vector_store is not None:
+        return cached_vector_store
+
+    if VECTOR_STORE_BACKEND == "compact":
+        vector_store = get_or_create_compact_store(pdf_id)
+        vector_stores_cache.put(pdf_id, vector_store)
+        return vector_store
+
+    from langchain_community.vectorstores import Chroma # LangChain integration for ChromaDB.
+    chroma_client = get_chroma_client()
 
     vector_store_from_disk = None
-    # 2. Try to load the collection from disk:
+    # 2. Try to load the collection from disk (direct lookup by name instead of listing all collections):
     try:
-        client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
-        collection_exists = any(c.name == pdf_id for c in client.list_collections())
+        try:
+            collection = chroma_client.get_collection(name=pdf_id)
+        except Exception:
+            collection = None # The collection does not exist.
 
-        if collection_exists:
+        # If the collection exists but is empty, it is treated as non-existent.
+        if collection is not None and collection.count() > 0:
             vector_store_from_disk = Chroma(
-                persist_directory=VECTOR_DB_DIR,
+                client=chroma_client,
                 embedding_function=embeddings,
                 collection_name=pdf_id
             )
-            if vector_store_from_disk._collection.count() > 0:
-                vector_stores_cache[pdf_id] = vector_store_from_disk
-                return vector_store_from_disk
-            else:
-                # If the collection exists but is empty, it is treated as non-existent.
-                pass
-        else:
-            pass
+            vector_stores_cache.put(pdf_id, vector_store_from_disk)
+            return vector_store_from_disk
 
     except Exception as e:
         # Log a warning if loading from disk fails (e.g., corrupted data).
         print(f"WARNUNG: Konnte ChromaDB collection '{pdf_id}' nicht von Festplatte laden (oder sie ist beschädigt): {e}")
 
-    # 3. If not in cache and not successfully loaded from disk (or empty on disk), try to create it:
-    if text_chunks:
-        try:
-            # LangChain's Chroma.from_texts handles the creation and addition of embeddings.
-            vector_store = Chroma.from_texts(
-                texts=text_chunks,
-                embedding=embeddings,
-                collection_name=pdf_id,
-                persist_directory=VECTOR_DB_DIR
-            )
-            vector_stores_cache[pdf_id] = vector_store # Add the newly created collection to the cache.
-            return vector_store
-        except Exception as inner_e:
-            # Log an error and re-raise the exception if creation fails.
-            print(f"FEHLER: Fehler beim Erstellen/Aktualisieren neuer ChromaDB collection '{pdf_id}': {inner_e}")
-            traceback.print_exc()
-            raise Exception(f"Failed to create/update vector store: {inner_e}")
+    # 3. Not in the cache and not (completely) on disk:
+    print(f"FEHLER: Vector store für '{pdf_id}' nicht gefunden.")
+    raise Exception(f"Vector store for '{pdf_id}' not found.")
+
+# Helper function: Load or create the compact Vector Store of a PDF (VECTOR_STORE_BACKEND = "compact"):
+def get_or_create_compact_store(pdf_id: str) -> CompactVectorStore:
+    """
+    Lädt den kompakten Vector Store einer PDF von der Festplatte.
+    PDFs, die noch mit ChromaDB verarbeitet wurden, werden einmalig aus ihrer Sammlung übernommen
+    (mit den gespeicherten Embeddings, also ohne neue Embedding-Anfragen).
+
+    Raises:
+        Exception: Wenn der Vector Store nicht gefunden werden kann.
+    """
+    path = compact_store_path(COMPACT_VECTOR_DIR, pdf_id)
+    if CompactVectorStore.exists(path):
+        return CompactVectorStore.load(path, embeddings)
+
+    try:
+        collection = get_chroma_client().get_collection(name=pdf_id)
+        stored = collection.get(include=["documents", "embeddings", "metadatas"])
+    except Exception:
+        stored = None # No ChromaDB collection for this PDF either.
+    if stored is not None and len(stored["documents"]) > 0:
+        vector_store = CompactVectorStore.create(
+            path, stored["documents"], embeddings, [metadata or {} for metadata in stored["metadatas"]],
+            dtype=COMPACT_VECTOR_DTYPE, vectors=stored["embeddings"]
+        )
+        print(f"ChromaDB collection '{pdf_id}' in kompakten Vector Store übernommen ({len(vector_store)} Chunks, {COMPACT_VECTOR_DTYPE}).")
+        return vector_store
+
+    print(f"FEHLER: Vector store für '{pdf_id}' nicht gefunden.")
+    raise Exception(f"Vector store for '{pdf_id}' not found.")
+
+# Helper function: Opens the writer that stores the chunks of an upload batch by batch in the configured backend:
+def open_ingest_writer(pdf_id: str):
+    """
+    Öffnet einen Writer für den Vector Store einer PDF (siehe vector_store_writer.py). Eine vorhandene,
+    eventuell nur teilweise geschriebene Sammlung wird dabei ersetzt.
+    """
+    vector_stores_cache.pop(pdf_id) # The cached instance would no longer match the rewritten store.
+    answer_cache.invalidate(pdf_id) # Answers of a previous (e.g. failed or partial) run are based on the old chunks.
+    return open_vector_store_writer(
+        VECTOR_STORE_BACKEND, pdf_id, embeddings,
+        chroma_client=get_chroma_client() if VECTOR_STORE_BACKEND != "compact" else None,
+        compact_dir=COMPACT_VECTOR_DIR,
+        compact_dtype=COMPACT_VECTOR_DTYPE
+    )
+
+# Helper function: Path of the BM25 index of a PDF. The ID comes from the client and is reduced to a file name,
+# so that it cannot point outside of BM25_INDEX_FOLDER:
+def bm25_index_path(pdf_id: str) -> str:
+    filename = os.path.basename(pdf_id)
+    if filename in ("", ".", ".."):
+        raise ValueError(f"Invalid PDF ID: '{pdf_id}'.")
+    return os.path.join(BM25_INDEX_FOLDER, filename.replace('.pdf', '.json'))
+
+# Helper function: Load or create the BM25 index of a PDF:
+def get_bm25_index(pdf_id: str, vector_store=None) -> BM25Index:
+    """
+    Lädt den BM25-Index einer PDF aus dem Cache oder von der Festplatte. Für PDFs, die vor
+    Einführung des Index hochgeladen wurden, wird er aus den Chunks im Vector Store erstellt.
+
+    Raises:
+        Exception: Wenn kein Index existiert und kein Vector Store übergeben wurde.
+    """
+    bm25_index = bm25_indexes_cache.get(pdf_id)
+    if bm25_index is not None:
+        return bm25_index
+
+    index_path = bm25_index_path(pdf_id)
+    if os.path.exists(index_path):
+        bm25_index = BM25Index.load(index_path)
+    elif isinstance(vector_store, CompactVectorStore):
+        bm25_index = BM25Index(vector_store.texts)
+        bm25_index.save(index_path)
+    elif vector_store is not None:
+        bm25_index = BM25Index(vector_store._collection.get(include=["documents"])["documents"])
+        bm25_index.save(index_path)
     else:
-        print(f"FEHLER: Vector store für '{pdf_id}' nicht gefunden und keine Text-Chunks zum Erstellen bereitgestellt.")
-        raise Exception(f"Vector store for '{pdf_id}' not found and no text chunks provided to create it.")
+        raise Exception(f"BM25 index for '{pdf_id}' not found.")
+
+    bm25_indexes_cache.put(pdf_id, bm25_index)
+    return bm25_index
+
+# Helper function: Adds the chunks of a PDF to the shared collection of all documents:
+def add_to_shared_collection(pdf_id: str, text_chunks: list[str], metadatas: list[dict] = None,
+                             start_index: int = 0, vectors: list[list[float]] = None):
+    """
+    Speichert die Chunks einer PDF zusätzlich in der gemeinsamen Sammlung aller Dokumente.
+    Die IDs sind deterministisch (pdf_id:Index), wiederholtes Hinzufügen überschreibt daher nur.
+    Die Embeddings kommen in der Regel aus dem Embedding-Cache und kosten keinen weiteren API-Aufruf.
+
+    Args:
+        pdf_id (str): Die eindeutige ID der PDF.
+        text_chunks (list[str]): Die Text-Chunks der PDF (oder ein Batch davon).
+        metadatas (list[dict], optional): Zusätzliche Metadaten pro Chunk (z. B. Seitennummer).
+        start_index (int): Index des ersten Chunks, wenn die Chunks batchweise hinzugefügt werden.
+        vectors (list[list[float]], optional): Bereits berechnete Embeddings der Chunks.
+    """
+    chroma_client = get_chroma_client()
+    collection = chroma_client.get_or_create_collection(name=SHARED_COLLECTION_NAME)
+    chunk_embeddings = vectors if vectors is not None else embeddings.embed_documents(text_chunks)
+    chunk_metadatas = [
+        {**(metadatas[i] if metadatas else {}), "pdf_id": pdf_id, "chunk_index": start_index + i}
+        for i in range(len(text_chunks))
+    ]
+    ids = [f"{pdf_id}:{start_index + i}" for i in range(len(text_chunks))]
+
+    # ChromaDB limits the number of entries per call.
+    batch_size = chroma_client.get_max_batch_size()
+    for start in range(0, len(text_chunks), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            ids=ids[start:end],
+            documents=text_chunks[start:end],
+            embeddings=chunk_embeddings[start:end],
+            metadatas=chunk_metadatas[start:end]
+        )
+
+# Helper function: Removes the chunks of a PDF from the shared collection (e.g. after an interrupted upload):
+def remove_from_shared_collection(pdf_id: str):
+    try:
+        get_chroma_client().get_or_create_collection(name=SHARED_COLLECTION_NAME).delete(where={"pdf_id": pdf_id})
+    except Exception as e:
+        print(f"WARNUNG: Chunks von '{pdf_id}' konnten nicht aus der gemeinsamen Sammlung entfernt werden: {e}")
+
+# Helper function: Preloads the Vector Stores of the most recently uploaded PDFs into the cache:
+def warm_up_vector_stores(limit: int):
+    """
+    Lädt die ChromaDB-Sammlungen der zuletzt hochgeladenen PDFs in den In-Memory-Cache,
+    damit die ersten Chat-Anfragen nach einem Neustart nicht auf das Laden warten müssen.
+
+    Args:
+        limit (int): Maximale Anzahl der vorzuladenden Sammlungen.
+    """
+    try:
+        pdf_ids = sorted(
+            (f for f in os.listdir(UPLOAD_FOLDER) if f.endswith('.pdf')),
+            key=lambda f: os.path.getmtime(os.path.join(UPLOAD_FOLDER, f)),
+            reverse=True
+        )[:limit]
+    except Exception as e:
+        print(f"WARNUNG: Vorladen der Vector Stores fehlgeschlagen: {e}")
+        return
+
+    loaded = 0
+    for pdf_id in pdf_ids:
+        try:
+            get_or_create_vector_store(pdf_id)
+            loaded += 1
+        except Exception:
+            pass # PDFs without a (complete) collection are skipped.
+    print(f"{loaded} Vector Stores vorgeladen.")
+
+# Startup profile: duration of the import of app.py and of the warm-up steps in seconds (shown by /ready):
+startup_profile = {}
+# Set when the warm-up has loaded the heavy dependencies, until then /ready answers with 503:
+ready_event = threading.Event()
+
+# Helper function for the warm-up: imports the PDF reader and LangChain's Chroma class (only needed for the "chroma" backend):
+def _import_ingest_dependencies():
+    import PyPDF2 # Only imported here, the modules stay loaded for the first upload.
+    if VECTOR_STORE_BACKEND == "chroma":
+        from langchain_community.vectorstores import Chroma
+
+# Background warm-up: Loads the heavy dependencies after the start, so that the first requests do not have to wait for them:
+def warm_up(vector_store_count: int):
+    """
+    Lädt ChromaDB, den LLM-Client, den PDF-Reader und den Tokenizer im Hintergrund und meldet das Backend
+    danach als bereit (/ready). Anschließend werden die Vector Stores der zuletzt hochgeladenen PDFs vorgeladen.
+
+    Args:
+        vector_store_count (int): Maximale Anzahl der vorzuladenden Vector Stores.
+    """
+    steps = [
+        ("llm_client", get_client),
+        ("ingest_dependencies", _import_ingest_dependencies),
+        ("tokenizer", lambda: count_tokens("warm-up"))
+    ]
+    # With the compact backend, ChromaDB is only needed for the shared collection of /search.
+    if VECTOR_STORE_BACKEND == "chroma" or SHARED_COLLECTION_ENABLED:
+        steps.insert(0, ("chromadb", get_chroma_client))
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # The dependency is loaded again on first use, where the error is reported to the request.
+            print(f"WARNUNG: Warm-up-Schritt '{name}' fehlgeschlagen: {e}")
+        startup_profile[name] = round(time.perf_counter() - started, 3)
+    ready_event.set()
+    print(f"Backend bereit nach {time.perf_counter() - APP_IMPORT_STARTED:.2f} s (ab Import).")
+
+    if vector_store_count > 0:
+        started = time.perf_counter()
+        warm_up_vector_stores(vector_store_count)
+        startup_profile["vector_stores"] = round(time.perf_counter() - started, 3)
+
+# Concurrency limit for the expensive routes:
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    if "request_started" in g:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_started,
+            endpoint=request.endpoint or "unknown", method=request.method, status=response.status_code
+        )
+    return response
+
+@app.before_request
+def acquire_request_slot():
+    if request.endpoint in LIMITED_ENDPOINTS:
+        # Wait briefly for a free slot, then reject instead of queueing requests without limit.
+        if not request_slots.acquire(timeout=5):
+            return jsonify({"error": "Server is busy, please try again shortly."}), 503 # (Service Unavailable)
+        g.holds_request_slot = True
 
+# Runs when the request context ends, for streaming responses only after the last event was sent:
+@app.teardown_request
+def release_request_slot(exception=None):
+    if g.pop("holds_request_slot", False):
+        request_slots.release()
 
 # API Routes:
 
@@ -136,7 +518,147 @@ def serve_pdf(filename):
 def download_json(filename):
     return send_from_directory(JSON_OUTPUT_FOLDER, filename, as_attachment=True)
 
-# Route for uploading and processing PDF files:
+# Processing steps of an upload job (used for the progress display in the frontend):
+INGEST_STAGES = ["read_and_split", "embed", "extract_json"]
+
+# Background job: Runs the complete processing pipeline for an uploaded PDF:
+def process_pdf(job_id: str, unique_filename: str, file_path: str) -> dict:
+    """
+    Verarbeitet eine gespeicherte PDF im Hintergrund: Text lesen, in Chunks aufteilen,
+    einbetten und die JSON-Daten mit dem LLM extrahieren.
+
+    Args:
+        job_id (str): Die ID des Jobs, dessen Fortschritt aktualisiert wird.
+        unique_filename (str): Die eindeutige ID der PDF (und somit der ChromaDB-Sammlung).
+        file_path (str): Der Pfad zur gespeicherten PDF-Datei.
+
+    Returns:
+        dict: Die URLs zur PDF- und JSON-Datei.
+
+    Raises:
+        Exception: Wenn ein Verarbeitungsschritt fehlschlägt.
+    """
+    # 1. - 3. Read the PDF page by page and split it into token-based chunks. The chunks are embedded and stored in batches
+    # while the next pages are read in the background, so that only the current batches are held in memory.
+    job_queue.set_stage(job_id, "read_and_split")
+    pages = TimedIterator(iter_pdf_pages(file_path, max_workers=PDF_READ_WORKERS), "read_pdf")
+    chunks = TimedIterator(iter_chunks(pages, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS))
+    text_chunks = [] # Input of the map-reduce extraction.
+    bm25_index = BM25Index([])
+    store_seconds = 0.0 # Embedding requests (also measured as "embed_documents") and writing of the Vector Store.
+    bm25_seconds = 0.0
+    shared_enabled = SHARED_COLLECTION_ENABLED
+    try:
+        writer = open_ingest_writer(unique_filename)
+    except Exception as e:
+        print(f"Error handling vector store for {unique_filename}: {e}")
+        os.remove(file_path)
+        raise Exception(f"Failed to process PDF for search: {str(e)}")
+    try:
+        for batch in iter_chunk_batches(chunks, INGEST_BATCH_SIZE, prefetch=INGEST_PREFETCH_BATCHES):
+            if not text_chunks:
+                job_queue.set_stage(job_id, "embed")
+            batch_texts = [chunk["text"] for chunk in batch]
+            # Page and character offsets of each chunk, e.g. for citations and filtering in /search:
+            batch_metadatas = [{"page": chunk["page"], "start": chunk["start"], "end": chunk["end"]} for chunk in batch]
+            started = time.perf_counter()
+            batch_vectors = writer.add(batch_texts, batch_metadatas)
+            store_seconds += time.perf_counter() - started
+
+            if shared_enabled:
+                try:
+                    add_to_shared_collection(unique_filename, batch_texts, batch_metadatas,
+                                             start_index=len(text_chunks), vectors=batch_vectors)
+                except Exception as e:
+                    # The PDF can still be used for chat, only the cross-document search is missing it.
+                    print(f"WARNUNG: PDF '{unique_filename}' konnte nicht zur gemeinsamen Sammlung hinzugefügt werden: {e}")
+                    traceback.print_exc()
+                    remove_from_shared_collection(unique_filename)
+                    shared_enabled = False
+
+            started = time.perf_counter()
+            bm25_index.add(batch_texts)
+            bm25_seconds += time.perf_counter() - started
+            TOKENS.inc(sum(chunk["tokens"] for chunk in batch), kind="chunk")
+            text_chunks.extend(batch_texts)
+        vector_store = writer.finish() if text_chunks else None
+    except PdfReadError as e:
+        print(f"FEHLER: Ein Fehler ist aufgetreten beim Lesen der PDF '{file_path}': {e}")
+        writer.abort()
+        if shared_enabled:
+            remove_from_shared_collection(unique_filename)
+        os.remove(file_path) # Delete the file if no content could be read.
+        raise Exception("Could not read content from PDF")
+    except Exception as e:
+        print(f"Error handling vector store for {unique_filename}: {e}")
+        writer.abort()
+        if shared_enabled:
+            remove_from_shared_collection(unique_filename)
+        os.remove(file_path)
+        raise Exception(f"Failed to process PDF for search: {str(e)}")
+    if vector_store is None:
+        writer.abort()
+        os.remove(file_path) # Delete the file if no usable chunks could be created.
+        raise Exception("Could not process PDF content into usable chunks.")
+    # Reading and splitting are interleaved: the splitting time is the total time minus the time spent reading.
+    STAGE_SECONDS.observe(chunks.seconds - pages.seconds, stage="split_text")
+    STAGE_SECONDS.observe(store_seconds, stage="store_vectors")
+    STAGE_SECONDS.observe(bm25_seconds, stage="build_bm25_index")
+    vector_stores_cache.put(unique_filename, vector_store)
+    answer_cache.invalidate(unique_filename) # Answers cached while the store was still being written.
+    print(f"PDF '{file_path}' in {len(text_chunks)} Chunks aufgeteilt.")
+    print(f"PDF content embedded and stored in {VECTOR_STORE_BACKEND} vector store '{unique_filename}' with {len(text_chunks)} chunks.")
+    if shared_enabled:
+        print(f"{len(text_chunks)} Chunks von '{unique_filename}' zur gemeinsamen Sammlung '{SHARED_COLLECTION_NAME}' hinzugefügt.")
+
+    # Save the keyword index for the hybrid search in /chat:
+    bm25_index.save(bm25_index_path(unique_filename))
+    bm25_indexes_cache.put(unique_filename, bm25_index)
+
+    # 4. Generate JSON data using the LLM: The requests run concurrently and are merged field by field.
+    job_queue.set_stage(job_id, "extract_json")
+    with timed("extract_fields"):
+        if EXTRACTION_MODE == "retrieval":
+            extracted_fields = extract_fields_retrieval(vector_store, k=EXTRACTION_TOP_K, max_workers=EXTRACTION_MAX_WORKERS,
+                                                        retries=EXTRACTION_RETRIES)
+        else:
+            extracted_fields = extract_fields_map_reduce(text_chunks, EXTRACTION_CONTEXT_TOKEN_BUDGET, max_workers=EXTRACTION_MAX_WORKERS,
+                                                         retries=EXTRACTION_RETRIES)
+    json_string = json.dumps(extracted_fields, ensure_ascii=False, indent=2)
+
+    # 5. Save the JSON data to a file. The file is written under a temporary name and renamed at the end, because an
+    # existing JSON file marks the PDF as completely processed (see upload_pdf):
+    json_output_path = os.path.join(JSON_OUTPUT_FOLDER, unique_filename.replace('.pdf', '.json'))
+    try:
+        with open(json_output_path + '.part', 'w', encoding='utf-8') as f:
+            f.write(json_string)
+        os.replace(json_output_path + '.part', json_output_path)
+    except Exception as e:
+        print(f"Fehler beim Speichern der JSON-Datei: {e}")
+        traceback.print_exc()
+
+    # 6. Store the fields for /extractions. The JSON file stays available, even if the fields do not match the schema:
+    try:
+        extraction_store.put(unique_filename, extracted_fields)
+    except ValueError as e:
+        print(f"WARNUNG: Extrahierte Felder von '{unique_filename}' entsprechen nicht dem Schema: {e}")
+
+    return {
+        "pdf_url": f"http://localhost:5000/static_pdfs/{unique_filename}",
+        "json_url": f"http://localhost:5000/static_jsons/{unique_filename.replace('.pdf', '.json')}",
+        "pdf_id": unique_filename
+    }
+
+# Background job: Processes an uploaded PDF and afterwards releases its entry in active_ingest_jobs (also after an error):
+def run_ingest_job(job_id: str, unique_filename: str, file_path: str) -> dict:
+    try:
+        return process_pdf(job_id, unique_filename, file_path)
+    finally:
+        with active_ingest_jobs_lock:
+            if active_ingest_jobs.get(unique_filename) == job_id:
+                del active_ingest_jobs[unique_filename]
+
+# Route for uploading PDF files. The processing runs as a background job:
 @app.route('/upload_pdf', methods=['POST'])
 def upload_pdf():
     print("Received PDF upload request.")
@@ -153,99 +675,299 @@ def upload_pdf():
     if not pdf_file.filename.lower().endswith('.pdf'):
         return jsonify({"error": "Invalid file type. Only PDF allowed."}), 400
 
-    # 4. Process the uploaded file (if all checks pass).
+    # 4. Save the uploaded file and hand it over to the job queue (if all checks pass).
     if pdf_file:
-        file_extension = os.path.splitext(pdf_file.filename)[1] # Extract the file extension.
-        unique_filename = str(uuid.uuid4()) + file_extension # Generate a unique filename with UUID.
+        file_bytes = pdf_file.read()
+        BYTES.inc(len(file_bytes), kind="pdf_upload")
+        # The filename is derived from the hash of the content, so identical files always get the same ID.
+        unique_filename = content_pdf_id(file_bytes)
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename) # Create the full path for saving.
+        json_output_path = os.path.join(JSON_OUTPUT_FOLDER, unique_filename.replace('.pdf', '.json'))
+
+        response_data = {
+            "filename": pdf_file.filename,
+            "pdf_id": unique_filename,
+            "pdf_url": f"http://localhost:5000/static_pdfs/{unique_filename}",
+            "json_url": f"http://localhost:5000/static_jsons/{unique_filename.replace('.pdf', '.json')}"
+        }
 
         try:
-            pdf_file.save(file_path) # Save the uploaded file temporarily.
-            print(f"PDF saved to {file_path}")
+            with active_ingest_jobs_lock:
+                # 5. The same file is already being processed: Return the running job.
+                job_id = active_ingest_jobs.get(unique_filename)
+                job = job_queue.get(job_id) if job_id else None
+                if job and job["status"] in (JOB_QUEUED, JOB_RUNNING):
+                    print(f"PDF '{unique_filename}' wird bereits verarbeitet (Job '{job_id}').")
+                    return jsonify({
+                        **response_data,
+                        "message": "PDF is already being processed",
+                        "job_id": job_id,
+                        "status_url": f"http://localhost:5000/jobs/{job_id}"
+                    }), 202 # (Accepted)
 
-            full_pdf_text = read_pdf(file_path) # 5. Read the entire text from the PDF.
-            if not full_pdf_text:
-                os.remove(file_path) # Delete the file if no content could be read.
-                return jsonify({"error": "Could not read content from PDF"}), 500 # (Internal Server Error)
+                # 6. The same file was already processed completely: Return the existing results.
+                if os.path.exists(file_path) and os.path.exists(json_output_path):
+                    print(f"PDF '{unique_filename}' wurde bereits verarbeitet.")
+                    return jsonify({
+                        **response_data,
+                        "message": "PDF already processed",
+                        "job_id": None,
+                        "status_url": None
+                    }), 200
 
-            text_chunks = split_text_into_sections(full_pdf_text) # 6. Split the text into chunks.
-            if not text_chunks:
-                os.remove(file_path) # Delete the file if no usable chunks could be created.
-                return jsonify({"error": "Could not process PDF content into usable chunks."}), 500
+                with open(file_path, 'wb') as f:
+                    f.write(file_bytes) # Save the uploaded file.
+                print(f"PDF saved to {file_path}")
 
-            try:
-                # 7. Create or load the Vector Store for the PDF ID with the generated chunks.
-                vector_store = get_or_create_vector_store(unique_filename, text_chunks) # Calls helper function.
-                print(f"PDF content embedded and stored in ChromaDB collection '{unique_filename}' with {len(text_chunks)} chunks.") 
-            except Exception as e:
-                print(f"Error handling ChromaDB for {unique_filename}: {e}")
-                traceback.print_exc()
-                os.remove(file_path)
-                return jsonify({"error": f"Failed to process PDF for search: {str(e)}"}), 500
-
-            # 8. prepare the JSON schema for the LLM response:
-            json_fields_prompt = (
-                "Extrahiere die folgenden Informationen aus dem bereitgestellten Text. "
-                "Gib die Ergebnisse im folgenden JSON-Format zurück:\n\n"
-                '{\n'
-                '  "name": "",\n'
-                '  "CO2": "",\n'
-                '  "NOX": "",\n'
-                '  "Number_of_Electric_Vehicles": "",\n'
-                '  "Impact": "",\n'
-                '  "Risks": "",\n'
-                '  "Opportunities": "",\n'
-                '  "Strategy": "",\n'
-                '  "Actions": "",\n'
-                '  "Adopted_policies": "",\n'
-                '  "Targets": ""\n'
-                '}\n\n'
-                "Fülle alle Felder basierend auf dem folgenden Kontext so vollständig wie möglich aus."
-            )
+                job_id = job_queue.submit(run_ingest_job, unique_filename, file_path, stages=INGEST_STAGES)
+                active_ingest_jobs[unique_filename] = job_id
 
-            # 9. Generate JSON data using the LLM based on the PDF content.
-            llm_json_response = get_llm_response(
-                user_question="Erzeuge JSON-Daten gemäß obigem Schema.",
-                system_prompt=json_fields_prompt,
-                context=full_pdf_text
+            # 7. Return immediately with the PDF ID and the URL for polling the job status:
+            return jsonify({
+                **response_data,
+                "message": "PDF uploaded, processing started",
+                "job_id": job_id,
+                "status_url": f"http://localhost:5000/jobs/{job_id}"
+            }), 202 # (Accepted)
+
+        except Exception as e:
+            print(f"Server error during PDF upload: {e}")
+            traceback.print_exc()
+            return jsonify({"error": f"Server error during PDF upload: {str(e)}"}), 500
+
+# Route for searching across all uploaded PDFs with a single query on the shared collection:
+@app.route('/search', methods=['POST'])
+def search_documents():
+    print("Received search request.")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    query = data.get('query')
+    k = data.get('k', 10) # Number of results.
+    pdf_ids = data.get('pdf_ids') # Optional: only search in these PDFs.
+    where = data.get('where') # Optional: additional ChromaDB metadata filter, e.g. {"page": 3}.
+
+    # Invalid input of the client is answered with 400 instead of failing inside ChromaDB:
+    if not query or not isinstance(query, str):
+        return jsonify({"error": "Missing 'query'"}), 400
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= SEARCH_MAX_RESULTS:
+        return jsonify({"error": f"'k' must be an integer between 1 and {SEARCH_MAX_RESULTS}"}), 400
+    if pdf_ids is not None and (not isinstance(pdf_ids, list) or not all(isinstance(pdf_id, str) for pdf_id in pdf_ids)):
+        return jsonify({"error": "'pdf_ids' must be a list of strings"}), 400
+    if where is not None and not isinstance(where, dict):
+        return jsonify({"error": "'where' must be an object"}), 400
+    if not SHARED_COLLECTION_ENABLED:
+        return jsonify({"error": "Cross-document search is disabled."}), 404
+
+    # Combine the filters:
+    filters = []
+    if pdf_ids:
+        filters.append({"pdf_id": {"$in": pdf_ids}})
+    if where:
+        filters.append(where)
+    where_filter = None
+    if len(filters) == 1:
+        where_filter = filters[0]
+    elif len(filters) > 1:
+        where_filter = {"$and": filters}
+    if where_filter is not None:
+        from chromadb.api.types import validate_where # Same check that ChromaDB runs before the query.
+        try:
+            validate_where(where_filter)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid filter: {str(e)}"}), 400
+
+    try:
+        collection = get_chroma_client().get_or_create_collection(name=SHARED_COLLECTION_NAME)
+        # Like LangChain's similarity_search, the span contains the embedding of the query.
+        with timed("similarity_search"):
+            results = collection.query(
+                query_embeddings=[embeddings.embed_query(query)],
+                n_results=k,
+                where=where_filter,
+                include=["documents", "metadatas", "distances"]
             )
+    except Exception as e:
+        print(f"Fehler bei der dokumentübergreifenden Suche: {e}")
+        traceback.print_exc()
+        return jsonify({"error": f"Search failed: {str(e)}"}), 500
+
+    # ChromaDB returns one result list per query embedding, here there is only one.
+    hits = [
+        {"pdf_id": metadata.get("pdf_id"), "metadata": metadata, "text": document, "distance": distance}
+        for document, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0])
+    ]
+    return jsonify({"query": query, "results": hits}), 200
+
+# Route for querying the extracted fields of all PDFs at once, with filters, pagination and export:
+@app.route('/extractions', methods=['GET'])
+def list_extractions():
+    """
+    Query-Parameter:
+        <Feld> (z. B. CO2=Scope 1): Das Feld muss den Text enthalten (ohne Beachtung der Groß-/Kleinschreibung).
+        has (z. B. has=CO2,NOX): Diese Felder dürfen nicht leer sein.
+        pdf_id: Nur diese PDFs (mehrfach angebbar).
+        sort, order: Sortierung nach extracted_at, name oder pdf_id, asc oder desc (Standard: extracted_at desc).
+        limit, offset: Seitengröße (höchstens EXTRACTIONS_MAX_PAGE_SIZE) und Anzahl der übersprungenen Ergebnisse.
+        format: json (Standard, seitenweise), csv oder jsonl (alle passenden Ergebnisse als Download).
+    """
+    args = request.args
+    filters = {
+        "contains": {field: args[field] for field in EXTRACTION_FIELDS if args.get(field)},
+        "non_empty": [field.strip() for field in args.get('has', '').split(',') if field.strip()],
+        "pdf_ids": args.getlist('pdf_id') or None,
+        "sort": args.get('sort', 'extracted_at'),
+        "descending": args.get('order', 'desc').lower() != 'asc'
+    }
+    export_format = args.get('format', 'json')
+    try:
+        if export_format in ("csv", "jsonl"):
+            extraction_store.query(**filters, limit=0) # Checks the filters before the download starts.
+        elif export_format == "json":
+            limit = min(max(int(args.get('limit', EXTRACTIONS_PAGE_SIZE)), 1), EXTRACTIONS_MAX_PAGE_SIZE)
+            offset = max(int(args.get('offset', 0)), 0)
+            items, total = extraction_store.query(**filters, limit=limit, offset=offset)
+        else:
+            raise ValueError(f"Unsupported format '{export_format}', expected json, csv or jsonl.")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-            # 10. Validate the LLM response:
-            match = re.search(r'{.*}', llm_json_response, re.DOTALL)
-            if not match:
-                print("Kein gültiger JSON-Block in der LLM-Antwort gefunden.")
-                return jsonify({"error": "Invalid JSON extracted from LLM response."}), 500
+    if export_format == "json":
+        next_offset = offset + len(items) if offset + len(items) < total else None
+        return jsonify({"total": total, "limit": limit, "offset": offset, "next_offset": next_offset, "items": items}), 200
 
-            json_string = match.group(0)
+    # Bulk export: The rows are streamed in pages from the database instead of building the whole file in memory.
+    def generate():
+        if export_format == "jsonl":
+            for record in extraction_store.iter_query(**filters):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        columns = ["pdf_id", "extracted_at", *EXTRACTION_FIELDS]
+        writer.writerow(columns)
+        for record in extraction_store.iter_query(**filters):
+            writer.writerow([record[column] for column in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
 
-            try:
-                json.loads(json_string)
-            except json.JSONDecodeError as e:
-                print(f"Fehler beim Parsen der JSON-Antwort: {e}")
-                return jsonify({"error": "Generated JSON is invalid."}), 500
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=extractions.{export_format}"})
 
-            # 11. Save the JSON data to a file:
-            json_output_path = os.path.join(JSON_OUTPUT_FOLDER, unique_filename.replace('.pdf', '.json'))
-            try:
-                with open(json_output_path, 'w', encoding='utf-8') as f:
-                    f.write(json_string)
-            except Exception as e:
-                print(f"Fehler beim Speichern der JSON-Datei: {e}")
-                traceback.print_exc()
-            
-            # 12. Return success response with URLs to the PDF and JSON files:
-            return jsonify({
-             "message": "PDF uploaded, processed and embedded",
-             "filename": pdf_file.filename,
-             "pdf_url": f"http://localhost:5000/static_pdfs/{unique_filename}",
-             "json_url": f"http://localhost:5000/static_jsons/{unique_filename.replace('.pdf', '.json')}",
-            "pdf_id": unique_filename  
-        }), 200
+# Route for monitoring the in-memory Vector Store cache (hits, misses, evictions):
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        "vector_store_backend": VECTOR_STORE_BACKEND,
+        "vector_stores": vector_stores_cache.stats(),
+        "bm25_indexes": bm25_indexes_cache.stats(),
+        "answers": answer_cache.stats()
+    }), 200
 
+# Route for Prometheus: Latency histograms of the processing stages and HTTP requests, token and byte counters:
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Route for liveness checks: The process is running and answers requests.
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"}), 200
+
+# Route for readiness checks (e.g. load balancer, Docker healthcheck): 503 until the warm-up has finished.
+@app.route('/ready', methods=['GET'])
+def readiness():
+    ready = ready_event.is_set()
+    return jsonify({"ready": ready, "startup_seconds": dict(startup_profile)}), 200 if ready else 503 # (Service Unavailable)
+
+# Route for polling the status of a background job:
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found"}), 404
+    return jsonify(job), 200
+
+# Instruction for the LLM on how to behave when answering questions about a PDF:
+CHAT_SYSTEM_PROMPT = "Du bist ein KI-Assistent, der Fragen präzise und wahrheitsgemäß basierend auf dem bereitgestellten Dokument beantwortet. Beschränke deine Antworten auf die Informationen im Dokument. Wenn die Antwort nicht im Dokument ist, sage das klar und deutlich. Wenn du keine relevanten Informationen hast, sage das ebenfalls."
+
+# Answer that is returned if no relevant context was found:
+NO_CONTEXT_ANSWER = "Unfortunately I could not find any answers regarding your question."
+
+# Helper function: Retrieval step of RAG, shared by /chat and /chat/stream:
+def retrieve_context(pdf_id: str, vector_store, user_question: str) -> str:
+    """
+    Sucht die relevantesten Chunks zur Frage und fügt sie zu einem Kontext für das LLM zusammen.
+    Im Modus "hybrid" werden Stichwortsuche (BM25) und semantische Suche mit Reciprocal Rank Fusion kombiniert.
+
+    Args:
+        pdf_id (str): Die eindeutige ID der PDF.
+        vector_store (Chroma | CompactVectorStore): Der Vector Store der PDF.
+        user_question (str): Die Frage des Benutzers.
+
+    Returns:
+        str: Der Kontext (höchstens CONTEXT_TOKEN_BUDGET Token). Leer, wenn nichts gefunden wurde.
+    """
+    bm25_index = None
+    if RETRIEVAL_MODE == "hybrid":
+        try:
+            bm25_index = get_bm25_index(pdf_id, vector_store)
         except Exception as e:
-            print(f"Server error during PDF processing: {e}")
-            traceback.print_exc()
-            return jsonify({"error": f"Server error during PDF processing: {str(e)}"}), 500
+            print(f"WARNUNG: BM25-Index für '{pdf_id}' nicht verfügbar, nur semantische Suche: {e}")
+
+    if bm25_index is None:
+        # Semantic Search in Vector Store.
+        with timed("similarity_search"):
+            retrieved_texts = [doc.page_content for doc in vector_store.similarity_search(user_question, k=5)] # k = 5 retrieves 5 most similar documents.
+    else:
+        with timed("bm25_search"):
+            keyword_hits = [bm25_index.chunks[index] for index, _ in bm25_index.search(user_question, k=RETRIEVAL_CANDIDATES)]
+        if keyword_hits and is_keyword_query(user_question):
+            # Keyword questions (e.g. "Scope 2 CO2 2023") are answered without an embedding request.
+            retrieved_texts = keyword_hits[:5]
+        else:
+            with timed("similarity_search"):
+                vector_hits = [doc.page_content for doc in vector_store.similarity_search(user_question, k=RETRIEVAL_CANDIDATES)]
+            retrieved_texts = reciprocal_rank_fusion([vector_hits, keyword_hits])[:5]
+
+    # Create context for the LLM: Overlaps of neighbouring chunks are removed and whole chunks are packed into the token budget.
+    # Each chunk is separated by two line breaks to improve readability for the LLM.
+    context_for_llm = build_context(retrieved_texts, CONTEXT_TOKEN_BUDGET)
+
+    # Checking for empty context:
+    if not context_for_llm.strip():
+        return ""
+
+    return context_for_llm
+
+# Helper function: Looks up a stored answer, first by exact question, then by similar question:
+def lookup_cached_answer(pdf_id: str, user_question: str):
+    """
+    Sucht eine gespeicherte Antwort zur Frage. Die exakte Suche kommt zuerst, die semantische Suche
+    (mit Embedding der Frage) nur, wenn die Frage keine Stichwortfrage ist, die ohne Embedding beantwortet wird.
+
+    Returns:
+        tuple: (Antwort oder None, Embedding der Frage oder None). Das Embedding wird beim Speichern
+               der neuen Antwort wiederverwendet.
+    """
+    cached_answer = answer_cache.get_exact(pdf_id, user_question)
+    if cached_answer is not None:
+        return cached_answer, None
+
+    question_embedding = None
+    # In hybrid mode keyword questions are answered by BM25 without an embedding request (see retrieve_context),
+    # the semantic tier would add one to every cache miss. For other questions the embedding is needed by the retrieval anyway.
+    skip_semantic_tier = RETRIEVAL_MODE == "hybrid" and is_keyword_query(user_question)
+    if answer_cache.similarity_threshold is not None and not skip_semantic_tier:
+        try:
+            # The embedding is cached, so the following similarity search does not request it again.
+            question_embedding = embeddings.embed_query(user_question)
+        except Exception as e:
+            print(f"WARNUNG: Semantische Suche im Antwort-Cache nicht möglich: {e}")
+    return answer_cache.get_similar(pdf_id, user_question, question_embedding), question_embedding
 
 # Route for chatting with an uploaded PDF. Implements RAG pattern:
 @app.route('/chat', methods=['POST'])
@@ -260,6 +982,11 @@ def chat_with_pdf():
     if not user_question or not pdf_id:
         return jsonify({"error": "Missing 'question' or 'pdf_id'"}), 400
 
+    # 2. Return a stored answer if the same (or a very similar) question was already asked for this PDF.
+    cached_answer, question_embedding = lookup_cached_answer(pdf_id, user_question)
+    if cached_answer is not None:
+        return jsonify({"answer": cached_answer, "cached": True}), 200
+
     # 3. Load Vector Store.
     try:
         vector_store = get_or_create_vector_store(pdf_id)
@@ -270,33 +997,90 @@ def chat_with_pdf():
 
 
     # 4. Retrieve relevant documents from the Vector Store (Retrieval step of RAG):
-    # Semantic Search in Vector Store.
-    retrieved_docs = vector_store.similarity_search(user_question, k=5) # k = 5 retrieves 5 most similar documents.
-
-    # 5. Create context for the LLM: 
-    context_for_llm = "\n\n".join([doc.page_content for doc in retrieved_docs]) # Each chunk is separated by two line breaks to improve readability for the LLM.
-
-    # 6. Checking for empty context:
-    if not context_for_llm.strip():
-        return jsonify({"answer": "Unfortunately I could not find any answers regarding your question."}), 200
+    context_for_llm = retrieve_context(pdf_id, vector_store, user_question)
+    if not context_for_llm:
+        return jsonify({"answer": NO_CONTEXT_ANSWER}), 200
 
-    # 7. Shorten context if necessary:
-    if len(context_for_llm) > MAX_CONTEXT_CHAR_LIMIT:
-        context_for_llm = context_for_llm[:MAX_CONTEXT_CHAR_LIMIT] + "\n\n[Kontext gekürzt aufgrund der Länge...]"
-
-    # 8. Generate LLM response (Generation step of RAG)
+    # 5. Generate LLM response (Generation step of RAG)
     try:
         llm_answer = get_llm_response(
             user_question=user_question, # The user's original question.
-            system_prompt="Du bist ein KI-Assistent, der Fragen präzise und wahrheitsgemäß basierend auf dem bereitgestellten Dokument beantwortet. Beschränke deine Antworten auf die Informationen im Dokument. Wenn die Antwort nicht im Dokument ist, sage das klar und deutlich. Wenn du keine relevanten Informationen hast, sage das ebenfalls.", # Instruction for the LLM on how to behave. 
+            system_prompt=CHAT_SYSTEM_PROMPT,
             context=context_for_llm # The retrieved context from the PDF.
         )
+        if llm_answer != ERROR_ANSWER:
+            answer_cache.put(pdf_id, user_question, llm_answer, question_embedding)
         return jsonify({"answer": llm_answer}), 200
     except Exception as e:
-        # 9. Error handling for communication with the LLM.
+        # 6. Error handling for communication with the LLM.
         print(f"Fehler bei der Kommunikation mit dem KI-Modell: {e}") 
         traceback.print_exc()
         return jsonify({"error": f"Fehler bei der Kommunikation mit dem KI-Modell: {str(e)}"}), 500
+
+# Helper function: Formats a Server-Sent-Event. The data is JSON encoded, so line breaks in the answer are preserved:
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+# Route for chatting with an uploaded PDF, the answer is streamed as Server-Sent-Events while it is generated:
+@app.route('/chat/stream', methods=['POST'])
+def chat_with_pdf_stream():
+    print("Received streaming chat request.")
+    # 1. Extract and validate data from the request.
+    data = request.json
+    user_question = data.get('question')
+    pdf_id = data.get('pdf_id')
+
+    if not user_question or not pdf_id:
+        return jsonify({"error": "Missing 'question' or 'pdf_id'"}), 400
+
+    # 2. A stored answer is sent as a single event.
+    cached_answer, question_embedding = lookup_cached_answer(pdf_id, user_question)
+    if cached_answer is not None:
+        def generate_cached():
+            yield sse_event({"token": cached_answer, "cached": True})
+            yield sse_event({}, event="done")
+        return Response(generate_cached(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
+
+    # 3. Load Vector Store.
+    try:
+        vector_store = get_or_create_vector_store(pdf_id)
+    except Exception as e:
+        print(f"Error loading vector store for PDF {pdf_id}: {e}")
+        traceback.print_exc() 
+        return jsonify({"error": "PDF content not found or could not be loaded. Please upload the PDF again."}), 404 # (Not Found)
+
+    # 4. Retrieval step happens before streaming starts, so errors can still be returned with a status code.
+    context_for_llm = retrieve_context(pdf_id, vector_store, user_question)
+
+    # 5. Generation step: every piece of text is sent to the frontend as soon as the LLM produces it.
+    def generate():
+        if not context_for_llm:
+            yield sse_event({"token": NO_CONTEXT_ANSWER})
+        else:
+            # The answer is only cached if the stream was completed without errors (not: partial text + ERROR_ANSWER).
+            def cache_answer(llm_answer: str):
+                if llm_answer:
+                    answer_cache.put(pdf_id, user_question, llm_answer, question_embedding)
+
+            try:
+                for token in stream_llm_response(
+                    user_question=user_question,
+                    system_prompt=CHAT_SYSTEM_PROMPT,
+                    context=context_for_llm,
+                    on_complete=cache_answer
+                ):
+                    yield sse_event({"token": token})
+            except Exception as e:
+                print(f"Fehler bei der Kommunikation mit dem KI-Modell: {e}") 
+                traceback.print_exc()
+                yield sse_event({"error": f"Fehler bei der Kommunikation mit dem KI-Modell: {str(e)}"}, event="error")
+                return
+        yield sse_event({}, event="done")
+
+    # X-Accel-Buffering disables buffering in reverse proxies like nginx, so the tokens arrive immediately.
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
         
 # Route for deleting a specific PDF and its associated data. Commented out because not needed:
 
@@ -319,9 +1103,11 @@ def chat_with_pdf():
 #            print(f"Fehler beim Löschen der PDF-Datei '{pdf_file_path}': {e}")
 #            traceback.print_exc()
 #
-#    if pdf_id in vector_stores_cache:
+#    answer_cache.invalidate(pdf_id)
+#
+#    if vector_stores_cache.get(pdf_id) is not None:
 #        try:
-#            del vector_stores_cache[pdf_id]
+#            vector_stores_cache.pop(pdf_id)
 #        except Exception as e:
 #            errors.append(f"Fehler beim Entfernen der ChromaDB-Sammlung '{pdf_id}' aus dem Cache: {e}")
 #            print(f"Fehler beim Entfernen der ChromaDB-Sammlung '{pdf_id}' aus dem Cache: {e}")
@@ -387,38 +1173,32 @@ def delete_all_data():
         print(f"Fehler beim Löschen der PDF-Dateien im '{UPLOAD_FOLDER}' Ordner: {e}") 
         traceback.print_exc() 
 
-    # Alle ChromaDB-Daten löschen und Ordner neu erstellen
+    # 2. Delete all ChromaDB collections. The data folder is kept, because the shared client stays open:
     try:
-        if os.path.exists(VECTOR_DB_DIR):
-            shutil.rmtree(VECTOR_DB_DIR) # Removes all uploaded PDFs.
-            os.makedirs(VECTOR_DB_DIR, exist_ok=True) # Recreates the empty folder.
-            deleted_items.append(f"Alle Daten im '{VECTOR_DB_DIR}' Ordner") # Add the success to the list.
-            print(f"Alle Dateien im '{UPLOAD_FOLDER}' Ordner erfolgreich gelöscht und Ordner neu erstellt.")
-        else:
-            print(f"Ordner '{UPLOAD_FOLDER}' existiert nicht. Keine PDF-Dateien zu löschen.")
+        chroma_client = get_chroma_client()
+        collections = chroma_client.list_collections()
+        for collection in collections:
+            chroma_client.delete_collection(name=getattr(collection, "name", collection))
+        deleted_items.append(f"Alle Daten im '{VECTOR_DB_DIR}' Ordner") # Add the success to the list.
+        print(f"{len(collections)} ChromaDB-Sammlungen erfolgreich gelöscht.")
     except Exception as e:
-        # Catch all errors that might occur when deleting or recreating the PDF folder.
+        # Catch all errors that might occur when deleting the collections.
         errors.append(f"Fehler beim Löschen der ChromaDB-Daten im '{VECTOR_DB_DIR}' Ordner: {e}")
         print(f"Fehler beim Löschen der ChromaDB-Daten im '{VECTOR_DB_DIR}' Ordner: {e}") 
-        traceback.print_exc()
+        traceback.print_exc()    
 
-    # 2. Delete all ChromaDB data and recreate the folder. Handles the 'chroma_db_data' folder:
+    # Delete the compact Vector Stores (VECTOR_STORE_BACKEND = "compact"):
     try:
-        if os.path.exists(VECTOR_DB_DIR):
-            shutil.rmtree(VECTOR_DB_DIR) # Deletes the entire ChromaDB data directory.
-            os.makedirs(VECTOR_DB_DIR, exist_ok=True) # Recreates the folder.
-            deleted_items.append(f"Alle Daten im '{VECTOR_DB_DIR}' Ordner") # Add the success to the list.
-            print(f"Alle Daten im '{VECTOR_DB_DIR}' Ordner erfolgreich gelöscht und Ordner neu erstellt.")
-        else:
-            print(f"Ordner '{VECTOR_DB_DIR}' existiert nicht. Keine ChromaDB-Daten zu löschen.")
+        if os.path.exists(COMPACT_VECTOR_DIR):
+            shutil.rmtree(COMPACT_VECTOR_DIR)
+            deleted_items.append(f"Alle Dateien im '{COMPACT_VECTOR_DIR}' Ordner")
     except Exception as e:
-        # Catch all errors that might occur when deleting or recreating the ChromaDV folder.
-        errors.append(f"Fehler beim Löschen der ChromaDB-Daten im '{VECTOR_DB_DIR}' Ordner: {e}")
-        print(f"Fehler beim Löschen der ChromaDB-Daten im '{VECTOR_DB_DIR}' Ordner: {e}") 
-        traceback.print_exc()    
+        errors.append(f"Fehler beim Löschen der kompakten Vector Stores im '{COMPACT_VECTOR_DIR}' Ordner: {e}")
+        print(f"Fehler beim Löschen der kompakten Vector Stores im '{COMPACT_VECTOR_DIR}' Ordner: {e}") 
+        traceback.print_exc()
 
     # 3. Clear in-memory cache: 
-    if vector_stores_cache:
+    if len(vector_stores_cache):
         vector_stores_cache.clear() # Deletes the entire directory.
         deleted_items.append("In-Memory-Cache für Vector Stores") # Add the success to the list.
         print("In-Memory-Cache für Vector Stores geleert.")
@@ -426,6 +1206,44 @@ def delete_all_data():
         print("In-Memory-Cache für Vector Stores ist bereits leer.")
 
 
+    # Forget the upload jobs that are no longer queued or running. Running jobs keep their entry,
+    # so that a new upload of the same file does not start a second job:
+    with active_ingest_jobs_lock:
+        for pdf_id, job_id in list(active_ingest_jobs.items()):
+            job = job_queue.get(job_id)
+            if not job or job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+                del active_ingest_jobs[pdf_id]
+
+    # Delete the BM25 indexes and clear their cache:
+    try:
+        if os.path.exists(BM25_INDEX_FOLDER):
+            shutil.rmtree(BM25_INDEX_FOLDER)
+            os.makedirs(BM25_INDEX_FOLDER, exist_ok=True)
+            deleted_items.append(f"Alle Dateien im '{BM25_INDEX_FOLDER}' Ordner")
+        bm25_indexes_cache.clear()
+    except Exception as e:
+        errors.append(f"Fehler beim Löschen der BM25-Indizes im '{BM25_INDEX_FOLDER}' Ordner: {e}")
+        print(f"Fehler beim Löschen der BM25-Indizes im '{BM25_INDEX_FOLDER}' Ordner: {e}") 
+        traceback.print_exc()
+
+    # Cached answers belong to the deleted PDFs:
+    try:
+        answer_cache.clear()
+        deleted_items.append("Antwort-Cache für /chat")
+    except Exception as e:
+        errors.append(f"Fehler beim Leeren des Antwort-Caches: {e}")
+        print(f"Fehler beim Leeren des Antwort-Caches: {e}") 
+        traceback.print_exc()
+
+    # The stored fields belong to the deleted JSON files:
+    try:
+        extraction_store.clear()
+        deleted_items.append("Extraktions-Speicher für /extractions")
+    except Exception as e:
+        errors.append(f"Fehler beim Leeren des Extraktions-Speichers: {e}")
+        print(f"Fehler beim Leeren des Extraktions-Speichers: {e}") 
+        traceback.print_exc()
+
     # 4. Delete extracted JSON files. Handles the 'extracted_jsons' folder:
     try:
         if os.path.exists(JSON_OUTPUT_FOLDER):
@@ -447,9 +1265,17 @@ def delete_all_data():
     else:
         return jsonify({"message": "Alle Daten erfolgreich gelöscht.", "deleted": deleted_items}), 200
 
+# The import is complete: the server can accept requests while the warm-up runs in the background.
+startup_profile["import_app"] = round(time.perf_counter() - APP_IMPORT_STARTED, 3)
+if BACKGROUND_WARMUP:
+    threading.Thread(target=warm_up, args=(VECTOR_STORE_WARMUP_COUNT,), name="warm-up", daemon=True).start()
+else:
+    ready_event.set()
+
 # Application entry point:
 if __name__ == '__main__':
+    # Development server. In production (Docker) the app is served by gunicorn, see gunicorn.conf.py.
     print("Starting Flask backend server...")
-    # debug=True: Activates debug mode (automatic reload on code changes, detailed errors).
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # FLASK_DEBUG=true: Activates debug mode (automatic reload on code changes, detailed errors).
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")), debug=os.getenv("FLASK_DEBUG", "false").lower() == "true", threaded=True)
     
\ No newline at end of file
@@ -0,0 +1,426 @@
+"""
+Offline-Benchmark für das Backend: Startet den SAIA-Ersatz aus fake_saia.py und das Backend in einem
+temporären Arbeitsordner, lädt synthetische PDFs über /upload_pdf hoch, stellt Fragen über /chat
+und gibt Durchsatz, Latenzen (p50/p95/p99) und den Speicherbedarf des Backends aus.
+
+Mit --output wird das Ergebnis als JSON gespeichert, mit --baseline wird es mit einem früheren
+Ergebnis verglichen (Exit-Code 1 bei einer Verschlechterung über --max-regression).
+
+Beispiel:
+    python benchmark.py --pdfs 8 --pages 5,20,60 --chats 200 --chat-concurrency 16 --output bench.json
+    python benchmark.py --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from fake_saia import FakeSAIAConfig, start_fake_saia # Local stand-in for the SAIA endpoints.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Vocabulary of the synthetic reports (ASCII only, so that the minimal PDF writer needs no font encoding):
+WORDS = (
+    "Nachhaltigkeit Emissionen Unternehmen Strategie Klimaziele Massnahmen Fahrzeuge Energie Strom Risiken "
+    "Chancen Lieferkette Reduktion Standort Bericht Geschaeftsjahr Kennzahlen Umwelt Ressourcen Investitionen"
+).split()
+
+# Helper function: Escapes text for a PDF string literal:
+def _pdf_string(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def make_pdf(pages: list[list[str]]) -> bytes:
+    """
+    Erzeugt eine einfache PDF-Datei (Helvetica, eine Textzeile pro Listeneintrag), deren Text PyPDF2 lesen kann.
+
+    Args:
+        pages (list[list[str]]): Die Zeilen jeder Seite.
+
+    Returns:
+        bytes: Der Inhalt der PDF-Datei.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({_pdf_string(line)}) '" for line in lines) + " ET"
+        stream_bytes = stream.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream_bytes), stream_bytes))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{page_id} 0 R" for page_id in page_ids).encode(), len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+def synthetic_report(page_count: int, seed: int, lines_per_page: int = 60) -> bytes:
+    """
+    Erzeugt einen synthetischen Nachhaltigkeitsbericht mit Überschriften, Fließtext und Kennzahlen.
+    Unterschiedliche Seeds ergeben unterschiedliche Dateien (und damit unterschiedliche PDF-IDs).
+    """
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(1, page_count + 1):
+        lines = [f"{page_number}. {rng.choice(WORDS)} und {rng.choice(WORDS)} (Bericht {seed})"]
+        for line_number in range(lines_per_page - 1):
+            if line_number % 15 == 14:
+                lines.append(f"Scope {rng.randint(1, 3)} Emissionen {rng.randint(2015, 2024)}: {rng.randint(1000, 99999)} t CO2")
+            else:
+                lines.append(" ".join(rng.choice(WORDS).lower() for _ in range(12)))
+        pages.append(lines)
+    return make_pdf(pages)
+
+# Helper function: Nearest-rank percentile of a sorted list:
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: list[float], errors: int, wall_seconds: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(len(values) / wall_seconds, 3) if wall_seconds else 0.0,
+        "p50_seconds": percentile(values, 50),
+        "p95_seconds": percentile(values, 95),
+        "p99_seconds": percentile(values, 99),
+        "max_seconds": values[-1] if values else None
+    }
+
+# Helper function: Resident memory (bytes) of a process and its child processes (Linux, otherwise None):
+def process_tree_rss(pid: int) -> int:
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status", 'r') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+            with open(f"/proc/{current}/task/{current}/children", 'r') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            if current == pid:
+                return None
+    return total
+
+# This class samples the memory of the backend in the background:
+class MemorySampler:
+    # Constructor for the MemorySampler class.
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_bytes = 0
+        self.last_bytes = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = process_tree_rss(self.pid)
+            if rss is not None:
+                self.last_bytes = rss
+                self.peak_bytes = max(self.peak_bytes, rss)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return {"peak_rss_mb": round(self.peak_bytes / 2 ** 20, 1), "final_rss_mb": round((self.last_bytes or 0) / 2 ** 20, 1)}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_backend(server: str, workdir: str, port: int, saia_base_url: str) -> subprocess.Popen:
+    """
+    Startet das Backend in workdir (dort werden alle Datenordner angelegt) und wartet, bis es bereit ist (/ready).
+    """
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "SAIA_BASE_URL": saia_base_url,
+        "SAIA_API_KEY": "benchmark",
+        "FLASK_DEBUG": "false",
+        "PYTHONPATH": BACKEND_DIR,
+        "PYTHONUNBUFFERED": "1"
+    }
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"), "-b", f"127.0.0.1:{port}", "app:app"]
+    else:
+        command = [sys.executable, os.path.join(BACKEND_DIR, "app.py")]
+    log = open(os.path.join(workdir, "backend.log"), 'w')
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend wurde beendet (Exit-Code {process.returncode}), siehe {log.name}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=2).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Backend antwortet nicht, siehe {log.name}")
+
+def run_uploads(backend_url: str, pdfs: list[tuple[str, bytes]], concurrency: int, job_timeout: float) -> tuple[dict, list[str]]:
+    """
+    Lädt die PDFs hoch und wartet jeweils, bis der Job fertig ist. Gemessen wird die Zeit vom Hochladen bis zum Ende des Jobs.
+
+    Returns:
+        tuple[dict, list[str]]: Die Kennzahlen und die IDs der erfolgreich verarbeiteten PDFs.
+    """
+    session = requests.Session()
+    latencies, pdf_ids, errors = [], [], []
+    lock = threading.Lock()
+
+    def upload(item):
+        filename, content = item
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{backend_url}/upload_pdf", files={"pdf_file": (filename, content, "application/pdf")}, timeout=60)
+            response.raise_for_status()
+            data = response.json()
+            job_id = data.get("job_id")
+            while job_id:
+                job = session.get(f"{backend_url}/jobs/{job_id}", timeout=10).json()
+                if job["status"] == "done":
+                    break
+                if job["status"] == "failed":
+                    raise RuntimeError(job.get("error"))
+                if time.perf_counter() - started > job_timeout:
+                    raise TimeoutError(f"Job '{job_id}' nicht fertig nach {job_timeout} s")
+                time.sleep(0.2)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                pdf_ids.append(data["pdf_id"])
+        except Exception as e:
+            with lock:
+                errors.append(f"{filename}: {e}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(upload, pdfs))
+    result = summarize(latencies, len(errors), time.perf_counter() - started)
+    for error in errors[:5]:
+        print(f"  Fehler beim Hochladen: {error}")
+    return result, pdf_ids
+
+def run_chats(backend_url: str, pdf_ids: list[str], count: int, concurrency: int, stream: bool, repeat_questions: bool) -> dict:
+    """
+    Stellt count Fragen an die hochgeladenen PDFs. Beim Streaming wird zusätzlich die Zeit bis zum ersten Token gemessen.
+    Ohne repeat_questions ist jede Frage anders, damit der Antwort-Cache nicht greift.
+    """
+    session = requests.Session()
+    latencies, first_token_latencies, errors = [], [], []
+    lock = threading.Lock()
+
+    def chat(index):
+        question = f"Wie hoch waren die CO2-Emissionen im Jahr {2015 + index % 10}?"
+        if not repeat_questions:
+            question += f" (Anfrage {index})"
+        payload = {"question": question, "pdf_id": pdf_ids[index % len(pdf_ids)]}
+        started = time.perf_counter()
+        first_token = None
+        try:
+            if stream:
+                with session.post(f"{backend_url}/chat/stream", json=payload, stream=True, timeout=300) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines(decode_unicode=True):
+                        if first_token is None and line.startswith("data:"):
+                            first_token = time.perf_counter() - started
+                        if line.startswith("event: error"):
+                            raise RuntimeError("error event")
+            else:
+                response = session.post(f"{backend_url}/chat", json=payload, timeout=300)
+                response.raise_for_status()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                if first_token is not None:
+                    first_token_latencies.append(first_token)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(chat, range(count)))
+    result = summarize(latencies, len(errors), time.perf_counter() - started)
+    if stream:
+        values = sorted(first_token_latencies)
+        result["first_token_p50_seconds"] = percentile(values, 50)
+        result["first_token_p95_seconds"] = percentile(values, 95)
+    for error in errors[:5]:
+        print(f"  Fehler beim Chat: {error}")
+    return result
+
+# Metrics that are compared with the baseline: (phase, key, True if higher is better).
+REGRESSION_CHECKS = [
+    ("upload", "throughput_per_second", True),
+    ("upload", "p95_seconds", False),
+    ("chat", "throughput_per_second", True),
+    ("chat", "p95_seconds", False),
+    ("chat", "p99_seconds", False),
+    ("memory", "peak_rss_mb", False),
+    ("startup", "ready_seconds", False)
+]
+
+def compare_with_baseline(result: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Vergleicht die Kennzahlen mit einem früheren Ergebnis und gibt die Verschlechterungen über max_regression (Anteil) zurück.
+    """
+    regressions = []
+    for phase, key, higher_is_better in REGRESSION_CHECKS:
+        current = result.get(phase, {}).get(key)
+        previous = baseline.get(phase, {}).get(key)
+        if not current or not previous:
+            continue
+        change = (previous - current) / previous if higher_is_better else (current - previous) / previous
+        if change > max_regression:
+            regressions.append(f"{phase}.{key}: {previous} -> {current} ({change:+.0%} schlechter)")
+    return regressions
+
+def print_report(result: dict):
+    if result.get("startup"):
+        print(f"\nBackend bereit (/ready) nach {result['startup']['ready_seconds']} s")
+    for phase in ("upload", "chat"):
+        data = result.get(phase)
+        if not data:
+            continue
+        print(f"\n{phase}: {data['requests']} Anfragen, {data['errors']} Fehler, {data['wall_seconds']} s, {data['throughput_per_second']}/s")
+        print("  Latenz " + ", ".join(f"{name} {data[f'{name}_seconds'] * 1000:.0f} ms" for name in ("p50", "p95", "p99", "max") if data.get(f"{name}_seconds") is not None))
+        if data.get("first_token_p50_seconds") is not None:
+            print(f"  Erstes Token p50 {data['first_token_p50_seconds'] * 1000:.0f} ms, p95 {data['first_token_p95_seconds'] * 1000:.0f} ms")
+    if result.get("memory"):
+        print(f"\nSpeicher Backend: Maximum {result['memory']['peak_rss_mb']} MB, am Ende {result['memory']['final_rss_mb']} MB")
+    if result.get("upstream"):
+        print(f"Upstream-Anfragen: {result['upstream']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-Benchmark für Upload und Chat mit lokalem SAIA-Ersatz.")
+    parser.add_argument("--server", choices=["flask", "gunicorn", "external"], default="gunicorn",
+                        help="Wie das Backend gestartet wird. 'external' verwendet ein laufendes Backend (--backend-url).")
+    parser.add_argument("--backend-url", default=None, help="URL des laufenden Backends (nur mit --server external).")
+    parser.add_argument("--backend-pid", type=int, default=None, help="PID des laufenden Backends für die Speichermessung.")
+    parser.add_argument("--fake-port", type=int, default=0, help="Port des SAIA-Ersatzes (0 = freier Port).")
+    parser.add_argument("--pdfs", type=int, default=8, help="Anzahl der hochgeladenen PDFs.")
+    parser.add_argument("--pages", default="5,20,60", help="Seitenzahlen der PDFs (kommagetrennt, werden reihum verwendet).")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--chats", type=int, default=100, help="Anzahl der Chat-Anfragen.")
+    parser.add_argument("--chat-concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="/chat/stream statt /chat verwenden.")
+    parser.add_argument("--repeat-questions", action="store_true", help="Fragen wiederholen (misst den Antwort-Cache).")
+    parser.add_argument("--job-timeout", type=float, default=600, help="Maximale Dauer eines Upload-Jobs in Sekunden.")
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--dimension", type=int, default=4096, help="Länge der Embedding-Vektoren des Ersatzes.")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert für die synthetischen PDFs.")
+    parser.add_argument("--output", default=None, help="Ergebnis als JSON in diese Datei schreiben.")
+    parser.add_argument("--baseline", default=None, help="Früheres Ergebnis (JSON), mit dem verglichen wird.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Erlaubte Verschlechterung gegenüber der Baseline (Anteil).")
+    parser.add_argument("--keep-workdir", action="store_true", help="Temporären Arbeitsordner des Backends nicht löschen.")
+    args = parser.parse_args()
+
+    fake = start_fake_saia(FakeSAIAConfig(
+        dimension=args.dimension,
+        embedding_latency=args.embedding_latency,
+        chat_latency=args.chat_latency,
+        token_latency=args.token_latency,
+        rate_limit_ratio=args.rate_limit_ratio
+    ), port=args.fake_port, seed=args.seed)
+    saia_base_url = f"http://127.0.0.1:{fake.server_port}/v1"
+    print(f"SAIA-Ersatz läuft unter {saia_base_url}")
+
+    result = {"config": vars(args)}
+    workdir = None
+    process = None
+    if args.server == "external":
+        if not args.backend_url:
+            parser.error("--server external benötigt --backend-url")
+        backend_url = args.backend_url.rstrip('/')
+        backend_pid = args.backend_pid
+    else:
+        workdir = tempfile.mkdtemp(prefix="backend-benchmark-")
+        port = _free_port()
+        print(f"Starte Backend ({args.server}) in {workdir} ...")
+        started = time.perf_counter()
+        process = start_backend(args.server, workdir, port, saia_base_url)
+        result["startup"] = {"ready_seconds": round(time.perf_counter() - started, 3)}
+        backend_url = f"http://127.0.0.1:{port}"
+        backend_pid = process.pid
+
+    sampler = MemorySampler(backend_pid) if backend_pid else None
+    if sampler:
+        sampler.start()
+    try:
+        page_counts = [int(pages) for pages in args.pages.split(",")]
+        pdf_pages = [page_counts[i % len(page_counts)] for i in range(args.pdfs)]
+        pdfs = [(f"bericht_{i}.pdf", synthetic_report(pages, seed=args.seed * 100000 + i)) for i, pages in enumerate(pdf_pages)]
+        print(f"Lade {len(pdfs)} PDFs hoch ({sum(pdf_pages)} Seiten) ...")
+        result["upload"], pdf_ids = run_uploads(backend_url, pdfs, args.upload_concurrency, args.job_timeout)
+        result["upload"]["pages_per_second"] = round(sum(pdf_pages) / result["upload"]["wall_seconds"], 2)
+
+        if pdf_ids and args.chats:
+            print(f"Stelle {args.chats} Fragen ...")
+            result["chat"] = run_chats(backend_url, pdf_ids, args.chats, args.chat_concurrency, args.stream, args.repeat_questions)
+    finally:
+        if sampler:
+            result["memory"] = sampler.stop()
+        result["upstream"] = dict(fake.stats)
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        fake.shutdown()
+        if workdir and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nErgebnis gespeichert in {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(result, json.load(f), args.max_regression)
+        if regressions:
+            print("\nVerschlechterungen gegenüber der Baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nKeine Verschlechterung gegenüber der Baseline.")
+
+if __name__ == '__main__':
+    main()
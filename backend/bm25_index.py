@@ -0,0 +1,86 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# Splits a text into lowercase word tokens. Numbers stay tokens of their own (e.g. "scope", "2", "co2", "2023"):
+def tokenize(text: str) -> list[str]:
+    return re.findall(r'\w+', text.lower())
+
+# Helper function: Short queries that contain numbers (e.g. "Scope 2 CO2 2023") are answered by keyword search alone:
+def is_keyword_query(query: str, max_terms: int = 6) -> bool:
+    tokens = tokenize(query)
+    return 0 < len(tokens) <= max_terms and any(token.isdigit() for token in tokens)
+
+# This class is an in-process inverted index that ranks the chunks of a PDF with the BM25 formula.
+# It finds exact keyword and number matches without an embedding request:
+class BM25Index:
+    # Constructor for the BM25Index class. k1 and b are the usual BM25 parameters.
+    def __init__(self, chunks: list[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = []
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list) # term -> list of (chunk index, term frequency)
+        self.doc_lengths = []
+        self.avg_doc_length = 0.0
+        self.add(chunks)
+
+    def add(self, chunks: list[str]):
+        # Adds further chunks to the index, e.g. batch by batch while a PDF is still being read.
+        for chunk in chunks:
+            tokens = tokenize(chunk)
+            for term, frequency in Counter(tokens).items():
+                self.postings[term].append((len(self.chunks), frequency))
+            self.chunks.append(chunk)
+            self.doc_lengths.append(len(tokens))
+        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def _idf(self, term: str) -> float:
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int = 5) -> list[tuple[int, float]]:
+        """
+        Sucht die k besten Chunks zur Anfrage.
+
+        Returns:
+            list[tuple[int, float]]: (Chunk-Index, Score), absteigend nach Score. Nur Chunks mit Treffern.
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf(term)
+            for index, frequency in self.postings.get(term, ()):
+                length_norm = 1 - self.b + self.b * self.doc_lengths[index] / (self.avg_doc_length or 1)
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: str):
+        # Only the chunks are stored, the index itself is rebuilt when loading (fast for a few hundred chunks).
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"chunks": self.chunks}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)["chunks"])
+
+# Helper function: Merges several rankings into one with Reciprocal Rank Fusion (RRF):
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+    """
+    Führt mehrere Ergebnislisten zusammen. Jeder Eintrag erhält pro Liste 1 / (k + Rang),
+    Einträge, die in mehreren Listen weit oben stehen, landen dadurch vorne.
+
+    Args:
+        rankings (list[list[str]]): Die Ergebnislisten, jeweils bestes Ergebnis zuerst.
+        k (int): Glättungskonstante von RRF (60 ist der übliche Wert).
+
+    Returns:
+        list[str]: Die zusammengeführte Liste, bestes Ergebnis zuerst.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
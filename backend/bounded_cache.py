@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict # Keeps the entries in order of their last use.
+
+# This class is a thread-safe in-memory cache with least-recently-used eviction.
+# It is bounded by the number of entries, an estimated memory size and an optional time-to-live:
+class BoundedLRUCache:
+    # Constructor for the BoundedLRUCache class.
+    def __init__(self, max_entries: int = 128, max_bytes: int = None, ttl_seconds: float = None, size_fn=None):
+        self.max_entries = max_entries # Maximum number of entries.
+        self.max_bytes = max_bytes # Maximum estimated memory size of all entries (None = unlimited).
+        self.ttl_seconds = ttl_seconds # Entries older than this are treated as missing (None = no expiry).
+        self.size_fn = size_fn or (lambda value: 0) # Function that estimates the memory size of a value in bytes.
+        self._lock = threading.RLock()
+        self._entries = OrderedDict() # key -> (value, size in bytes, time of insertion)
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Gibt den Wert zum Schlüssel zurück oder None, wenn er fehlt oder abgelaufen ist.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, _, inserted_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - inserted_at > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key) # Mark as most recently used.
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Speichert einen Wert und entfernt danach die am längsten nicht genutzten Einträge,
+        bis die Grenzen für Anzahl und Speichergröße wieder eingehalten werden.
+        """
+        size = self.size_fn(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._total_bytes += size
+            # The newest entry is never evicted, even if it alone exceeds max_bytes.
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def pop(self, key):
+        """
+        Entfernt einen Eintrag und gibt seinen Wert zurück (None, wenn er nicht existiert).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry[0]
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        Gibt Kennzahlen des Caches zurück (Größe, Treffer, Fehlzugriffe, Verdrängungen).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "estimated_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
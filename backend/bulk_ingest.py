@@ -0,0 +1,285 @@
+"""
+Kommandozeilenwerkzeug zum Einlesen eines ganzen Ordners mit PDFs (z. B. archivierte Berichte).
+
+Die PDFs werden in einem Prozess-Pool gelesen und in Chunks aufgeteilt. Mehrere Dokumente werden
+gleichzeitig eingebettet (die Anfragen an den Embedding-Service bleiben über --embed-concurrency begrenzt)
+und über dieselben Writer wie beim Upload im Backend gespeichert (ChromaDB oder kompakter Vector Store,
+siehe VECTOR_STORE_BACKEND). Ein Manifest (JSON Lines) hält fest, welche Dateien vollständig gespeichert
+sind, sodass ein abgebrochener Lauf einfach neu gestartet werden kann. Teilweise geschriebene Dokumente
+werden dabei verworfen und neu geschrieben.
+
+Das Werkzeug schreibt in dieselben Ordner wie das Backend. Es sollte laufen, während das Backend
+gestoppt ist, da ChromaDB nicht für mehrere Prozesse auf denselben Daten ausgelegt ist.
+
+Beispiel:
+    python bulk_ingest.py /data/archiv --workers 8 --documents 4 --embed-concurrency 4
+"""
+import argparse
+import json
+import os
+import shutil
+import threading # For protecting the manifest, several documents are stored at the same time.
+import time
+import traceback # For detailed stack traces (error information).
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dotenv import load_dotenv # Loading environment variables from .env file.
+
+# Imports of local modules:
+from bm25_index import BM25Index # Keyword index used by the hybrid search in /chat.
+from compact_vector_store import VECTOR_DTYPES # Storage types of the compact backend.
+from embedding_cache import EmbeddingCache # Persistent storage of already calculated embeddings.
+from embeddingWrapper import SAIAEmbeddings # Wrapper for the SAIA Embedding Service.
+from pdf_processing import content_pdf_id, iter_pdf_pages, iter_chunks # Functions for PDF processing.
+from vector_store_writer import open_vector_store_writer # Same storage as the upload in app.py.
+
+# Folder names, they must match the configuration in app.py:
+UPLOAD_FOLDER = 'uploaded_pdfs'
+VECTOR_DB_DIR = "chroma_db_data"
+COMPACT_VECTOR_DIR = 'compact_vectors'
+BM25_INDEX_FOLDER = 'bm25_indexes'
+EMBEDDING_CACHE_DIR = 'embedding_cache'
+SHARED_COLLECTION_NAME = "all_documents"
+
+# Worker function (runs in a separate process): Reads and chunks one PDF.
+def parse_pdf(path: str, max_tokens: int, overlap_tokens: int) -> tuple[str, str, list[dict]]:
+    with open(path, 'rb') as f:
+        pdf_id = content_pdf_id(f.read())
+    # The chunks of one PDF are sent back to the main process at once. The number of parsed PDFs
+    # held in memory is limited by the main loop.
+    chunks = list(iter_chunks(iter_pdf_pages(path), max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+    return path, pdf_id, chunks
+
+# Helper function: Reads the paths and PDF IDs that were already processed completely from the manifest:
+def load_manifest(manifest_path: str) -> tuple[set[str], set[str]]:
+    records = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue # Incomplete last line after a crash.
+    # Only "done" marks a completely stored PDF. Duplicates count as done once their content is stored.
+    done_ids = {record.get("pdf_id") for record in records if record.get("status") == "done"}
+    done_paths = {
+        record["path"] for record in records
+        if record.get("status") == "done" or (record.get("status") == "skipped" and record.get("pdf_id") in done_ids)
+    }
+    return done_paths, done_ids
+
+# Helper function: Writes entries into ChromaDB in batches of the maximum size allowed by the client:
+def add_in_batches(client, collection, ids, documents, embeddings, metadatas):
+    batch_size = client.get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            embeddings=embeddings[start:end],
+            metadatas=metadatas[start:end]
+        )
+
+class BulkIngester:
+    # Constructor for the BulkIngester class.
+    def __init__(self, embeddings: SAIAEmbeddings, manifest_path: str, backend: str = "chroma", compact_dtype: str = "float16",
+                 shared_collection: bool = True, batch_size: int = 256, completed_ids: set[str] = None):
+        self.embeddings = embeddings
+        self.manifest_path = manifest_path
+        self.backend = backend # "chroma" or "compact", like VECTOR_STORE_BACKEND in app.py.
+        self.compact_dtype = compact_dtype
+        self.use_shared_collection = shared_collection
+        self._client = None # Created on first use: with the compact backend and without shared collection ChromaDB is not needed.
+        self._shared_collection = None
+        self._client_lock = threading.Lock()
+        self.batch_size = batch_size # Chunks per embedding batch and write.
+        self._lock = threading.Lock()
+        self._active = set() # PDF IDs that are currently being stored (identical files in different paths).
+        self._completed = set(completed_ids or ()) # PDF IDs that are stored completely.
+
+    def _get_client(self):
+        with self._client_lock:
+            if self._client is None:
+                import chromadb # Persistent vector database.
+                self._client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
+            return self._client
+
+    def _get_shared_collection(self):
+        if not self.use_shared_collection:
+            return None
+        client = self._get_client()
+        with self._client_lock:
+            if self._shared_collection is None:
+                self._shared_collection = client.get_or_create_collection(name=SHARED_COLLECTION_NAME)
+            return self._shared_collection
+
+    def ingest(self, path: str, pdf_id: str, chunks: list[dict]) -> str:
+        """
+        Bettet die Chunks einer PDF batchweise ein und speichert sie. Gibt den Status für das Manifest zurück.
+        Die PDF wird erst als "done" eingetragen, wenn alle Batches gespeichert sind.
+        """
+        if not chunks:
+            self._record({"path": path, "pdf_id": pdf_id, "status": "failed", "error": "no text"})
+            return "failed"
+        with self._lock:
+            duplicate = pdf_id in self._active or pdf_id in self._completed
+            if not duplicate:
+                self._active.add(pdf_id)
+        if duplicate:
+            self._record({"path": path, "pdf_id": pdf_id, "status": "skipped", "reason": "duplicate"})
+            return "skipped"
+        try:
+            self._store(pdf_id, chunks)
+            # Same layout as the upload in app.py: the Vector Store, the PDF file and the BM25 index.
+            target_path = os.path.join(UPLOAD_FOLDER, pdf_id)
+            if not os.path.exists(target_path):
+                shutil.copyfile(path, target_path)
+        except BaseException:
+            with self._lock:
+                self._active.discard(pdf_id)
+            raise
+        with self._lock:
+            self._active.discard(pdf_id)
+            self._completed.add(pdf_id)
+        self._record({"path": path, "pdf_id": pdf_id, "status": "done", "chunks": len(chunks), "backend": self.backend})
+        return "done"
+
+    def _store(self, pdf_id: str, chunks: list[dict]):
+        # The writer replaces a collection or compact store left behind by an interrupted run.
+        writer = open_vector_store_writer(
+            self.backend, pdf_id, self.embeddings,
+            chroma_client=self._get_client() if self.backend != "compact" else None,
+            compact_dir=COMPACT_VECTOR_DIR, compact_dtype=self.compact_dtype
+        )
+        shared_collection = self._get_shared_collection()
+        bm25_index = BM25Index([])
+        try:
+            if shared_collection is not None:
+                shared_collection.delete(where={"pdf_id": pdf_id})
+            for start in range(0, len(chunks), self.batch_size):
+                batch = chunks[start:start + self.batch_size]
+                texts = [chunk["text"] for chunk in batch]
+                metadatas = [{"page": chunk["page"], "start": chunk["start"], "end": chunk["end"]} for chunk in batch]
+                vectors = writer.add(texts, metadatas)
+                if shared_collection is not None:
+                    add_in_batches(
+                        self._client, shared_collection,
+                        [f"{pdf_id}:{start + i}" for i in range(len(texts))], texts, vectors,
+                        [{**metadata, "pdf_id": pdf_id, "chunk_index": start + i} for i, metadata in enumerate(metadatas)]
+                    )
+                bm25_index.add(texts)
+            writer.finish()
+        except BaseException:
+            writer.abort()
+            if shared_collection is not None:
+                shared_collection.delete(where={"pdf_id": pdf_id})
+            raise
+        bm25_index.save(os.path.join(BM25_INDEX_FOLDER, pdf_id.replace('.pdf', '.json')))
+
+    def fail(self, path: str, error: str):
+        self._record({"path": path, "status": "failed", "error": error})
+
+    def _record(self, record: dict):
+        with self._lock:
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Liest alle PDFs eines Ordners ein (Chunks, Embeddings, Vector Store).")
+    parser.add_argument("directory", help="Ordner, der (auch in Unterordnern) nach PDFs durchsucht wird.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Prozesse zum Lesen und Aufteilen der PDFs.")
+    parser.add_argument("--documents", type=int, default=4, help="Dokumente, die gleichzeitig eingebettet und gespeichert werden.")
+    parser.add_argument("--embed-concurrency", type=int, default=4, help="Gleichzeitige Anfragen an den Embedding-Service (über alle Dokumente).")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Texte pro Anfrage an den Embedding-Service.")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("INGEST_BATCH_SIZE", "256")), help="Chunks, die zusammen eingebettet und gespeichert werden.")
+    parser.add_argument("--backend", choices=("chroma", "compact"), default=os.getenv("VECTOR_STORE_BACKEND", "chroma"),
+                        help="Vector Store wie VECTOR_STORE_BACKEND im Backend.")
+    parser.add_argument("--compact-dtype", choices=VECTOR_DTYPES, default=os.getenv("COMPACT_VECTOR_DTYPE", "float16"))
+    parser.add_argument("--chunk-max-tokens", type=int, default=int(os.getenv("CHUNK_MAX_TOKENS", "512")))
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=int(os.getenv("CHUNK_OVERLAP_TOKENS", "64")))
+    parser.add_argument("--manifest", default="bulk_ingest_manifest.jsonl", help="Fortschrittsdatei zum Fortsetzen abgebrochener Läufe.")
+    parser.add_argument("--no-shared-collection", action="store_true", help="Chunks nicht in die gemeinsame Sammlung schreiben.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv("SAIA_API_KEY")
+    if not api_key:
+        raise ValueError("API Key nicht gefunden! Bitte in .env setzen.")
+
+    for folder in (UPLOAD_FOLDER, BM25_INDEX_FOLDER, EMBEDDING_CACHE_DIR):
+        os.makedirs(folder, exist_ok=True)
+
+    done, done_ids = load_manifest(args.manifest)
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(args.directory)
+        for name in names if name.lower().endswith('.pdf')
+    )
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} PDFs gefunden, {len(paths) - len(todo)} bereits verarbeitet, {len(todo)} verbleibend.")
+
+    embeddings = SAIAEmbeddings(
+        api_key,
+        cache=EmbeddingCache(os.path.join(EMBEDDING_CACHE_DIR, "embeddings.sqlite3")),
+        batch_size=args.embed_batch_size,
+        max_concurrency=args.embed_concurrency
+    )
+    ingester = BulkIngester(
+        embeddings, args.manifest, backend=args.backend, compact_dtype=args.compact_dtype,
+        shared_collection=not args.no_shared_collection, batch_size=args.batch_size, completed_ids=done_ids
+    )
+
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.workers) as parsers, ThreadPoolExecutor(max_workers=args.documents) as writers:
+        # Reading the next PDFs overlaps with embedding the previous ones. Only a limited number of
+        # parsed PDFs (waiting or being stored) is kept in memory at the same time.
+        max_in_flight = args.workers + args.documents * 2
+        parsing = {}
+        storing = {}
+        remaining = iter(todo)
+
+        def fill():
+            while len(parsing) + len(storing) < max_in_flight:
+                path = next(remaining, None)
+                if path is None:
+                    return
+                parsing[parsers.submit(parse_pdf, path, args.chunk_max_tokens, args.chunk_overlap_tokens)] = path
+
+        fill()
+        while parsing or storing:
+            finished, _ = wait([*parsing, *storing], return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in parsing:
+                    path = parsing.pop(future)
+                    try:
+                        _, pdf_id, chunks = future.result()
+                    except Exception as e:
+                        print(f"FEHLER: '{path}' konnte nicht gelesen werden: {e}")
+                        ingester.fail(path, str(e))
+                        counts["failed"] += 1
+                        continue
+                    storing[writers.submit(ingester.ingest, path, pdf_id, chunks)] = path
+                    continue
+
+                path = storing.pop(future)
+                try:
+                    status = future.result()
+                except Exception as e:
+                    print(f"FEHLER: '{path}' konnte nicht verarbeitet werden: {e}")
+                    traceback.print_exc()
+                    ingester.fail(path, str(e))
+                    status = "failed"
+                counts[status] += 1
+
+                processed = sum(counts.values())
+                if processed % 10 == 0 or not (parsing or storing):
+                    elapsed = time.monotonic() - started
+                    print(f"{processed}/{len(todo)} PDFs ({counts['done']} neu, {counts['skipped']} übersprungen, "
+                          f"{counts['failed']} fehlgeschlagen), {processed / elapsed:.2f} Dokumente/s")
+            fill()
+
+    elapsed = time.monotonic() - started
+    print(f"Fertig: {sum(counts.values())} PDFs in {elapsed:.1f} s ({sum(counts.values()) / elapsed if elapsed else 0:.2f} Dokumente/s).")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import json
+import os
+import numpy as np # Memory-mapped vector matrix and vectorized similarity search.
+
+# Supported storage types of the vectors: float16 halves the size of float32, int8 quarters it (one scale per vector).
+VECTOR_DTYPES = ("float16", "int8")
+
+# Number of vectors that are converted to float32 at once during a search (limits the memory per query):
+SEARCH_BLOCK_SIZE = 4096
+
+# Search result with the same attributes as LangChain's Document (page_content, metadata):
+class Document:
+    # Constructor for the Document class.
+    def __init__(self, page_content: str, metadata: dict = None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+    def __repr__(self):
+        return f"Document(page_content={self.page_content[:40]!r}, metadata={self.metadata!r})"
+
+# Helper function: Normalizes the rows of a matrix to length 1 (cosine similarity = dot product):
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+# Helper function: Quantizes normalized vectors symmetrically to int8, with one scale factor per vector:
+def quantize_int8(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+# This class is a compact vector store for the chunks of one PDF: the vectors are stored as a float16 or int8 matrix
+# in a .npy file (memory-mapped when loading), the chunks and metadata in a JSON sidecar file next to it.
+# The search computes all cosine similarities with one matrix multiplication, without ChromaDB and its SQLite database:
+class CompactVectorStore:
+    # Constructor for the CompactVectorStore class. Use create() or load() instead of calling it directly.
+    def __init__(self, path: str, embedding_function, vectors: np.ndarray, texts: list[str], metadatas: list[dict], scales: np.ndarray = None):
+        self.path = path # Path without file extension (path + ".npy" and path + ".json").
+        self.embedding_function = embedding_function # Object with embed_query (e.g. SAIAEmbeddings).
+        self.vectors = vectors # Normalized vectors, one row per chunk (float16 or int8).
+        self.texts = texts
+        self.metadatas = metadatas
+        self.scales = scales # Scale factor per row for int8, otherwise None.
+
+    @classmethod
+    def create(cls, path: str, texts: list[str], embedding_function, metadatas: list[dict] = None,
+               dtype: str = "float16", vectors: list[list[float]] = None) -> "CompactVectorStore":
+        """
+        Berechnet die Embeddings der Chunks (oder verwendet die übergebenen Vektoren) und speichert sie unter path.
+
+        Args:
+            path (str): Pfad ohne Dateiendung, es entstehen path.npy und path.json.
+            texts (list[str]): Die Text-Chunks.
+            embedding_function: Objekt mit embed_documents und embed_query (z. B. SAIAEmbeddings).
+            metadatas (list[dict], optional): Metadaten pro Chunk (z. B. Seitennummer).
+            dtype (str): "float16" oder "int8".
+            vectors (list[list[float]], optional): Bereits berechnete Embeddings (z. B. aus einer ChromaDB-Sammlung).
+
+        Returns:
+            CompactVectorStore: Der gespeicherte und memory-mapped geladene Store.
+        """
+        writer = CompactVectorStoreWriter(path, embedding_function, dtype)
+        try:
+            writer.add(texts, metadatas, vectors)
+            return writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+
+    @classmethod
+    def load(cls, path: str, embedding_function) -> "CompactVectorStore":
+        """
+        Lädt einen gespeicherten Store. Die Vektoren werden nicht eingelesen, sondern memory-mapped.
+
+        Raises:
+            FileNotFoundError: Wenn unter path kein Store gespeichert ist.
+        """
+        with open(path + ".json", 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        vectors = np.load(path + ".npy", mmap_mode='r')
+        scales = np.asarray(sidecar["scales"], dtype=np.float32) if sidecar["dtype"] == "int8" else None
+        return cls(path, embedding_function, vectors, sidecar["texts"], sidecar["metadatas"], scales)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path + ".json") and os.path.exists(path + ".npy")
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        # Size of the vector matrix (mapped from disk, pages are only loaded when they are searched).
+        return int(self.vectors.nbytes)
+
+    def similarity_search_with_score_by_vector(self, embedding: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        """
+        Sucht die k Chunks mit der höchsten Kosinus-Ähnlichkeit zum Vektor.
+
+        Returns:
+            list[tuple[Document, float]]: (Chunk, Ähnlichkeit), absteigend nach Ähnlichkeit.
+        """
+        if not len(self) or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SEARCH_BLOCK_SIZE):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_SIZE], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self.scales is not None:
+            scores *= self.scales
+
+        # Only the k best entries are sorted (argpartition instead of sorting all scores).
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(Document(self.texts[i], self.metadatas[i]), float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4) -> list[Document]:
+        """
+        Sucht die k relevantesten Chunks zur Anfrage (gleiche Schnittstelle wie LangChain's Chroma.similarity_search).
+        """
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+# This class writes a compact vector store batch by batch, e.g. while the later pages of the PDF are still being read.
+# The rows are appended to a temporary file, so only the current batch is held in memory. The store becomes visible
+# with finish(), an interrupted write leaves no store behind:
+class CompactVectorStoreWriter:
+    # Constructor for the CompactVectorStoreWriter class.
+    def __init__(self, path: str, embedding_function, dtype: str = "float16"):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {VECTOR_DTYPES}.")
+        self.path = path
+        self.embedding_function = embedding_function
+        self.dtype = dtype
+        self.dimension = None
+        self.texts = []
+        self.metadatas = []
+        self.scales = [] # Only for int8.
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._rows = open(path + ".npy.part", 'wb')
+
+    def add(self, texts: list[str], metadatas: list[dict] = None, vectors: list[list[float]] = None) -> list[list[float]]:
+        """
+        Berechnet die Embeddings eines Batches (oder verwendet die übergebenen Vektoren) und hängt sie an.
+
+        Returns:
+            list[list[float]]: Die Embeddings des Batches (z. B. für die gemeinsame Sammlung).
+        """
+        if vectors is None:
+            vectors = self.embedding_function.embed_documents(texts)
+        matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if self.dimension is None:
+            self.dimension = int(matrix.shape[1])
+        elif matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match {self.dimension}.")
+        if self.dtype == "int8":
+            matrix, scales = quantize_int8(matrix)
+            self.scales.extend(scales.tolist())
+        else:
+            matrix = matrix.astype(np.float16)
+        self._rows.write(matrix.tobytes())
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas if metadatas else [{} for _ in texts])
+        return vectors
+
+    def finish(self) -> CompactVectorStore:
+        """
+        Schreibt die .npy-Datei und die Sidecar-Datei und lädt den Store (memory-mapped).
+
+        Raises:
+            ValueError: Wenn keine Vektoren hinzugefügt wurden.
+        """
+        self._rows.close()
+        if not self.texts:
+            self.abort()
+            raise ValueError("No vectors were added to the compact vector store.")
+        shape = (len(self.texts), self.dimension)
+        # The rows are copied block by block into a .npy file with header, without loading them all into memory.
+        rows = np.memmap(self.path + ".npy.part", dtype=self.dtype, mode='r', shape=shape)
+        matrix = np.lib.format.open_memmap(self.path + ".npy.tmp", mode='w+', dtype=self.dtype, shape=shape)
+        for start in range(0, shape[0], SEARCH_BLOCK_SIZE):
+            matrix[start:start + SEARCH_BLOCK_SIZE] = rows[start:start + SEARCH_BLOCK_SIZE]
+        matrix.flush()
+        del matrix, rows
+        os.remove(self.path + ".npy.part")
+
+        sidecar = {"dtype": self.dtype, "dimension": self.dimension, "texts": self.texts, "metadatas": self.metadatas}
+        if self.dtype == "int8":
+            sidecar["scales"] = self.scales
+        with open(self.path + ".json.tmp", 'w', encoding='utf-8') as f:
+            json.dump(sidecar, f, ensure_ascii=False)
+        # The sidecar is renamed last: load() only finds stores whose sidecar exists.
+        os.replace(self.path + ".npy.tmp", self.path + ".npy")
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+        return CompactVectorStore.load(self.path, self.embedding_function)
+
+    def abort(self):
+        # Removes the temporary files of an interrupted write. A previously finished store stays unchanged.
+        self._rows.close()
+        for suffix in (".npy.part", ".npy.tmp", ".json.tmp"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
@@ -0,0 +1,83 @@
+import threading
+from metrics import TOKENS # Token counter for /metrics.
+
+# Lazily loaded tiktoken encoding (loading it once takes a moment and may require a download):
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"WARNUNG: tiktoken nicht verfügbar, Token werden geschätzt: {e}")
+                _encoding = False # Do not try again, fall back to the estimate.
+        return _encoding
+
+def count_tokens(text: str) -> int:
+    """
+    Zählt die Token eines Textes mit tiktoken. Ist tiktoken nicht verfügbar,
+    wird mit ca. 4 Zeichen pro Token geschätzt.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+# Helper function: Length of the longest end of 'first' that is also the beginning of 'second':
+def _overlap_length(first: str, second: str, min_overlap: int, max_overlap: int) -> int:
+    for length in range(min(len(first), len(second), max_overlap), min_overlap - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+# Helper function: Removes text that is already contained in the selected chunks (overlaps of neighbouring chunks):
+def remove_overlaps(chunk: str, selected_chunks: list[str], min_overlap: int = 20, max_overlap: int = 400) -> str:
+    """
+    Entfernt aus einem Chunk die Teile, die bereits in den ausgewählten Chunks enthalten sind:
+    den Anfang, wenn er das Ende eines ausgewählten Chunks wiederholt, und das Ende,
+    wenn es den Anfang eines ausgewählten Chunks wiederholt. Vollständig enthaltene Chunks werden leer.
+    """
+    for selected in selected_chunks:
+        if chunk in selected:
+            return ""
+        overlap = _overlap_length(selected, chunk, min_overlap, max_overlap)
+        if overlap:
+            chunk = chunk[overlap:]
+        overlap = _overlap_length(chunk, selected, min_overlap, max_overlap)
+        if overlap:
+            chunk = chunk[:-overlap]
+    return chunk.strip()
+
+def build_context(chunks: list[str], max_tokens: int, separator: str = "\n\n") -> str:
+    """
+    Baut den Kontext für das LLM aus den gefundenen Chunks (bester Treffer zuerst):
+    Überlappungen werden entfernt und nur ganze Chunks aufgenommen, solange sie in das Token-Budget passen.
+    Ein Chunk, der nicht mehr passt, wird übersprungen, kleinere nachfolgende Chunks können noch aufgenommen werden.
+
+    Args:
+        chunks (list[str]): Die gefundenen Chunks, nach Relevanz sortiert.
+        max_tokens (int): Maximale Anzahl Token des Kontexts.
+        separator (str): Trennzeichen zwischen den Chunks.
+
+    Returns:
+        str: Der Kontext.
+    """
+    separator_tokens = count_tokens(separator)
+    selected = []
+    used_tokens = 0
+    for chunk in chunks:
+        chunk = remove_overlaps(chunk, selected)
+        if not chunk:
+            continue
+        chunk_tokens = count_tokens(chunk) + (separator_tokens if selected else 0)
+        if used_tokens + chunk_tokens > max_tokens:
+            continue
+        selected.append(chunk)
+        used_tokens += chunk_tokens
+    TOKENS.inc(used_tokens, kind="context")
+    print(f"Kontext: {len(selected)} von {len(chunks)} Chunks, {used_tokens} Token.")
+    return separator.join(selected)
@@ -1,42 +1,141 @@
 import os
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor # For sending several batches at the same time.
+from requests.adapters import HTTPAdapter # Connection pool for keep-alive connections.
+from embedding_cache import text_hash # Hash function used as key for stored embeddings.
+from metrics import BYTES, EMBEDDING_TEXTS, timed # Latency and volume metrics for /metrics.
+from upstream_scheduler import MicroBatcher, PrioritySemaphore, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, current_priority, priority_scope, wait_for_rate_limit # Shared rate limit and request coalescing.
+
+# Base URL of the SAIA API, can be overridden with SAIA_BASE_URL (e.g. for the local stand-in in fake_saia.py):
+DEFAULT_BASE_URL = "https://chat-ai.academiccloud.de/v1"
+
+# HTTP status codes after which a request is repeated (rate limit and server errors):
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 # This class acts as a wrapper for the SAIA Embedding service, allowing easy integration with frameworks like LangChain:
 class SAIAEmbeddings:
     # Constructor for the SAIAEmbeddings class.
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None, batch_size=64, max_concurrency=4, timeout=60, max_retries=3, query_batch_wait=0.005):
         self.api_key = api_key # Store the API key.
-        self.endpoint = "https://chat-ai.academiccloud.de/v1/embeddings" # Define the API endpoint for the SAIA Embedding service.       
+        self.cache = cache # Optional EmbeddingCache, so that identical texts are only embedded once.
+        self.endpoint = f"{os.getenv('SAIA_BASE_URL', DEFAULT_BASE_URL).rstrip('/')}/embeddings" # Define the API endpoint for the SAIA Embedding service.
         self.model = "e5-mistral-7b-instruct" # Define the specific embedding model.
+        self.batch_size = batch_size # Maximum number of texts per request.
+        self.timeout = timeout # Timeout per request in seconds.
+        self.max_retries = max_retries # Number of retries on rate limits, server and connection errors.
+
+        # One session for all requests, so TCP/TLS connections are reused instead of being opened per request.
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+        # Bounds the requests of all callers together (a single batch is sent in the caller's thread, not in the executor),
+        # waiting chat requests get the next free slot:
+        self._concurrency_limit = PrioritySemaphore(max_concurrency)
+        # Concurrent embed_query calls are collected for query_batch_wait seconds and sent in one request (0 = off).
+        self.query_batch_wait = query_batch_wait
+        # One batcher per priority, so that queries of background jobs are not sent with chat priority (or vice versa).
+        self._query_batchers = {
+            priority: MicroBatcher(self._batch_function(priority), max_batch_size=batch_size, max_wait=query_batch_wait)
+            for priority in (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)
+        }
+
+    def _batch_function(self, priority):
+        def embed_batch(texts):
+            with priority_scope(priority):
+                return self.embed_documents(texts)
+        return embed_batch
 
     # Method to generate embeddings for a list of text documents:
     def embed_documents(self, texts):
-        # Send a single POST request to the SAIA Embedding service endpoint for all texts at once.
-        try:
-            response = requests.post(
-                self.endpoint,
-                # Set the necessary headers for authentication and content type.
-                headers={
-                    "Authorization": f"Bearer {self.api_key}", # API key for authentication.
-                    "Content-Type": "application/json" # Indicate JSON request body.
-                },
-                # Provide the JSON payload with the input texts, model, and encoding format.
-                json={
-                    "input": texts,  # ⬅️ Batch input instead of per-text call
-                    "model": self.model,
-                    "encoding_format": "float" # Request embeddings as float numbers.
-                }
-            )
-            # Raise an HTTPError for bad responses.
-            response.raise_for_status()
-            # Extract embeddings from the response and return them as a list.
-            return [item['embedding'] for item in response.json()['data']] # List of embeddings for each input text.
-        except Exception as e:
-            print(f"Fehler beim Embedding: {e}")
-            raise
+        with timed("embed_documents"):
+            return self._embed_documents(texts)
+
+    def _embed_documents(self, texts):
+        if self.cache is None:
+            EMBEDDING_TEXTS.inc(len(texts), source="api")
+            return self._request_embeddings(texts)
+
+        # Look up the stored embeddings first and only send the texts that are not known yet (each distinct text once).
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.model, hashes)
+        missing = {h: text for h, text in zip(hashes, texts) if h not in found}
+        if missing:
+            new_embeddings = dict(zip(missing.keys(), self._request_embeddings(list(missing.values()))))
+            self.cache.put_many(self.model, new_embeddings)
+            found.update(new_embeddings)
+        EMBEDDING_TEXTS.inc(len(texts) - len(missing), source="cache")
+        EMBEDDING_TEXTS.inc(len(missing), source="api")
+        print(f"Embeddings: {len(texts) - len(missing)} von {len(texts)} Texten aus dem Cache.")
+        return [found[h] for h in hashes]
+
+    # Method to send the texts to the SAIA Embedding service, split into batches that are sent concurrently:
+    def _request_embeddings(self, texts):
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        # The worker threads do not know the priority of the caller (chat or background job), so it is passed on.
+        priority = current_priority()
+        if len(batches) == 1:
+            return self._post_batch(batches[0], priority)
+        # map() keeps the order of the batches, so the embeddings match the order of the texts.
+        return [embedding for batch_embeddings in self._executor.map(self._post_batch, batches, [priority] * len(batches)) for embedding in batch_embeddings]
 
+    # Method to send one batch of texts to the SAIA Embedding service, with retries on rate limits and server errors:
+    def _post_batch(self, texts, priority=None):
+        for attempt in range(self.max_retries + 1):
+            # All requests with the same API key share one rate limit, waiting chat requests go first.
+            wait_for_rate_limit(self.api_key, priority)
+            try:
+                with self._concurrency_limit.slot(priority):
+                    response = self.session.post(
+                        self.endpoint,
+                        # Set the necessary headers for authentication and content type.
+                        headers={
+                            "Authorization": f"Bearer {self.api_key}", # API key for authentication.
+                            "Content-Type": "application/json" # Indicate JSON request body.
+                        },
+                        # Provide the JSON payload with the input texts, model, and encoding format.
+                        json={
+                            "input": texts,  # ⬅️ Batch input instead of per-text call
+                            "model": self.model,
+                            "encoding_format": "float" # Request embeddings as float numbers.
+                        },
+                        timeout=self.timeout
+                    )
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    # Respect the waiting time requested by the server, otherwise back off exponentially.
+                    retry_after = response.headers.get("Retry-After", "")
+                    delay = float(retry_after) if retry_after.isdigit() else min(2 ** attempt, 30)
+                    print(f"WARNUNG: Embedding-Service antwortet mit {response.status_code}, neuer Versuch in {delay} s.")
+                    time.sleep(delay)
+                    continue
+                # Raise an HTTPError for bad responses.
+                response.raise_for_status()
+                BYTES.inc(sum(len(text.encode('utf-8')) for text in texts), kind="embedding_request")
+                BYTES.inc(len(response.content), kind="embedding_response")
+                # Extract embeddings from the response and return them as a list.
+                return [item['embedding'] for item in response.json()['data']] # List of embeddings for each input text.
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt < self.max_retries:
+                    print(f"WARNUNG: Verbindungsfehler beim Embedding, neuer Versuch: {e}")
+                    time.sleep(min(2 ** attempt, 30))
+                    continue
+                print(f"Fehler beim Embedding: {e}")
+                raise
+            except Exception as e:
+                print(f"Fehler beim Embedding: {e}")
+                raise
 
     # Method to generate an embedding for a single text query:
     def embed_query(self, text):
-        # Reuse the embed_documents method by passing the single text in a list. Then return the first (and only) embedding from the result list.
-        return self.embed_documents([text])[0]
\ No newline at end of file
+        if self.cache is not None:
+            # Known queries are answered from the cache without waiting for a batch.
+            found = self.cache.get_many(self.model, [text_hash(text)])
+            if found:
+                EMBEDDING_TEXTS.inc(1, source="cache")
+                return next(iter(found.values()))
+        if self.query_batch_wait <= 0:
+            # Reuse the embed_documents method by passing the single text in a list. Then return the first (and only) embedding from the result list.
+            return self.embed_documents([text])[0]
+        # Concurrent queries are sent together in one request, identical queries only once.
+        priority = min(current_priority(), PRIORITY_BACKGROUND)
+        return self._query_batchers[priority].submit(text)
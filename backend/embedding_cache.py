@@ -0,0 +1,96 @@
+import hashlib
+import os
+import sqlite3 # Persistent key-value storage for the embeddings.
+import threading
+import time
+from array import array # Compact binary representation of the float vectors.
+
+# Returns the SHA-256 hash of a text, which is used as the key for its embedding:
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# This class stores already calculated embeddings on disk, so that identical texts never have to be embedded twice.
+# If more than max_entries embeddings are stored, the least recently used ones are removed:
+class EmbeddingCache:
+    # Constructor for the EmbeddingCache class.
+    def __init__(self, db_path: str, max_entries: int = 200000, touch_interval: float = 600.0):
+        self.db_path = db_path # Path to the SQLite file.
+        self.max_entries = max_entries # Upper limit for the number of stored embeddings.
+        # The usage time of a found embedding is only written again if it is older than touch_interval seconds,
+        # so that repeated lookups (e.g. the same chat question) do not cause a write to the SQLite file each time:
+        self.touch_interval = touch_interval
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock() # The connection is shared between the worker threads.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "text_hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, list[float]]:
+        """
+        Sucht die Embeddings zu den übergebenen Text-Hashes.
+
+        Args:
+            model (str): Das Embedding-Modell, mit dem die Vektoren berechnet wurden.
+            hashes (list[str]): Die Hashes der Texte.
+
+        Returns:
+            dict[str, list[float]]: Die gefundenen Embeddings, nach Hash. Fehlende Hashes sind nicht enthalten.
+        """
+        found = {}
+        stale = [] # Found embeddings whose usage time is older than touch_interval.
+        now = time.time()
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            # SQLite limits the number of parameters per query, so the lookup is done in slices.
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector, last_used FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for row_hash, blob, last_used in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[row_hash] = vector.tolist()
+                    if now - last_used >= self.touch_interval:
+                        stale.append(row_hash)
+            # Mark the found embeddings as recently used, so they are not evicted.
+            if stale:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in stale]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, items: dict[str, list[float]]):
+        """
+        Speichert Embeddings nach Text-Hash und entfernt die am längsten nicht genutzten Einträge,
+        wenn mehr als max_entries Embeddings gespeichert sind.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, array('f', vector).tobytes(), now) for h, vector in items.items()]
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                print(f"Embedding-Cache: {count - self.max_entries} alte Einträge entfernt.")
+            self._conn.commit()
@@ -0,0 +1,212 @@
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor # For sending the LLM requests of all chunk groups at the same time.
+from context_builder import count_tokens # Token counting with the same tokenizer as the context of /chat.
+from llm_service import get_llm_response # Function for communication with the LLM.
+from upstream_scheduler import current_priority, priority_scope # Priority of the requests (e.g. background job).
+
+# Fields that are extracted from every PDF:
+EXTRACTION_FIELDS = [
+    "name",
+    "CO2",
+    "NOX",
+    "Number_of_Electric_Vehicles",
+    "Impact",
+    "Risks",
+    "Opportunities",
+    "Strategy",
+    "Actions",
+    "Adopted_policies",
+    "Targets"
+]
+
+# Search queries used to find the relevant passages for each field in the vector store:
+FIELD_QUERIES = {
+    "name": "Name des Unternehmens, das den Bericht veröffentlicht",
+    "CO2": "CO2-Emissionen, Treibhausgasemissionen Scope 1, Scope 2, Scope 3 in Tonnen",
+    "NOX": "NOx-Emissionen, Stickoxide",
+    "Number_of_Electric_Vehicles": "Anzahl der Elektrofahrzeuge, E-Fahrzeuge in der Flotte",
+    "Impact": "Auswirkungen des Unternehmens auf Umwelt und Klima",
+    "Risks": "Klimabezogene Risiken und Umweltrisiken",
+    "Opportunities": "Chancen durch Nachhaltigkeit und Klimaschutz",
+    "Strategy": "Nachhaltigkeitsstrategie und Klimastrategie",
+    "Actions": "Maßnahmen zur Reduktion von Emissionen",
+    "Adopted_policies": "Verabschiedete Richtlinien und Policies zu Umwelt und Klima",
+    "Targets": "Ziele zur Emissionsreduktion, Klimaziele, Netto-Null"
+}
+
+# Helper function: Builds the prompt with the JSON schema for the LLM:
+def build_extraction_prompt(fields: list[str] = EXTRACTION_FIELDS) -> str:
+    schema = "{\n" + ",\n".join(f'  "{field}": ""' for field in fields) + "\n}"
+    return (
+        "Extrahiere die folgenden Informationen aus dem bereitgestellten Text. "
+        "Gib die Ergebnisse im folgenden JSON-Format zurück:\n\n"
+        f"{schema}\n\n"
+        "Fülle alle Felder basierend auf dem folgenden Kontext so vollständig wie möglich aus."
+    )
+
+# Helper function: Extracts the JSON block from an LLM response:
+def parse_json_response(llm_response: str) -> dict:
+    """
+    Sucht den JSON-Block in einer LLM-Antwort und parst ihn.
+
+    Returns:
+        dict: Die geparsten Daten oder None, wenn kein gültiges JSON-Objekt gefunden wurde.
+    """
+    match = re.search(r'{.*}', llm_response, re.DOTALL)
+    if not match:
+        print("Kein gültiger JSON-Block in der LLM-Antwort gefunden.")
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        print(f"Fehler beim Parsen der JSON-Antwort: {e}")
+        return None
+    return data if isinstance(data, dict) else None
+
+# Helper function: Combines consecutive chunks into groups whose token count fits into the context budget of the LLM:
+def group_chunks(text_chunks: list[str], max_tokens: int, separator: str = "\n\n") -> list[str]:
+    groups = []
+    current = []
+    current_tokens = 0
+    separator_tokens = count_tokens(separator)
+    for chunk in text_chunks:
+        chunk_tokens = count_tokens(chunk)
+        if current and current_tokens + separator_tokens + chunk_tokens > max_tokens:
+            groups.append(separator.join(current))
+            current = []
+            current_tokens = 0
+        if current:
+            current_tokens += separator_tokens
+        current.append(chunk)
+        current_tokens += chunk_tokens # A single chunk above the budget forms its own group.
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+# Answers of the LLM for a field that is not mentioned in the chunk group. They are dropped like empty values,
+# otherwise they would be joined with the real value of another group (e.g. "nicht angegeben; 12.500 t CO2e"):
+NOT_FOUND_VALUES = {
+    "nicht angegeben", "nicht genannt", "nicht gefunden", "nicht vorhanden", "nicht verfügbar", "nicht bekannt",
+    "keine angabe", "keine angaben", "keine information", "keine informationen", "unbekannt",
+    "not specified", "not mentioned", "not found", "not available", "unknown", "n/a", "n.a.", "none", "null", "-"
+}
+
+def _is_empty(value) -> bool:
+    if isinstance(value, str):
+        normalized = value.strip().lower()
+        return not normalized or normalized in NOT_FOUND_VALUES or normalized.rstrip(".!") in NOT_FOUND_VALUES
+    return value is None or (isinstance(value, (list, dict)) and not value)
+
+# Helper function: Merges the partial results of the chunk groups field by field:
+def merge_partial_results(partial_results: list[dict], fields: list[str] = EXTRACTION_FIELDS) -> dict:
+    """
+    Führt die Teilergebnisse mehrerer Chunk-Gruppen feldweise zusammen.
+    Für "name" wird der erste gefundene Wert verwendet, bei allen anderen Feldern werden
+    die unterschiedlichen Werte in Dokumentreihenfolge mit "; " verbunden.
+    """
+    merged = {}
+    for field in fields:
+        values = []
+        for partial in partial_results:
+            value = partial.get(field)
+            if _is_empty(value):
+                continue
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            value = value.strip()
+            if value not in values:
+                values.append(value)
+        if field == "name":
+            merged[field] = values[0] if values else ""
+        else:
+            merged[field] = "; ".join(values)
+    return merged
+
+# Helper function: Runs func for all items concurrently and repeats the calls that returned no result (e.g. ERROR_ANSWER or
+# invalid JSON). A partial extraction is never returned, because it would be stored and served as complete:
+def _run_all_with_retries(func, items: list, max_workers: int, retries: int) -> list:
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                print(f"Wiederhole {len(pending)} fehlgeschlagene Extraktionsanfragen (Versuch {attempt + 1}).")
+            for index, result in zip(pending, executor.map(func, [items[i] for i in pending])):
+                results[index] = result
+            pending = [i for i in pending if results[i] is None]
+            if not pending:
+                return results
+    raise Exception(f"Invalid JSON extracted from LLM response for {len(pending)} of {len(items)} requests.")
+
+def extract_fields_map_reduce(text_chunks: list[str], max_context_tokens: int, max_workers: int = 4, retries: int = 1) -> dict:
+    """
+    Extrahiert die JSON-Felder aus einem langen Dokument: Die Chunks werden zu Gruppen zusammengefasst,
+    die in den Kontext des LLM passen (Map), jede Gruppe wird gleichzeitig ausgewertet und die
+    Teilergebnisse werden anschließend feldweise zusammengeführt (Reduce).
+
+    Args:
+        text_chunks (list[str]): Die Text-Chunks der PDF in Dokumentreihenfolge.
+        max_context_tokens (int): Maximale Anzahl Token des Kontexts pro LLM-Anfrage (ohne Prompt und Antwort).
+        max_workers (int): Maximale Anzahl gleichzeitiger LLM-Anfragen.
+        retries (int): Anzahl der Wiederholungen für Chunk-Gruppen ohne gültiges JSON.
+
+    Returns:
+        dict: Die extrahierten Felder.
+
+    Raises:
+        Exception: Wenn für eine Chunk-Gruppe auch nach allen Wiederholungen kein gültiges JSON erzeugt wurde.
+    """
+    groups = group_chunks(text_chunks, max_context_tokens)
+    prompt = build_extraction_prompt()
+    print(f"JSON-Extraktion über {len(groups)} Chunk-Gruppen.")
+    # The worker threads take over the priority of the caller.
+    priority = current_priority()
+
+    def extract_group(context: str) -> dict:
+        with priority_scope(priority):
+            return parse_json_response(get_llm_response(
+                user_question="Erzeuge JSON-Daten gemäß obigem Schema.",
+                system_prompt=prompt,
+                context=context
+            ))
+
+    partial_results = _run_all_with_retries(extract_group, groups, max_workers, retries)
+    return merge_partial_results(partial_results)
+
+def extract_fields_retrieval(vector_store, k: int = 4, max_workers: int = 4, retries: int = 1) -> dict:
+    """
+    Extrahiert die JSON-Felder mit gezielter Suche: Für jedes Feld werden nur die k relevantesten
+    Chunks aus dem Vector Store gesucht und in einer eigenen, kleinen LLM-Anfrage ausgewertet.
+    Die Anfragen für alle Felder laufen gleichzeitig, die Kosten sind dadurch unabhängig von der Länge des Dokuments.
+
+    Args:
+        vector_store (Chroma | CompactVectorStore): Der Vector Store der PDF.
+        k (int): Anzahl der Chunks pro Feld.
+        max_workers (int): Maximale Anzahl gleichzeitiger LLM-Anfragen.
+        retries (int): Anzahl der Wiederholungen für Felder ohne gültiges JSON.
+
+    Returns:
+        dict: Die extrahierten Felder.
+
+    Raises:
+        Exception: Wenn für ein Feld auch nach allen Wiederholungen kein gültiges JSON erzeugt wurde.
+    """
+    print(f"JSON-Extraktion über gezielte Suche für {len(EXTRACTION_FIELDS)} Felder.")
+    # The worker threads take over the priority of the caller.
+    priority = current_priority()
+
+    def extract_field(field: str) -> dict:
+        with priority_scope(priority):
+            retrieved_docs = vector_store.similarity_search(FIELD_QUERIES[field], k=k)
+            context = "\n\n".join(doc.page_content for doc in retrieved_docs)
+            if not context.strip():
+                return {field: ""}
+            return parse_json_response(get_llm_response(
+                user_question=f"Erzeuge JSON-Daten gemäß obigem Schema. Gesucht: {FIELD_QUERIES[field]}.",
+                system_prompt=build_extraction_prompt([field]),
+                context=context
+            ))
+
+    partial_results = _run_all_with_retries(extract_field, EXTRACTION_FIELDS, max_workers, retries)
+    return merge_partial_results(partial_results)
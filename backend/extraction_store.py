@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3 # Indexed storage of the extracted fields of all PDFs.
+import threading
+import time
+from extraction import EXTRACTION_FIELDS # One column per extracted field.
+
+# Columns by which the query results can be sorted:
+SORT_COLUMNS = ("extracted_at", "name", "pdf_id")
+
+# Helper function: Checks an extraction result against the schema (the fields of EXTRACTION_FIELDS) and normalizes the values:
+def validate_record(record) -> dict:
+    """
+    Prüft ein Extraktionsergebnis und gibt es mit allen Feldern als Text zurück. Fehlende Felder werden
+    leer gesetzt, Listen und Objekte (z. B. vom LLM statt Text geliefert) als JSON-Text gespeichert.
+
+    Raises:
+        ValueError: Wenn das Ergebnis kein JSON-Objekt ist, unbekannte Felder oder ungültige Werte enthält.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Extraction must be a JSON object, got {type(record).__name__}.")
+    unknown = [key for key in record if key not in EXTRACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown extraction fields: {', '.join(map(str, unknown))}.")
+    validated = {}
+    for field in EXTRACTION_FIELDS:
+        value = record.get(field)
+        if value is None:
+            value = ""
+        elif isinstance(value, (list, dict)):
+            value = json.dumps(value, ensure_ascii=False)
+        elif isinstance(value, (int, float, bool)):
+            value = str(value)
+        elif not isinstance(value, str):
+            raise ValueError(f"Invalid value for field '{field}': {type(value).__name__}.")
+        validated[field] = value.strip()
+    return validated
+
+# Helper function: Escapes the wildcards of LIKE, so that user input is searched literally:
+def _like_pattern(text: str) -> str:
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# This class stores the extracted fields of all PDFs in one SQLite table (one row per PDF, one column per field),
+# so that the values of many reports can be filtered and compared with one query instead of reading every JSON file:
+class ExtractionStore:
+    # Constructor for the ExtractionStore class.
+    def __init__(self, db_path: str):
+        self.db_path = db_path # Path to the SQLite file.
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock() # The connection is shared between the request threads and the jobs.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        field_columns = ", ".join(f'"{field}" TEXT NOT NULL DEFAULT \'\'' for field in EXTRACTION_FIELDS)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "pdf_id TEXT PRIMARY KEY, "
+            "extracted_at REAL NOT NULL, "
+            f"{field_columns})"
+        )
+        # Stores created before a field was added to EXTRACTION_FIELDS get the missing column.
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(extractions)")]
+        for field in EXTRACTION_FIELDS:
+            if field not in columns:
+                self._conn.execute(f'ALTER TABLE extractions ADD COLUMN "{field}" TEXT NOT NULL DEFAULT \'\'')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_extracted_at ON extractions (extracted_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_name ON extractions (name COLLATE NOCASE)")
+        self._conn.commit()
+
+    def put(self, pdf_id: str, record: dict, extracted_at: float = None) -> dict:
+        """
+        Prüft das Extraktionsergebnis einer PDF und speichert es (ein vorhandenes Ergebnis wird ersetzt).
+
+        Returns:
+            dict: Das gespeicherte, validierte Ergebnis.
+
+        Raises:
+            ValueError: Wenn das Ergebnis nicht dem Schema entspricht.
+        """
+        validated = validate_record(record)
+        columns = ", ".join(f'"{field}"' for field in EXTRACTION_FIELDS)
+        placeholders = ", ".join("?" * (len(EXTRACTION_FIELDS) + 2))
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO extractions (pdf_id, extracted_at, {columns}) VALUES ({placeholders})",
+                [pdf_id, extracted_at or time.time(), *(validated[field] for field in EXTRACTION_FIELDS)]
+            )
+            self._conn.commit()
+        return validated
+
+    def get(self, pdf_id: str) -> dict:
+        """
+        Gibt das gespeicherte Ergebnis einer PDF zurück oder None, wenn keines gespeichert ist.
+        """
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM extractions WHERE pdf_id = ?", (pdf_id,))
+            row = cursor.fetchone()
+            return self._to_dict(cursor, row) if row else None
+
+    @staticmethod
+    def _to_dict(cursor, row) -> dict:
+        return {column[0]: value for column, value in zip(cursor.description, row)}
+
+    @staticmethod
+    def _where(contains: dict = None, non_empty: list[str] = None, pdf_ids: list[str] = None) -> tuple[str, list]:
+        # Builds the WHERE clause of a query. All conditions must be met.
+        conditions, params = [], []
+        for field, text in (contains or {}).items():
+            if field not in EXTRACTION_FIELDS:
+                raise ValueError(f"Unknown extraction field: {field}.")
+            conditions.append(f"\"{field}\" LIKE ? ESCAPE '\\'")
+            params.append(_like_pattern(text))
+        for field in non_empty or []:
+            if field not in EXTRACTION_FIELDS:
+                raise ValueError(f"Unknown extraction field: {field}.")
+            conditions.append(f"\"{field}\" != ''")
+        if pdf_ids:
+            conditions.append(f"pdf_id IN ({', '.join('?' * len(pdf_ids))})")
+            params.extend(pdf_ids)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def query(self, contains: dict = None, non_empty: list[str] = None, pdf_ids: list[str] = None,
+              sort: str = "extracted_at", descending: bool = True, limit: int = 50, offset: int = 0) -> tuple[list[dict], int]:
+        """
+        Sucht gespeicherte Ergebnisse.
+
+        Args:
+            contains (dict, optional): Feld -> Text, der im Feld vorkommen muss (ohne Beachtung der Groß-/Kleinschreibung).
+            non_empty (list[str], optional): Felder, die nicht leer sein dürfen.
+            pdf_ids (list[str], optional): Nur diese PDFs.
+            sort (str): Spalte für die Sortierung (SORT_COLUMNS).
+            descending (bool): Absteigend sortieren.
+            limit (int): Maximale Anzahl der Ergebnisse (Seitengröße).
+            offset (int): Anzahl der übersprungenen Ergebnisse.
+
+        Returns:
+            tuple[list[dict], int]: Die Ergebnisse der Seite und die Anzahl aller passenden Ergebnisse.
+
+        Raises:
+            ValueError: Bei unbekannten Feldern oder Sortierspalten.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column '{sort}', expected one of {SORT_COLUMNS}.")
+        where, params = self._where(contains, non_empty, pdf_ids)
+        direction = "DESC" if descending else "ASC"
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM extractions{where}", params).fetchone()[0]
+            # pdf_id as second sort key keeps the order stable across pages.
+            cursor = self._conn.execute(
+                f"SELECT * FROM extractions{where} ORDER BY {sort} {direction}, pdf_id {direction} LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            )
+            return [self._to_dict(cursor, row) for row in cursor.fetchall()], total
+
+    def iter_query(self, batch_size: int = 500, **filters):
+        """
+        Gibt alle passenden Ergebnisse nacheinander zurück (für den Export), seitenweise aus der Datenbank gelesen,
+        damit die Verbindung nicht für die ganze Dauer des Exports gesperrt ist.
+        """
+        offset = 0
+        while True:
+            records, _ = self.query(**filters, limit=batch_size, offset=offset)
+            yield from records
+            if len(records) < batch_size:
+                return
+            offset += batch_size
+
+    def import_folder(self, folder: str) -> int:
+        """
+        Übernimmt die JSON-Dateien eines Ordners (z. B. extracted_jsons), deren PDFs noch nicht gespeichert sind.
+        Als Zeitpunkt der Extraktion wird das Änderungsdatum der Datei verwendet.
+
+        Returns:
+            int: Die Anzahl der übernommenen Dateien.
+        """
+        imported = 0
+        for filename in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if not filename.endswith('.json'):
+                continue
+            pdf_id = filename[:-len('.json')] + '.pdf'
+            if self.get(pdf_id) is not None:
+                continue
+            path = os.path.join(folder, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.put(pdf_id, json.load(f), extracted_at=os.path.getmtime(path))
+                imported += 1
+            except (ValueError, OSError) as e:
+                print(f"WARNUNG: '{path}' konnte nicht in den Extraktions-Speicher übernommen werden: {e}")
+        return imported
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.commit()
@@ -0,0 +1,196 @@
+"""
+Lokaler Ersatz für die SAIA-Endpunkte /v1/embeddings und /v1/chat/completions, für Benchmarks ohne
+Zugriff auf chat-ai.academiccloud.de (siehe benchmark.py).
+
+Die Embeddings sind deterministisch (aus dem Hash des Textes erzeugt), gleiche Texte erhalten also
+immer denselben Vektor. Die Latenz der Antworten und ein Anteil an 429-Antworten sind einstellbar.
+Das Backend wird mit SAIA_BASE_URL=http://127.0.0.1:<port>/v1 auf den Ersatz umgeleitet.
+
+Beispiel:
+    python fake_saia.py --port 8089 --embedding-latency 0.05 --chat-latency 0.5
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np # Deterministic random vectors.
+
+# Helper function: Deterministic, normalized vector for a text:
+def fake_embedding(text: str, dimension: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+# Helper function: Answer of the fake LLM. Extraction prompts (with a JSON schema) are answered with filled JSON:
+def fake_answer(messages: list[dict], answer_words: int) -> str:
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    fields = re.findall(r'"(\w+)": ""', prompt)
+    if fields:
+        return json.dumps({field: f"Beispielwert für {field}" for field in fields}, ensure_ascii=False)
+    return " ".join(["Laut dem Dokument"] + ["lorem"] * max(answer_words - 3, 0))
+
+class FakeSAIAConfig:
+    # Constructor for the FakeSAIAConfig class.
+    def __init__(self, dimension: int = 4096, embedding_latency: float = 0.05, embedding_latency_per_text: float = 0.002,
+                 chat_latency: float = 0.5, token_latency: float = 0.01, answer_words: int = 60, rate_limit_ratio: float = 0.0):
+        self.dimension = dimension # Length of the embedding vectors (e5-mistral-7b-instruct: 4096).
+        self.embedding_latency = embedding_latency # Seconds per embedding request.
+        self.embedding_latency_per_text = embedding_latency_per_text # Additional seconds per text in the batch.
+        self.chat_latency = chat_latency # Seconds until the (first token of the) answer.
+        self.token_latency = token_latency # Seconds between two streamed tokens.
+        self.answer_words = answer_words # Length of the chat answers in words.
+        self.rate_limit_ratio = rate_limit_ratio # Share of the requests that are answered with 429.
+
+# This class handles the requests to the fake endpoints:
+class FakeSAIAHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive connections, like the real API.
+
+    def log_message(self, format, *args):
+        pass # No log line per request.
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Counters of the received requests, e.g. to check how many upstream calls a benchmark caused.
+        if self.path.rstrip('/').endswith('/stats'):
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        path = self.path.rstrip('/')
+        config = self.server.config
+        endpoint = "embeddings" if path.endswith('/embeddings') else "chat" if path.endswith('/chat/completions') else None
+        if endpoint is None:
+            self._send_json(404, {"error": "not found"})
+            return
+
+        with self.server.stats_lock:
+            self.server.stats[f"{endpoint}_requests"] += 1
+            rate_limited = self.server.random.random() < config.rate_limit_ratio
+            if rate_limited:
+                self.server.stats["rate_limited"] += 1
+        if rate_limited:
+            self._send_json(429, {"error": "rate limit exceeded"})
+            return
+
+        if endpoint == "embeddings":
+            texts = payload.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            with self.server.stats_lock:
+                self.server.stats["embedded_texts"] += len(texts)
+            time.sleep(config.embedding_latency + config.embedding_latency_per_text * len(texts))
+            self._send_json(200, {
+                "object": "list",
+                "model": payload.get("model"),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text, config.dimension)} for i, text in enumerate(texts)],
+                "usage": {"prompt_tokens": sum(len(text) // 4 for text in texts), "total_tokens": sum(len(text) // 4 for text in texts)}
+            })
+            return
+
+        messages = payload.get("messages", [])
+        answer = fake_answer(messages, config.answer_words)
+        prompt_tokens = sum(len(str(message.get("content", ""))) // 4 for message in messages)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        time.sleep(config.chat_latency)
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(answer) // 4, "total_tokens": prompt_tokens + len(answer) // 4}
+            })
+            return
+
+        # Streaming: one Server-Sent-Event per word, the connection is closed at the end.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        words = re.findall(r'\S+\s*', answer)
+        for index, word in enumerate(words):
+            if index:
+                time.sleep(config.token_latency)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": "stop" if index == len(words) - 1 else None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+def start_fake_saia(config: FakeSAIAConfig, host: str = "127.0.0.1", port: int = 0, seed: int = 0) -> ThreadingHTTPServer:
+    """
+    Startet den Ersatz in einem Hintergrund-Thread.
+
+    Args:
+        config (FakeSAIAConfig): Latenzen und Verhalten der Endpunkte.
+        port (int): Port des Servers, 0 wählt einen freien Port.
+        seed (int): Startwert für die zufälligen 429-Antworten.
+
+    Returns:
+        ThreadingHTTPServer: Der laufende Server. Die Basis-URL ist f"http://{host}:{server.server_port}/v1",
+        beendet wird er mit server.shutdown().
+    """
+    server = ThreadingHTTPServer((host, port), FakeSAIAHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.random = random.Random(seed)
+    server.stats = {"embeddings_requests": 0, "embedded_texts": 0, "chat_requests": 0, "rate_limited": 0}
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="fake-saia", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler Ersatz für die SAIA-Endpunkte (Embeddings und Chat).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dimension", type=int, default=4096, help="Länge der Embedding-Vektoren.")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Sekunden pro Embedding-Anfrage.")
+    parser.add_argument("--embedding-latency-per-text", type=float, default=0.002, help="Zusätzliche Sekunden pro Text.")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="Sekunden bis zur (ersten) Antwort des LLM.")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Sekunden zwischen zwei gestreamten Token.")
+    parser.add_argument("--answer-words", type=int, default=60, help="Länge der Chat-Antworten in Wörtern.")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Anteil der Anfragen, die mit 429 beantwortet werden.")
+    args = parser.parse_args()
+
+    config = FakeSAIAConfig(
+        dimension=args.dimension,
+        embedding_latency=args.embedding_latency,
+        embedding_latency_per_text=args.embedding_latency_per_text,
+        chat_latency=args.chat_latency,
+        token_latency=args.token_latency,
+        answer_words=args.answer_words,
+        rate_limit_ratio=args.rate_limit_ratio
+    )
+    server = start_fake_saia(config, host=args.host, port=args.port)
+    print(f"SAIA-Ersatz läuft unter http://{args.host}:{server.server_port}/v1 (Strg+C zum Beenden).")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
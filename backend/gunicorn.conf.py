@@ -0,0 +1,37 @@
+# Gunicorn configuration for the production mode of the backend (used by the Dockerfile):
+#   gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = "0.0.0.0:5000"
+
+# ChromaDB runs embedded (PersistentClient) and must only be opened by one process, otherwise the
+# collections of different processes diverge. That is why there is one worker process, and concurrency
+# comes from its threads: The requests wait mostly for the SAIA embedding and LLM services, during which
+# Python releases the GIL, so a slow /chat request does not block the others.
+# All threads share the ChromaDB client, the embedding wrapper, the LLM client and the caches, which are
+# initialized once when app.py is imported by the worker.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# The app is not preloaded in the master process: Forking after SQLite connections and
+# background threads were created is not safe. With a single worker there is nothing to share anyway.
+preload_app = False
+
+# Streaming responses (/chat/stream) can take as long as the LLM generation.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+# On SIGTERM running requests get this many seconds to finish before the worker is stopped.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+# Called in the worker process when it shuts down: Stops accepting new background jobs.
+# Jobs that were still queued are marked as interrupted at the next start.
+def worker_exit(server, worker):
+    try:
+        from app import job_queue
+        job_queue.shutdown()
+    except Exception as e:
+        server.log.warning(f"Job-Queue konnte nicht sauber beendet werden: {e}")
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+import traceback # For detailed stack traces (error information).
+import uuid # For generating unique job IDs.
+from concurrent.futures import ThreadPoolExecutor # Worker pool with bounded concurrency.
+from upstream_scheduler import PRIORITY_BACKGROUND, priority_scope # Jobs yield to interactive requests.
+
+# Possible states of a job:
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# This class runs long-running tasks (e.g. PDF ingestion) in the background and persists their state as JSON files.
+# Finished jobs are removed (in memory and on disk) after retention_seconds or when more than max_finished_jobs exist:
+class JobQueue:
+    # Constructor for the JobQueue class.
+    def __init__(self, state_dir: str, max_workers: int = 2, retention_seconds: float = 7 * 24 * 3600, max_finished_jobs: int = 1000):
+        self.state_dir = state_dir # Folder in which one JSON file per job is stored.
+        self.retention_seconds = retention_seconds # How long the state of a finished job can still be queried.
+        self.max_finished_jobs = max_finished_jobs # Upper limit for the number of kept finished jobs.
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._lock = threading.Lock() # Protects self._jobs against concurrent access from workers and requests.
+        self._jobs = {}
+        self._load_existing_jobs()
+        with self._lock:
+            self._prune_finished_jobs()
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _load_existing_jobs(self):
+        """
+        Lädt gespeicherte Jobs von der Festplatte. Jobs, die beim letzten Beenden des Prozesses
+        noch liefen oder in der Warteschlange standen, werden als fehlgeschlagen markiert.
+        """
+        for filename in os.listdir(self.state_dir):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, filename), 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except Exception as e:
+                print(f"WARNUNG: Job-Datei '{filename}' konnte nicht gelesen werden: {e}")
+                continue
+
+            if job.get("status") in (JOB_QUEUED, JOB_RUNNING):
+                job["status"] = JOB_FAILED
+                job["error"] = "Job wurde durch einen Neustart des Servers unterbrochen."
+                job["updated_at"] = time.time()
+                self._persist(job)
+            self._jobs[job["id"]] = job
+
+    def _persist(self, job: dict):
+        # Write to a temporary file first and then replace, so that a crash never leaves a half-written job file.
+        path = self._job_path(job["id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _prune_finished_jobs(self):
+        """
+        Entfernt abgeschlossene Jobs, die älter als retention_seconds sind, und die ältesten abgeschlossenen Jobs
+        über max_finished_jobs hinaus. Wartende und laufende Jobs bleiben immer erhalten. Muss mit self._lock aufgerufen werden.
+        """
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] in (JOB_DONE, JOB_FAILED)),
+            key=lambda job: job["updated_at"]
+        )
+        cutoff = time.time() - self.retention_seconds
+        expired = [job for job in finished if job["updated_at"] < cutoff]
+        kept = finished[len(expired):]
+        expired += kept[:max(0, len(kept) - self.max_finished_jobs)]
+        for job in expired:
+            del self._jobs[job["id"]]
+            try:
+                os.remove(self._job_path(job["id"]))
+            except FileNotFoundError:
+                pass
+        if expired:
+            print(f"{len(expired)} abgeschlossene Jobs entfernt.")
+
+    def submit(self, func, *args, stages: list[str] = None, **kwargs) -> str:
+        """
+        Legt einen neuen Job an und führt ihn im Worker-Pool aus.
+
+        Args:
+            func: Die auszuführende Funktion. Sie erhält die Job-ID als erstes Argument.
+            stages (list[str], optional): Die Namen der Verarbeitungsschritte, für die Fortschrittsanzeige.
+
+        Returns:
+            str: Die ID des angelegten Jobs.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "id": job_id,
+            "status": JOB_QUEUED,
+            "stage": None,
+            "stages": stages or [],
+            "progress": 0.0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        with self._lock:
+            self._prune_finished_jobs()
+            self._jobs[job_id] = job
+            self._persist(job)
+
+        self._executor.submit(self._run, job_id, func, *args, **kwargs)
+        return job_id
+
+    def _run(self, job_id: str, func, *args, **kwargs):
+        self.update(job_id, status=JOB_RUNNING)
+        try:
+            # Upstream requests of background jobs wait behind those of waiting users (e.g. /chat).
+            with priority_scope(PRIORITY_BACKGROUND):
+                result = func(job_id, *args, **kwargs)
+            self.update(job_id, status=JOB_DONE, stage=None, progress=1.0, result=result)
+        except Exception as e:
+            print(f"FEHLER: Job '{job_id}' fehlgeschlagen: {e}")
+            traceback.print_exc()
+            self.update(job_id, status=JOB_FAILED, error=str(e))
+
+    def update(self, job_id: str, **fields):
+        """
+        Aktualisiert die Felder eines Jobs und speichert ihn auf der Festplatte.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = time.time()
+            self._persist(job)
+
+    def set_stage(self, job_id: str, stage: str):
+        """
+        Setzt den aktuellen Verarbeitungsschritt eines Jobs und berechnet den Fortschritt
+        anhand der Position des Schritts in der Liste der Schritte.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            stages = job["stages"] if job else []
+        progress = stages.index(stage) / len(stages) if stage in stages else 0.0
+        self.update(job_id, stage=stage, progress=round(progress, 2))
+
+    def get(self, job_id: str) -> dict:
+        """
+        Gibt eine Kopie des Job-Zustands zurück oder None, wenn der Job unbekannt ist.
+        Jobs, die ein anderer Prozess angelegt hat, werden von der Festplatte gelesen.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        # The job ID is used as file name, so only plain IDs are accepted.
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def shutdown(self, wait: bool = True):
+        """
+        Beendet den Worker-Pool. Laufende Jobs werden abgeschlossen (wenn wait=True),
+        Jobs in der Warteschlange werden verworfen und beim nächsten Start als unterbrochen markiert.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
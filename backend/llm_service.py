@@ -1,34 +1,108 @@
+import hashlib
+import json
 import os
-from openai import OpenAI
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Iterator
 from dotenv import load_dotenv
+from context_builder import count_tokens # Token estimate if the response contains no usage information.
+from metrics import STAGE_SECONDS, TOKENS, timed # Latency and token metrics for /metrics.
+from upstream_scheduler import PrioritySemaphore, SingleFlight, wait_for_rate_limit # Shared rate limit and priorities.
+
+# Die openai-Bibliothek (und httpx) wird erst beim Erstellen des ersten Clients importiert, da der Import lange dauert.
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI
 
 # Lade Umgebungsvariablen aus der .env-Datei.
 load_dotenv()
 
-def get_llm_response(user_question: str, system_prompt: str = "You are a helpful assistant", context: str = "") -> str:
-    """
-    Sendet eine Anfrage an das GWDG LLM und gibt die Antwort zurück.
-    Unterstützt optional Retrieval Augmented Generation (RAG) durch Kontextübergabe.
+MODEL = "meta-llama-3.1-8b-instruct"
+# Kann mit SAIA_BASE_URL überschrieben werden (z. B. für den lokalen Ersatz in fake_saia.py).
+BASE_URL = os.getenv("SAIA_BASE_URL", "https://chat-ai.academiccloud.de/v1")
 
-    Args:
-        user_question (str): Die Benutzerfrage.
-        system_prompt (str): Der System-Prompt zur Steuerung des LLM-Verhaltens.
-        context (str): Optionaler Kontext (z. B. ein Dokumentenausschnitt).
+# Antwort, die bei Fehlern in der Kommunikation mit dem LLM zurückgegeben wird.
+ERROR_ANSWER = "Entschuldigung, es gab ein Problem bei der Kommunikation mit dem KI-Modell."
 
-    Returns:
-        str: Die LLM-Antwort.
-    """
+# Konfiguration: Timeout pro Anfrage (Sekunden), maximale Anzahl gleichzeitiger Anfragen und Wiederholungen.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Anzahl der Plätze, die Hintergrund-Jobs (JSON-Extraktion) höchstens belegen, der Rest bleibt für den Chat frei.
+LLM_BACKGROUND_MAX_CONCURRENCY = int(os.getenv("LLM_BACKGROUND_MAX_CONCURRENCY", str(max(1, LLM_MAX_CONCURRENCY - 2))))
+
+# Fehler, nach denen eine Anfrage wiederholt wird (Rate Limit, Serverfehler, Verbindungsprobleme).
+def _retryable_errors() -> tuple:
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (RateLimitError, InternalServerError, APIConnectionError, APITimeoutError)
 
+# Gemeinsamer Client für alle Anfragen, damit Verbindungen (inkl. TLS-Handshake) wiederverwendet werden.
+_client = None
+_client_lock = threading.Lock()
+_concurrency_limit = PrioritySemaphore(LLM_MAX_CONCURRENCY, LLM_BACKGROUND_MAX_CONCURRENCY)
+# Identische Anfragen, die gleichzeitig laufen (z. B. dieselbe Frage mehrfach), werden nur einmal gesendet.
+_in_flight = SingleFlight()
+
+def _get_api_key() -> str:
     api_key = os.getenv("SAIA_API_KEY")
     if not api_key:
         raise ValueError("API-Schlüssel für den LLM-Dienst fehlt. Bitte GWDG_LLM_API_KEY als Umgebungsvariable setzen.")
+    return api_key
+
+def _pool_limits() -> "httpx.Limits":
+    import httpx # HTTP client used by the OpenAI library, configured here for connection pooling.
+    return httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY)
+
+def get_client() -> "OpenAI":
+    """
+    Gibt den gemeinsamen OpenAI-Client zurück und erstellt ihn beim ersten Aufruf.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from openai import OpenAI
+            _client = OpenAI(
+                api_key=_get_api_key(),
+                base_url=BASE_URL,
+                max_retries=0, # Wiederholungen übernimmt _create_completion() mit Jitter.
+                http_client=httpx.Client(limits=_pool_limits(), timeout=LLM_TIMEOUT)
+            )
+        return _client
+
+def _retry_delay(attempt: int) -> float:
+    # Exponential backoff with "full jitter", so that many waiting requests do not retry at the same moment.
+    return random.uniform(0, min(2 ** attempt, 30))
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://chat-ai.academiccloud.de/v1"
-    )
-    model = "meta-llama-3.1-8b-instruct"
+def _create_completion(client: "OpenAI", messages: list[dict], stream: bool = False):
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        # Embeddings and LLM share the rate limit of the API key, waiting chat requests go first.
+        wait_for_rate_limit(client.api_key)
+        try:
+            return client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=0.0,
+                stream=stream
+            )
+        except _retryable_errors() as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = _retry_delay(attempt)
+            print(f"WARNUNG: LLM-Anfrage fehlgeschlagen ({e}), neuer Versuch in {delay:.1f} s.")
+            time.sleep(delay)
 
+# Helper function: Counts the prompt and completion tokens of a request:
+def _count_usage(messages: list[dict], answer: str, usage=None):
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        TOKENS.inc(usage.prompt_tokens, kind="llm_prompt")
+        TOKENS.inc(usage.completion_tokens or 0, kind="llm_completion")
+    else:
+        TOKENS.inc(sum(count_tokens(message["content"]) for message in messages), kind="llm_prompt")
+        TOKENS.inc(count_tokens(answer), kind="llm_completion")
+
+def _build_messages(user_question: str, system_prompt: str, context: str) -> list[dict]:
     messages = [{"role": "system", "content": system_prompt}]
 
     if context:
@@ -41,14 +115,75 @@ def get_llm_response(user_question: str, system_prompt: str = "You are a helpful
         user_content = user_question
 
     messages.append({"role": "user", "content": user_content})
+    return messages
+
+def get_llm_response(user_question: str, system_prompt: str = "You are a helpful assistant", context: str = "") -> str:
+    """
+    Sendet eine Anfrage an das GWDG LLM und gibt die Antwort zurück.
+    Unterstützt optional Retrieval Augmented Generation (RAG) durch Kontextübergabe.
+
+    Args:
+        user_question (str): Die Benutzerfrage.
+        system_prompt (str): Der System-Prompt zur Steuerung des LLM-Verhaltens.
+        context (str): Optionaler Kontext (z. B. ein Dokumentenausschnitt).
+
+    Returns:
+        str: Die LLM-Antwort.
+    """
+
+    client = get_client()
+    messages = _build_messages(user_question, system_prompt, context)
+
+    def request_answer() -> str:
+        try:
+            with _concurrency_limit.slot(), timed("get_llm_response"):
+                response = _create_completion(client, messages)
+            answer = response.choices[0].message.content.strip()
+            _count_usage(messages, answer, getattr(response, "usage", None))
+            return answer
+        except Exception as e:
+            print(f"Fehler bei der LLM-Anfrage: {e}")
+            return ERROR_ANSWER
+
+    key = hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest()
+    return _in_flight.do(key, request_answer)
+
+def stream_llm_response(user_question: str, system_prompt: str = "You are a helpful assistant", context: str = "", on_complete=None) -> Iterator[str]:
+    """
+    Wie get_llm_response, gibt die Antwort aber stückweise zurück, sobald das LLM sie erzeugt.
+    Bricht der Stream ab, folgt auf die bereits gesendeten Textstücke ERROR_ANSWER.
+
+    Args:
+        user_question (str): Die Benutzerfrage.
+        system_prompt (str): Der System-Prompt zur Steuerung des LLM-Verhaltens.
+        context (str): Optionaler Kontext (z. B. ein Dokumentenausschnitt).
+        on_complete (callable, optional): Wird mit der vollständigen Antwort aufgerufen, aber nur wenn der Stream
+                                          ohne Fehler zu Ende gelaufen ist (z. B. zum Speichern im Antwort-Cache).
+
+    Yields:
+        str: Die nächsten Textstücke der LLM-Antwort.
+    """
+
+    client = get_client()
+    messages = _build_messages(user_question, system_prompt, context)
 
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0.0
-        )
-        return response.choices[0].message.content.strip()
+        with _concurrency_limit.slot(), timed("get_llm_response"):
+            started = time.perf_counter()
+            stream = _create_completion(client, messages, stream=True)
+            answer_parts = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not answer_parts:
+                        # Time until the first text arrives, i.e. the waiting time the user notices.
+                        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                    answer_parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            _count_usage(messages, "".join(answer_parts))
     except Exception as e:
         print(f"Fehler bei der LLM-Anfrage: {e}")
-        return "Entschuldigung, es gab ein Problem bei der Kommunikation mit dem KI-Modell."
\ No newline at end of file
+        yield ERROR_ANSWER
+        return
+    # Only a complete answer is passed on, a stream that broke off after some tokens is not.
+    if on_complete is not None:
+        on_complete("".join(answer_parts).strip())
@@ -0,0 +1,146 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+# Upper bounds of the latency buckets in seconds (from fast local steps up to long LLM extractions):
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# All created metrics, in the order in which they appear in /metrics:
+_registry = []
+
+# Helper function: Escapes a label value (backslash, double quote and line break must be escaped):
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Helper function: Formats the labels of a sample in the Prometheus text format:
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+# Helper function: Formats a number, whole numbers without decimal places:
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+# This class counts events or amounts (e.g. tokens, bytes) per label combination:
+class Counter:
+    # Constructor for the Counter class.
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {} # Label values (tuple) -> counter value.
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+# This class records the distribution of measured values (e.g. durations) in cumulative buckets:
+class Histogram:
+    # Constructor for the Histogram class.
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {} # Label values (tuple) -> [counts per bucket, sum, count].
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Misst die Dauer des with-Blocks in Sekunden, auch wenn er mit einer Exception endet.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(upper_bound)})} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+def render() -> str:
+    """
+    Gibt alle Metriken im Textformat von Prometheus zurück (für die Route /metrics).
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Metrics of the processing pipeline:
+STAGE_SECONDS = Histogram("pipeline_stage_duration_seconds", "Duration of the processing stages (read_pdf, split_text, embed_documents, similarity_search, get_llm_response, ...).", ("stage",))
+TOKENS = Counter("pipeline_tokens_total", "Processed tokens by kind (chunk, context, llm_prompt, llm_completion).", ("kind",))
+BYTES = Counter("pipeline_bytes_total", "Processed bytes by kind (pdf_upload, embedding_request, embedding_response).", ("kind",))
+EMBEDDING_TEXTS = Counter("embedding_texts_total", "Texts passed to embed_documents by source of the embedding (cache, api).", ("source",))
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Duration of the HTTP requests until the response is returned (for streams: until streaming starts).", ("endpoint", "method", "status"))
+
+def timed(stage: str):
+    """
+    Kontextmanager, der die Dauer eines Verarbeitungsschritts misst.
+
+    Beispiel:
+        with timed("similarity_search"):
+            docs = vector_store.similarity_search(question, k=5)
+    """
+    return STAGE_SECONDS.time(stage=stage)
+
+# This class measures the time spent producing the items of an iterator, e.g. reading PDF pages while they are chunked:
+class TimedIterator:
+    # Constructor for the TimedIterator class.
+    def __init__(self, iterable: Iterable, stage: str = None):
+        self._iterator = iter(iterable)
+        self.stage = stage # None: only measure (self.seconds), do not record a stage.
+        self.seconds = 0.0 # Time spent in the wrapped iterator so far.
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            # The iterator is exhausted: the total time is recorded once.
+            self.seconds += time.perf_counter() - started
+            if self.stage is not None:
+                STAGE_SECONDS.observe(self.seconds, stage=self.stage)
+            raise
+        self.seconds += time.perf_counter() - started
+        return item
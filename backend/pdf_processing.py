@@ -1,20 +1,73 @@
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter 
+import re
+import hashlib
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+from context_builder import count_tokens
+# PyPDF2 und LangChain werden erst bei der ersten Verwendung importiert, damit das Backend schneller startet.
 
-def read_pdf(file_path: str) -> str:
+# Maximale Eingabelänge des Embedding-Modells e5-mistral-7b-instruct in Token.
+EMBEDDING_MAX_TOKENS = 4096
+
+def content_pdf_id(file_bytes: bytes) -> str:
+    """
+    Erzeugt die ID einer PDF aus dem SHA-256-Hash ihres Inhalts, identische Dateien erhalten also dieselbe ID.
+    Auf 32 Zeichen gekürzt, da ChromaDB-Sammlungsnamen höchstens 63 Zeichen lang sein dürfen.
+    """
+    return hashlib.sha256(file_bytes).hexdigest()[:32] + ".pdf"
+
+def _extract_page_range(file_path: str, start: int, end: int) -> list[tuple[int, str]]:
+    """
+    Liest die Seiten start bis end (exklusiv) einer PDF-Datei.
+    Wird in einem eigenen Prozess ausgeführt und öffnet die Datei deshalb selbst.
+    """
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    return [(page_number + 1, reader.pages[page_number].extract_text() or "") for page_number in range(start, end)]
+
+def iter_pdf_pages(file_path: str, max_workers: int = 1, pages_per_task: int = 16) -> Iterator[tuple[int, str]]:
+    """
+    Liest eine PDF-Datei seitenweise und gibt (Seitennummer, Text) zurück, sobald eine Seite gelesen ist.
+    Die Seitennummern beginnen bei 1. Seiten ohne Text werden übersprungen.
+
+    Args:
+        file_path (str): Der Pfad zur PDF-Datei.
+        max_workers (int): Anzahl der Prozesse. Bei mehr als 1 werden Seitenbereiche parallel gelesen.
+        pages_per_task (int): Anzahl der Seiten, die ein Prozess pro Aufgabe liest.
+
+    Yields:
+        tuple[int, str]: Seitennummer und extrahierter Text, in Seitenreihenfolge.
+    """
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+
+    if max_workers <= 1 or page_count <= pages_per_task:
+        for page_number, page in enumerate(reader.pages, start=1):
+            extracted_text = page.extract_text()
+            if extracted_text: # Nur nicht-leeren Text zurückgeben
+                yield page_number, extracted_text
+        return
+
+    starts = list(range(0, page_count, pages_per_task))
+    ends = [min(start + pages_per_task, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # map() liefert die Ergebnisse in Reihenfolge, sobald der jeweilige Seitenbereich fertig ist.
+        for pages in executor.map(_extract_page_range, [file_path] * len(starts), starts, ends):
+            for page_number, extracted_text in pages:
+                if extracted_text:
+                    yield page_number, extracted_text
+
+def read_pdf(file_path: str, max_workers: int = 1) -> str:
     """
     Liest den Text aus einer PDF-Datei.
     Gibt den gesamten Text der PDF als einen einzelnen String zurück.
     """
-    content = ""
     try:
-        reader = PdfReader(file_path)
-        for page in reader.pages:
-            extracted_text = page.extract_text()
-            if extracted_text: # Füge nur nicht-leeren Text hinzu
-                content += extracted_text + "\n"
-        print(f"PDF '{file_path}' gelesen. Gesamtlänge: {len(content.strip())} Zeichen.")
-        return content.strip()
+        content = "\n".join(text for _, text in iter_pdf_pages(file_path, max_workers=max_workers)).strip()
+        print(f"PDF '{file_path}' gelesen. Gesamtlänge: {len(content)} Zeichen.")
+        return content
     except Exception as e:
         print(f"FEHLER: Ein Fehler ist aufgetreten beim Lesen der PDF '{file_path}': {e}")
         return ""
@@ -24,6 +77,7 @@ def split_text_into_sections(text: str) -> list[str]:
     Teilt einen längeren Text in kleinere, überlappende Abschnitte (Chunks) auf.
     Verwendet LangChain's RecursiveCharacterTextSplitter.
     """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,    # Maximale Zeichen pro Chunk
         chunk_overlap=200,  # Überlappung zwischen Chunks, um Kontext zu erhalten
@@ -34,3 +88,188 @@ def split_text_into_sections(text: str) -> list[str]:
     chunks = text_splitter.split_text(text)
     print(f"Text in {len(chunks)} Chunks aufgeteilt.")
     return chunks
+
+# Muster für die Erkennung von Überschriften ("2.1 Klimaziele") und Zahlen (Tabellenzeilen).
+_NUMBERED_HEADING_PATTERN = re.compile(r'^\d+(\.\d+)*\.?\s+\S')
+_NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+
+def _classify_line(line: str) -> str:
+    """
+    Ordnet eine Zeile als "table" (mindestens drei Zahlen), "heading" oder "text" ein.
+    Überschriften sind kurz, enden nicht mit Satzzeichen und sind nummeriert,
+    in Großbuchstaben geschrieben oder alle längeren Wörter beginnen groß.
+    """
+    stripped = line.strip()
+    if len(_NUMBER_PATTERN.findall(stripped)) >= 3:
+        return "table"
+    words = stripped.split()
+    if len(words) > 8 or stripped[-1] in ".,;:!?":
+        return "text"
+    if _NUMBERED_HEADING_PATTERN.match(stripped) or (stripped.isupper() and len(stripped) >= 4):
+        return "heading"
+    if all(word[0].isupper() for word in words if len(word) > 3) and words[0][0].isupper():
+        return "heading"
+    return "text"
+
+def _page_units(page_text: str, max_tokens: int) -> list[dict]:
+    """
+    Zerlegt den Text einer Seite in Zeilen mit Start-/End-Offset, Tokenanzahl und Art.
+    Zeilen, die länger als max_tokens sind, werden an Wortgrenzen weiter aufgeteilt.
+    """
+    units = []
+    for match in re.finditer(r'[^\n]+', page_text):
+        line = match.group(0)
+        if not line.strip():
+            continue
+        kind = _classify_line(line)
+        tokens = count_tokens(line)
+        if tokens <= max_tokens:
+            units.append({"start": match.start(), "end": match.end(), "tokens": tokens, "kind": kind})
+            continue
+        # Overlong line (e.g. text without line breaks): split into word groups.
+        span_start, span_end, span_tokens = None, None, 0
+        for word in re.finditer(r'\S+', line):
+            word_tokens = count_tokens(" " + word.group(0))
+            if span_start is not None and span_tokens + word_tokens > max_tokens:
+                units.append({"start": match.start() + span_start, "end": match.start() + span_end, "tokens": span_tokens, "kind": "text"})
+                span_start, span_tokens = None, 0
+            if span_start is None:
+                span_start = word.start()
+            span_end = word.end()
+            span_tokens += word_tokens
+        if span_start is not None:
+            units.append({"start": match.start() + span_start, "end": match.start() + span_end, "tokens": span_tokens, "kind": "text"})
+    return units
+
+def _chunk_page(page_number: int, page_text: str, max_tokens: int, overlap_tokens: int) -> Iterator[dict]:
+    """
+    Fasst die Zeilen einer Seite zu Chunks mit höchstens max_tokens Token zusammen.
+    Eine Überschrift beginnt einen neuen Chunk, Tabellenzeilen bleiben nach Möglichkeit zusammen
+    und bei einer Trennung wegen der Größe überlappen aufeinanderfolgende Chunks um bis zu overlap_tokens Token.
+    """
+    def make_chunk(units: list[dict]) -> dict:
+        start, end = units[0]["start"], units[-1]["end"]
+        return {
+            "text": page_text[start:end],
+            "page": page_number,
+            "start": start,
+            "end": end,
+            "tokens": sum(unit["tokens"] for unit in units)
+        }
+
+    current = []
+    current_tokens = 0
+    for unit in _page_units(page_text, max_tokens):
+        starts_section = unit["kind"] == "heading" and current_tokens >= max_tokens // 4
+        if current and (starts_section or current_tokens + unit["tokens"] > max_tokens):
+            next_units = []
+            if not starts_section:
+                # Keep a table together: move the table rows at the end of the current chunk into the next one.
+                table_run = []
+                if unit["kind"] == "table":
+                    for previous in reversed(current):
+                        if previous["kind"] != "table":
+                            break
+                        table_run.insert(0, previous)
+                if table_run and len(table_run) < len(current) and sum(u["tokens"] for u in table_run) <= max_tokens // 2:
+                    current = current[:-len(table_run)]
+                    next_units = table_run
+                else:
+                    # Overlap: repeat the last lines of the current chunk at the start of the next one.
+                    overlap = 0
+                    for previous in reversed(current):
+                        if overlap + previous["tokens"] > overlap_tokens:
+                            break
+                        next_units.insert(0, previous)
+                        overlap += previous["tokens"]
+            yield make_chunk(current)
+            current = next_units
+            current_tokens = sum(u["tokens"] for u in current)
+            if current_tokens + unit["tokens"] > max_tokens:
+                current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit["tokens"]
+    if current:
+        yield make_chunk(current)
+
+def iter_chunks(pages: Iterable[tuple[int, str]], max_tokens: int = 512, overlap_tokens: int = 64) -> Iterator[dict]:
+    """
+    Teilt die Seiten einer PDF in Chunks auf, gemessen in Token statt in Zeichen.
+    Chunks gehen nie über eine Seitengrenze hinaus und beachten Überschriften und Tabellen.
+    Arbeitet als Generator: Die Seiten werden nacheinander verarbeitet, sodass Chunks schon
+    eingebettet werden können, während spätere Seiten noch gelesen werden.
+
+    Args:
+        pages (Iterable[tuple[int, str]]): (Seitennummer, Text), z. B. von iter_pdf_pages().
+        max_tokens (int): Maximale Tokenanzahl pro Chunk (höchstens EMBEDDING_MAX_TOKENS).
+        overlap_tokens (int): Maximale Überlappung aufeinanderfolgender Chunks einer Seite in Token.
+
+    Yields:
+        dict: Chunk mit "text", "page", "start" und "end" (Zeichen-Offsets in der Seite) sowie "tokens".
+    """
+    if max_tokens > EMBEDDING_MAX_TOKENS:
+        raise ValueError(f"max_tokens darf höchstens {EMBEDDING_MAX_TOKENS} betragen (Limit des Embedding-Modells).")
+    for page_number, page_text in pages:
+        yield from _chunk_page(page_number, page_text, max_tokens, overlap_tokens)
+
+class PdfReadError(Exception):
+    """
+    Fehler beim Lesen oder Aufteilen einer PDF in iter_chunk_batches(), die ursprüngliche Exception ist __cause__.
+    """
+
+def iter_chunk_batches(chunks: Iterable[dict], batch_size: int, prefetch: int = 2) -> Iterator[list[dict]]:
+    """
+    Fasst Chunks zu Batches zusammen. Die Chunks werden in einem Hintergrund-Thread erzeugt, damit spätere
+    Seiten gelesen werden, während der aktuelle Batch eingebettet wird. Höchstens prefetch Batches werden
+    im Voraus gelesen, der Speicherbedarf hängt also nicht von der Länge des Dokuments ab.
+
+    Args:
+        chunks (Iterable[dict]): Die Chunks, z. B. von iter_chunks().
+        batch_size (int): Anzahl der Chunks pro Batch.
+        prefetch (int): Maximale Anzahl fertiger Batches, die auf die Verarbeitung warten.
+
+    Yields:
+        list[dict]: Die Batches in Dokumentreihenfolge.
+
+    Raises:
+        PdfReadError: Wenn beim Lesen oder Aufteilen ein Fehler auftritt.
+    """
+    batches = queue.Queue(maxsize=max(1, prefetch))
+    stopped = threading.Event() # Set when the consumer stops early (e.g. after an embedding error).
+    finished = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(finished)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=produce, name="pdf-reader", daemon=True).start()
+    try:
+        while True:
+            item = batches.get()
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise PdfReadError(str(item)) from item
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,84 @@
+"""
+Startprofil des Backends: Importiert app.py in einem eigenen Prozess mit "python -X importtime",
+führt danach das Warm-up aus und gibt aus, welche Pakete wie viel Importzeit kosten und wie lange
+der Import von app.py und die einzelnen Warm-up-Schritte gedauert haben.
+
+Das Warm-up läuft hier im Hauptthread (nicht im Hintergrund), damit die Importzeiten nicht durch
+gleichzeitige Importe verfälscht werden.
+
+Beispiel:
+    python startup_profile.py --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Code of the child process: imports the app, runs the warm-up and prints the startup profile as last line.
+CHILD_CODE = (
+    "import json, time\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "imported = time.perf_counter() - started\n"
+    "app.warm_up(0)\n"
+    "print('STARTUP_PROFILE ' + json.dumps({'import_seconds': round(imported, 3), 'ready_seconds': round(time.perf_counter() - started, 3), "
+    "'steps': app.startup_profile}), flush=True)\n"
+)
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """
+    Liest die Ausgabe von -X importtime.
+
+    Returns:
+        list[tuple[str, int, int]]: (Modul, eigene Zeit in µs, kumulierte Zeit in µs) pro importiertem Modul.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Importzeiten und Warm-up-Dauer des Backends messen.")
+    parser.add_argument("--top", type=int, default=15, help="Anzahl der ausgegebenen Pakete.")
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, "BACKGROUND_WARMUP": "false"}
+    env.setdefault("SAIA_API_KEY", "startup-profile") # app.py requires a key, no request is sent.
+    # The app creates its data folders in the working directory, so a temporary folder is used.
+    with tempfile.TemporaryDirectory(prefix="startup-profile-") as workdir:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD_CODE],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    profile_lines = [line for line in completed.stdout.splitlines() if line.startswith("STARTUP_PROFILE ")]
+    if completed.returncode != 0 or not profile_lines:
+        print(completed.stdout + completed.stderr)
+        sys.exit(f"Import von app.py fehlgeschlagen (Exit-Code {completed.returncode}).")
+    profile = json.loads(profile_lines[-1][len("STARTUP_PROFILE "):])
+
+    # Own import time summed up per top-level package (e.g. all chromadb.* modules):
+    per_package = {}
+    for name, self_us, _ in parse_importtime(completed.stderr):
+        package = name.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + self_us
+
+    print(f"Import von app.py: {profile['import_seconds']:.2f} s, mit Warm-up: {profile['ready_seconds']:.2f} s")
+    print("\nSchritte:")
+    for step, seconds in profile["steps"].items():
+        print(f"  {step:<22} {seconds:>7.3f} s")
+    print(f"\nEigene Importzeit pro Paket (Top {args.top}, inklusive Warm-up):")
+    for package, self_us in sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {package:<28} {self_us / 1000:>8.1f} ms")
+
+if __name__ == '__main__':
+    main()
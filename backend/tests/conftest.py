@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend modules are imported by name (like in app.py), so the backend folder must be on the path:
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+import itertools
+from types import SimpleNamespace
+import pytest
+import answer_cache
+from answer_cache import AnswerCache, key_terms, normalize_question
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=3, similarity_threshold=0.97)
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Strictly increasing timestamps, so that the LRU order does not depend on the resolution of time.time().
+    ticks = itertools.count(1.0)
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: next(ticks)))
+
+def test_normalize_question_ignores_case_spaces_and_punctuation():
+    assert normalize_question("  Wie hoch sind die  CO2-Emissionen? ") == "wie hoch sind die co2-emissionen"
+
+def test_key_terms_contain_only_tokens_with_digits():
+    assert key_terms("CO2-Emissionen 2022 in Scope 1") == key_terms("Scope 1 co2 Emissionen im Jahr 2022")
+    assert key_terms("CO2-Emissionen 2022") != key_terms("CO2-Emissionen 2023")
+
+def test_exact_hit_and_miss(cache):
+    cache.put("a.pdf", "Wie hoch sind die CO2-Emissionen?", "12.500 t")
+    assert cache.get_exact("a.pdf", "wie hoch sind die co2-emissionen") == "12.500 t"
+    assert cache.get_exact("a.pdf", "Welche Ziele gibt es?") is None
+    assert cache.get_exact("b.pdf", "Wie hoch sind die CO2-Emissionen?") is None
+    assert cache.stats()["exact_hits"] == 1
+
+def test_semantic_hit_requires_the_threshold(cache):
+    cache.put("a.pdf", "Wie hoch sind die Emissionen?", "12.500 t", [1.0, 0.0])
+    assert cache.get_similar("a.pdf", "Wie viel wird emittiert?", [0.99, 0.05]) == "12.500 t"
+    assert cache.get_similar("a.pdf", "Welche Ziele gibt es?", [0.7, 0.7]) is None
+    assert cache.get_similar("b.pdf", "Wie viel wird emittiert?", [1.0, 0.0]) is None
+    stats = cache.stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 2)
+
+def test_semantic_hit_requires_the_same_key_terms(cache):
+    cache.put("a.pdf", "CO2-Emissionen 2023", "12.500 t", [1.0, 0.0])
+    # Almost identical embedding, but a different year: the answer for 2023 must not be returned.
+    assert cache.get_similar("a.pdf", "CO2-Emissionen 2022", [1.0, 0.0]) is None
+    assert cache.get_similar("a.pdf", "Wie hoch waren die CO2-Emissionen 2023", [1.0, 0.01]) == "12.500 t"
+
+def test_semantic_tier_can_be_disabled(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), similarity_threshold=None)
+    cache.put("a.pdf", "Wie hoch sind die Emissionen?", "12.500 t", [1.0, 0.0])
+    assert cache.get_similar("a.pdf", "Wie viel wird emittiert?", [1.0, 0.0]) is None
+
+def test_least_recently_used_answers_are_evicted(cache, clock):
+    cache.put("a.pdf", "Frage eins", "1")
+    cache.put("a.pdf", "Frage zwei", "2")
+    cache.put("a.pdf", "Frage drei", "3")
+    assert cache.get_exact("a.pdf", "Frage eins") == "1" # Now the most recently used answer.
+    cache.put("a.pdf", "Frage vier", "4")
+    assert cache.get_exact("a.pdf", "Frage zwei") is None
+    assert [cache.get_exact("a.pdf", q) for q in ("Frage eins", "Frage drei", "Frage vier")] == ["1", "3", "4"]
+    assert cache.stats()["entries"] == 3
+
+def test_invalidate_removes_only_the_answers_of_one_pdf(cache):
+    cache.put("a.pdf", "Frage", "A", [1.0, 0.0])
+    cache.put("b.pdf", "Frage", "B", [1.0, 0.0])
+    cache.invalidate("a.pdf")
+    assert cache.get_exact("a.pdf", "Frage") is None
+    assert cache.get_similar("a.pdf", "Frage?", [1.0, 0.0]) is None
+    assert cache.get_exact("b.pdf", "Frage") == "B"
+
+def test_clear_removes_all_answers(cache):
+    cache.put("a.pdf", "Frage", "A")
+    cache.put("b.pdf", "Frage", "B")
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+def test_answers_are_persistent(tmp_path):
+    AnswerCache(str(tmp_path / "answers.sqlite3")).put("a.pdf", "Frage", "A")
+    assert AnswerCache(str(tmp_path / "answers.sqlite3")).get_exact("a.pdf", "Frage") == "A"
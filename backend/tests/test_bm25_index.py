@@ -0,0 +1,40 @@
+from bm25_index import BM25Index, is_keyword_query, reciprocal_rank_fusion
+
+CHUNKS = [
+    "Die Scope 1 Emissionen betrugen 2023 insgesamt 1.000 Tonnen CO2.",
+    "Der Vorstand beschreibt die Nachhaltigkeitsstrategie des Konzerns.",
+    "Scope 2 Emissionen aus eingekaufter Energie sanken 2022 deutlich.",
+]
+
+def test_rrf_ranks_entries_found_by_both_lists_first():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]])
+    assert fused[:2] == ["b", "a"]
+    assert set(fused) == {"a", "b", "c", "d"}
+
+def test_rrf_entry_in_both_lists_beats_a_single_first_rank():
+    assert reciprocal_rank_fusion([["x", "a"], ["y", "a"]])[0] == "a"
+
+def test_rrf_single_ranking_keeps_its_order():
+    assert reciprocal_rank_fusion([["c", "a", "b"]]) == ["c", "a", "b"]
+
+def test_rrf_smoothing_constant():
+    # With a small k the first rank dominates, with a large k the number of lists an entry appears in.
+    rankings = [["a", "b", "c", "d", "e"], ["x", "e"]]
+    assert reciprocal_rank_fusion(rankings, k=0)[0] == "a"
+    assert reciprocal_rank_fusion(rankings, k=60)[0] == "e"
+
+def test_bm25_finds_exact_numbers():
+    index = BM25Index(CHUNKS)
+    assert index.search("Scope 1 2023", k=1)[0][0] == 0
+    assert index.search("2022", k=3) == index.search("2022", k=1)
+
+def test_bm25_incremental_add_matches_building_at_once():
+    incremental = BM25Index([])
+    incremental.add(CHUNKS[:2])
+    incremental.add(CHUNKS[2:])
+    assert incremental.search("Scope Emissionen 2022") == BM25Index(CHUNKS).search("Scope Emissionen 2022")
+
+def test_is_keyword_query():
+    assert is_keyword_query("Scope 2 CO2 2023")
+    assert not is_keyword_query("Wie lautet die Klimastrategie?")
+    assert not is_keyword_query("Wie haben sich die Emissionen zwischen 2019 und 2023 im Konzern insgesamt entwickelt?")
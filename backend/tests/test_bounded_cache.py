@@ -0,0 +1,70 @@
+import types
+import bounded_cache
+from bounded_cache import BoundedLRUCache
+
+class FakeClock:
+    # Replaces time.monotonic in bounded_cache, so that the TTL can be tested without waiting.
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_evicts_least_recently_used_entry():
+    cache = BoundedLRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1 # "b" is now the least recently used entry.
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_evicts_by_estimated_size():
+    cache = BoundedLRUCache(max_entries=10, max_bytes=100, size_fn=len)
+    cache.put("a", "x" * 40)
+    cache.put("b", "x" * 40)
+    cache.put("c", "x" * 40)
+    assert cache.get("a") is None
+    assert len(cache) == 2
+    assert cache.stats()["estimated_bytes"] == 80
+
+def test_newest_entry_is_kept_even_if_it_exceeds_the_size_limit():
+    cache = BoundedLRUCache(max_bytes=10, size_fn=len)
+    cache.put("a", "x" * 5)
+    cache.put("big", "x" * 50)
+    assert cache.get("big") == "x" * 50
+    assert cache.get("a") is None
+
+def test_replacing_an_entry_updates_its_size():
+    cache = BoundedLRUCache(max_bytes=100, size_fn=len)
+    cache.put("a", "x" * 60)
+    cache.put("a", "x" * 10)
+    cache.put("b", "x" * 80)
+    assert cache.get("a") == "x" * 10
+    assert cache.stats()["estimated_bytes"] == 90
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(bounded_cache, "time", types.SimpleNamespace(monotonic=clock))
+    cache = BoundedLRUCache(ttl_seconds=60)
+    cache.put("a", 1)
+    clock.now += 59
+    assert cache.get("a") == 1
+    # The age counts from the insertion, reading an entry does not extend it.
+    clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+def test_pop_and_clear():
+    cache = BoundedLRUCache(size_fn=lambda value: 10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.pop("a") == 1
+    assert cache.pop("a") is None
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["estimated_bytes"] == 0
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pytest
+from compact_vector_store import CompactVectorStore, CompactVectorStoreWriter, quantize_int8
+
+class FakeEmbeddings:
+    # Returns fixed vectors for known texts (instead of requests to the embedding service).
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+        self.document_calls = 0
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(7)
+    return rng.normal(size=(50, 32)).astype(np.float32)
+
+def test_int8_quantization_round_trip(vectors):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    quantized, scales = quantize_int8(normalized)
+    assert quantized.dtype == np.int8
+    restored = quantized.astype(np.float32) * scales[:, None]
+    # Symmetric quantization: the error per value is at most half a step.
+    assert np.all(np.abs(restored - normalized) <= scales[:, None] / 2 + 1e-6)
+
+def test_int8_quantization_of_zero_vector():
+    quantized, scales = quantize_int8(np.zeros((1, 4), dtype=np.float32))
+    assert not quantized.any()
+    assert scales[0] == 1.0
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_create_load_and_search(tmp_path, vectors, dtype):
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    embeddings = FakeEmbeddings({**dict(zip(texts, vectors.tolist())), "frage": vectors[17].tolist()})
+    path = str(tmp_path / "report")
+    store = CompactVectorStore.create(path, texts, embeddings, [{"page": i} for i in range(len(texts))], dtype=dtype)
+    assert CompactVectorStore.exists(path)
+
+    loaded = CompactVectorStore.load(path, embeddings)
+    assert len(loaded) == len(texts)
+    assert loaded.vectors.dtype == np.dtype(dtype)
+    assert isinstance(loaded.vectors, np.memmap)
+    results = loaded.similarity_search_with_score_by_vector(vectors[17].tolist(), k=3)
+    assert results[0][0].page_content == "chunk 17"
+    assert results[0][0].metadata == {"page": 17}
+    assert results[0][1] == pytest.approx(1.0, abs=0.01)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert loaded.similarity_search("frage", k=1)[0].page_content == "chunk 17"
+    assert store.nbytes == len(texts) * 32 * np.dtype(dtype).itemsize
+
+def test_scores_match_float32_cosine_similarity(tmp_path, vectors):
+    store = CompactVectorStore.create(str(tmp_path / "report"), [str(i) for i in range(len(vectors))], None,
+                                      dtype="int8", vectors=vectors.tolist())
+    query = vectors[3] + 0.5 * vectors[8]
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = normalized @ (query / np.linalg.norm(query))
+    scores = {int(doc.page_content): score for doc, score in store.similarity_search_with_score_by_vector(query.tolist(), k=len(vectors))}
+    assert max(abs(scores[i] - expected[i]) for i in range(len(vectors))) < 0.02
+
+def test_writer_appends_batches(tmp_path, vectors):
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    embeddings = FakeEmbeddings(dict(zip(texts, vectors.tolist())))
+    path = str(tmp_path / "report")
+    writer = CompactVectorStoreWriter(path, embeddings, dtype="int8")
+    for start in range(0, len(texts), 16):
+        writer.add(texts[start:start + 16])
+    assert not CompactVectorStore.exists(path) # Only visible after finish().
+    store = writer.finish()
+    assert embeddings.document_calls == 4
+    assert store.texts == texts
+    assert store.similarity_search_by_vector(vectors[40].tolist(), k=1)[0].page_content == "chunk 40"
+    assert sorted(os.listdir(tmp_path)) == ["report.json", "report.npy"]
+
+def test_aborted_writer_leaves_no_store(tmp_path, vectors):
+    path = str(tmp_path / "report")
+    writer = CompactVectorStoreWriter(path, None)
+    writer.add(["a", "b"], vectors=vectors[:2].tolist())
+    writer.abort()
+    assert not CompactVectorStore.exists(path)
+    assert os.listdir(tmp_path) == []
+
+def test_writer_rejects_unknown_dtype_and_empty_store(tmp_path):
+    with pytest.raises(ValueError):
+        CompactVectorStoreWriter(str(tmp_path / "report"), None, dtype="float64")
+    with pytest.raises(ValueError):
+        CompactVectorStoreWriter(str(tmp_path / "report"), None).finish()
@@ -0,0 +1,36 @@
+from context_builder import build_context, count_tokens, remove_overlaps
+
+FIRST = "Die Scope-1-Emissionen sanken 2023 auf 1.000 Tonnen CO2. "
+SECOND = "Der Anteil erneuerbarer Energien stieg auf 80 Prozent. "
+THIRD = "Bis 2030 sollen alle Standorte klimaneutral betrieben werden."
+
+def test_remove_overlaps_drops_repeated_beginning():
+    selected = [FIRST + SECOND]
+    assert remove_overlaps(SECOND + THIRD, selected) == THIRD
+
+def test_remove_overlaps_drops_repeated_end():
+    selected = [SECOND + THIRD]
+    assert remove_overlaps(FIRST + SECOND, selected) == FIRST.strip()
+
+def test_remove_overlaps_drops_contained_chunk():
+    assert remove_overlaps(SECOND, [FIRST + SECOND + THIRD]) == ""
+
+def test_remove_overlaps_ignores_short_matches():
+    # Matches shorter than min_overlap (e.g. a common word) are not treated as overlap.
+    assert remove_overlaps("Tonnen CO2 im Jahr", ["1.000 Tonnen"]) == "Tonnen CO2 im Jahr"
+
+def test_build_context_keeps_relevance_order_and_removes_overlaps():
+    context = build_context([FIRST + SECOND, SECOND + THIRD], max_tokens=1000)
+    assert context == (FIRST + SECOND).strip() + "\n\n" + THIRD
+
+def test_build_context_respects_the_budget():
+    chunks = [FIRST, SECOND, THIRD]
+    budget = count_tokens(FIRST.strip()) + count_tokens("\n\n") + count_tokens(SECOND.strip())
+    assert build_context(chunks, max_tokens=budget) == FIRST.strip() + "\n\n" + SECOND.strip()
+    assert build_context(chunks, max_tokens=budget - 1) == FIRST.strip()
+
+def test_build_context_skips_a_chunk_that_does_not_fit_and_packs_smaller_ones():
+    long_chunk = " ".join([THIRD] * 20)
+    budget = count_tokens(FIRST.strip()) + count_tokens("\n\n") + count_tokens(SECOND.strip())
+    context = build_context([FIRST, long_chunk, SECOND], max_tokens=budget)
+    assert context == FIRST.strip() + "\n\n" + SECOND.strip()
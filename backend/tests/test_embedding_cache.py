@@ -0,0 +1,54 @@
+import itertools
+from types import SimpleNamespace
+import pytest
+import embedding_cache
+from embedding_cache import EmbeddingCache, text_hash
+
+MODEL = "e5-mistral-7b-instruct"
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Controllable time, so that the LRU order and the touch interval can be tested without waiting.
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def test_get_many_returns_only_stored_embeddings(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    cache.put_many(MODEL, {text_hash("a"): [0.5, 1.0], text_hash("b"): [2.0, -1.0]})
+    found = cache.get_many(MODEL, [text_hash("a"), text_hash("c"), text_hash("a")])
+    assert found == {text_hash("a"): [0.5, 1.0]}
+    assert cache.get_many("anderes-modell", [text_hash("a")]) == {}
+
+def test_embeddings_are_persistent(tmp_path):
+    EmbeddingCache(str(tmp_path / "embeddings.sqlite3")).put_many(MODEL, {text_hash("a"): [0.25]})
+    assert EmbeddingCache(str(tmp_path / "embeddings.sqlite3")).get_many(MODEL, [text_hash("a")]) == {text_hash("a"): [0.25]}
+
+def test_lookup_of_many_hashes_is_split_into_slices(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    items = {text_hash(str(i)): [float(i)] for i in range(1200)}
+    cache.put_many(MODEL, items)
+    assert cache.get_many(MODEL, list(items)) == items
+
+def test_least_recently_used_embeddings_are_evicted(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_entries=2, touch_interval=0)
+    cache.put_many(MODEL, {text_hash("a"): [1.0]})
+    clock.now += 1
+    cache.put_many(MODEL, {text_hash("b"): [2.0]})
+    clock.now += 1
+    assert cache.get_many(MODEL, [text_hash("a")]) # "b" is now the least recently used embedding.
+    clock.now += 1
+    cache.put_many(MODEL, {text_hash("c"): [3.0]})
+    found = cache.get_many(MODEL, [text_hash("a"), text_hash("b"), text_hash("c")])
+    assert set(found) == {text_hash("a"), text_hash("c")}
+
+def test_usage_time_is_only_refreshed_after_the_touch_interval(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), touch_interval=600)
+    cache.put_many(MODEL, {text_hash("a"): [1.0]})
+    last_used = lambda: cache._conn.execute("SELECT last_used FROM embeddings").fetchone()[0]
+    clock.now += 10
+    cache.get_many(MODEL, [text_hash("a")])
+    assert last_used() == 1000.0
+    clock.now += 600
+    cache.get_many(MODEL, [text_hash("a")])
+    assert last_used() == 1610.0
@@ -0,0 +1,114 @@
+import threading
+import time as real_time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+import embeddingWrapper
+from embedding_cache import EmbeddingCache
+from embeddingWrapper import SAIAEmbeddings
+
+class FakeResponse:
+    def __init__(self, status_code: int, texts: list[str] = (), headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._data = [{"embedding": [float(len(text)), float(index)]} for index, text in enumerate(texts)]
+        self.content = b"{}"
+
+    def json(self) -> dict:
+        return {"data": self._data}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise embeddingWrapper.requests.HTTPError(f"{self.status_code} Error")
+
+class FakeSession:
+    # Replaces the requests session: returns the queued error status codes first, then successful responses.
+    def __init__(self, failures: list = ()):
+        self.failures = list(failures)
+        self.batches = []
+
+    def post(self, endpoint, headers=None, json=None, timeout=None):
+        if self.failures:
+            status_code, headers = self.failures.pop(0)
+            return FakeResponse(status_code, headers=headers)
+        self.batches.append(json["input"])
+        return FakeResponse(200, json["input"])
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # No real waiting: the rate limit is skipped and the back-off delays are recorded.
+    sleeps = []
+    monkeypatch.setattr(embeddingWrapper, "wait_for_rate_limit", lambda api_key, priority=None: None)
+    monkeypatch.setattr(embeddingWrapper, "time", SimpleNamespace(sleep=sleeps.append))
+    return sleeps
+
+def make_embeddings(session: FakeSession, **kwargs) -> SAIAEmbeddings:
+    embeddings = SAIAEmbeddings("test-key", query_batch_wait=0, **kwargs)
+    embeddings.session = session
+    return embeddings
+
+def test_texts_are_split_into_batches_in_order(sleeps):
+    session = FakeSession()
+    embeddings = make_embeddings(session, batch_size=2)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    vectors = embeddings.embed_documents(texts)
+    assert sorted(session.batches) == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    assert [vector[0] for vector in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+def test_rate_limit_is_retried_after_the_retry_after_delay(sleeps):
+    session = FakeSession(failures=[(429, {"Retry-After": "7"})])
+    vectors = make_embeddings(session).embed_documents(["abc"])
+    assert vectors == [[3.0, 0.0]]
+    assert sleeps == [7.0]
+
+def test_server_errors_are_retried_with_exponential_back_off(sleeps):
+    session = FakeSession(failures=[(503, None), (500, None)])
+    assert make_embeddings(session).embed_documents(["abc"]) == [[3.0, 0.0]]
+    assert sleeps == [1, 2]
+
+def test_error_is_raised_after_the_last_retry(sleeps):
+    session = FakeSession(failures=[(503, None)] * 3)
+    with pytest.raises(embeddingWrapper.requests.HTTPError):
+        make_embeddings(session, max_retries=2).embed_documents(["abc"])
+    assert len(sleeps) == 2
+
+def test_client_errors_are_not_retried(sleeps):
+    session = FakeSession(failures=[(400, None)])
+    with pytest.raises(embeddingWrapper.requests.HTTPError):
+        make_embeddings(session).embed_documents(["abc"])
+    assert sleeps == []
+
+def test_cached_texts_are_not_sent_again(sleeps, tmp_path):
+    session = FakeSession()
+    embeddings = make_embeddings(session, cache=EmbeddingCache(str(tmp_path / "embeddings.sqlite3")))
+    first = embeddings.embed_documents(["a", "bb"])
+    second = embeddings.embed_documents(["bb", "ccc", "ccc"])
+    assert session.batches == [["a", "bb"], ["ccc"]]
+    assert second[0] == first[1] and second[1] == second[2]
+    assert embeddings.embed_query("a") == first[0]
+    assert len(session.batches) == 2
+
+def test_concurrent_callers_share_the_request_limit(sleeps):
+    # Each caller sends a single batch in its own thread, the limit still applies to all of them together.
+    class SlowSession(FakeSession):
+        def __init__(self):
+            super().__init__()
+            self.lock = threading.Lock()
+            self.running = 0
+            self.max_running = 0
+
+        def post(self, endpoint, headers=None, json=None, timeout=None):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            real_time.sleep(0.02)
+            with self.lock:
+                self.running -= 1
+            return super().post(endpoint, headers=headers, json=json, timeout=timeout)
+
+    session = SlowSession()
+    embeddings = make_embeddings(session, max_concurrency=2)
+    with ThreadPoolExecutor(max_workers=6) as callers:
+        list(callers.map(lambda text: embeddings.embed_documents([text]), ["a", "b", "c", "d", "e", "f"]))
+    assert len(session.batches) == 6
+    assert session.max_running == 2
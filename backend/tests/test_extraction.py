@@ -0,0 +1,48 @@
+from context_builder import count_tokens
+from extraction import EXTRACTION_FIELDS, group_chunks, merge_partial_results
+
+FIRST = "Die Scope-1-Emissionen sanken 2023 auf 12.500 Tonnen CO2e."
+SECOND = "Der Anteil erneuerbarer Energien stieg auf 80 Prozent."
+THIRD = "Bis 2030 sollen alle Standorte klimaneutral betrieben werden."
+
+def test_group_chunks_packs_consecutive_chunks_into_the_budget():
+    budget = count_tokens(FIRST) + count_tokens("\n\n") + count_tokens(SECOND)
+    assert group_chunks([FIRST, SECOND, THIRD], budget) == [FIRST + "\n\n" + SECOND, THIRD]
+
+def test_group_chunks_starts_a_new_group_when_the_budget_is_exceeded():
+    budget = count_tokens(FIRST) + count_tokens("\n\n") + count_tokens(SECOND) - 1
+    assert group_chunks([FIRST, SECOND, THIRD], budget) == [FIRST, SECOND, THIRD]
+
+def test_group_chunks_keeps_a_chunk_above_the_budget_as_its_own_group():
+    long_chunk = " ".join([THIRD] * 20)
+    assert group_chunks([FIRST, long_chunk, SECOND], count_tokens(FIRST)) == [FIRST, long_chunk, SECOND]
+
+def test_group_chunks_without_chunks():
+    assert group_chunks([], 100) == []
+
+def test_merge_partial_results_joins_distinct_values_in_document_order():
+    merged = merge_partial_results([
+        {"CO2": "Scope 1: 12.500 t CO2e", "Targets": "Netto-Null bis 2045"},
+        {"CO2": "Scope 2: 3.000 t CO2e", "Targets": "Netto-Null bis 2045"}
+    ])
+    assert merged["CO2"] == "Scope 1: 12.500 t CO2e; Scope 2: 3.000 t CO2e"
+    assert merged["Targets"] == "Netto-Null bis 2045"
+    assert set(merged) == set(EXTRACTION_FIELDS)
+
+def test_merge_partial_results_uses_the_first_name():
+    merged = merge_partial_results([{"name": ""}, {"name": "Muster AG"}, {"name": "Muster Gruppe"}])
+    assert merged["name"] == "Muster AG"
+
+def test_merge_partial_results_drops_not_found_placeholders():
+    merged = merge_partial_results([
+        {"name": "Nicht angegeben", "CO2": "nicht angegeben", "NOX": "Keine Angabe."},
+        {"name": "Muster AG", "CO2": "12.500 t CO2e", "NOX": "N/A"},
+        {"CO2": "  ", "NOX": None}
+    ])
+    assert merged["name"] == "Muster AG"
+    assert merged["CO2"] == "12.500 t CO2e"
+    assert merged["NOX"] == ""
+
+def test_merge_partial_results_serializes_lists_and_skips_empty_ones():
+    merged = merge_partial_results([{"Actions": ["Photovoltaik", "E-Flotte"]}, {"Actions": []}])
+    assert merged["Actions"] == '["Photovoltaik", "E-Flotte"]'
@@ -0,0 +1,76 @@
+import json
+import pytest
+from extraction import EXTRACTION_FIELDS
+from extraction_store import ExtractionStore, validate_record
+
+@pytest.fixture
+def store(tmp_path):
+    store = ExtractionStore(str(tmp_path / "extractions.sqlite3"))
+    store.put("a.pdf", {"name": "Alpha AG", "CO2": "100% erneuerbar"}, extracted_at=1.0)
+    store.put("b.pdf", {"name": "Beta_Werke GmbH", "CO2": "1.000 t"}, extracted_at=2.0)
+    store.put("c.pdf", {"name": "Gamma\\Holding", "Targets": "Netto-Null 2040"}, extracted_at=3.0)
+    return store
+
+def test_validate_record_fills_missing_fields_and_serializes_values():
+    record = validate_record({"name": " Alpha AG ", "Targets": ["2030", "2040"], "CO2": 100})
+    assert set(record) == set(EXTRACTION_FIELDS)
+    assert record["name"] == "Alpha AG"
+    assert json.loads(record["Targets"]) == ["2030", "2040"]
+    assert record["CO2"] == "100"
+    assert record["NOX"] == ""
+
+def test_validate_record_rejects_unknown_fields_and_non_objects():
+    with pytest.raises(ValueError):
+        validate_record({"name": "Alpha AG", "Umsatz": "1 Mrd."})
+    with pytest.raises(ValueError):
+        validate_record(["name"])
+
+@pytest.mark.parametrize("field, text, expected", [
+    ("CO2", "%", ["a.pdf"]), # A literal percent sign, not "any text".
+    ("name", "_", ["b.pdf"]), # A literal underscore, not "any character".
+    ("name", "\\", ["c.pdf"]),
+    ("name", "alpha", ["a.pdf"]), # Case-insensitive.
+])
+def test_contains_filter_escapes_like_wildcards(store, field, text, expected):
+    records, total = store.query(contains={field: text})
+    assert sorted(record["pdf_id"] for record in records) == expected
+    assert total == len(expected)
+
+def test_non_empty_and_pdf_id_filters(store):
+    records, _ = store.query(non_empty=["CO2"], pdf_ids=["a.pdf", "c.pdf"])
+    assert [record["pdf_id"] for record in records] == ["a.pdf"]
+
+def test_unknown_filter_fields_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.query(contains={"name = '' OR 1=1 --": "x"})
+    with pytest.raises(ValueError):
+        store.query(non_empty=["pdf_id"])
+
+def test_sort_is_limited_to_whitelisted_columns(store):
+    records, _ = store.query(sort="name", descending=False)
+    assert [record["pdf_id"] for record in records] == ["a.pdf", "b.pdf", "c.pdf"]
+    records, _ = store.query(sort="extracted_at", descending=True)
+    assert [record["pdf_id"] for record in records] == ["c.pdf", "b.pdf", "a.pdf"]
+    for sort in ("CO2", "name; DROP TABLE extractions"):
+        with pytest.raises(ValueError):
+            store.query(sort=sort)
+    assert store.count() == 3
+
+def test_paging_and_iteration(store):
+    records, total = store.query(sort="pdf_id", descending=False, limit=2, offset=1)
+    assert [record["pdf_id"] for record in records] == ["b.pdf", "c.pdf"]
+    assert total == 3
+    assert [record["pdf_id"] for record in store.iter_query(batch_size=2, sort="pdf_id", descending=False)] == ["a.pdf", "b.pdf", "c.pdf"]
+
+def test_put_replaces_and_import_skips_stored_pdfs(store, tmp_path):
+    store.put("a.pdf", {"name": "Alpha SE"})
+    assert store.get("a.pdf")["name"] == "Alpha SE"
+    folder = tmp_path / "jsons"
+    folder.mkdir()
+    (folder / "a.json").write_text(json.dumps({"name": "Alt"}), encoding="utf-8")
+    (folder / "d.json").write_text(json.dumps({"name": "Delta"}), encoding="utf-8")
+    (folder / "e.json").write_text(json.dumps({"Umsatz": "1"}), encoding="utf-8")
+    assert store.import_folder(str(folder)) == 1
+    assert store.get("a.pdf")["name"] == "Alpha SE"
+    assert store.get("d.pdf")["name"] == "Delta"
+    assert store.get("e.pdf") is None
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from job_queue import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobQueue
+from upstream_scheduler import PRIORITY_BACKGROUND, current_priority
+
+# Helper function: Waits until a job has finished:
+def wait_for_job(queue: JobQueue, job_id: str, timeout: float = 2.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job["status"] in (JOB_DONE, JOB_FAILED) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+def test_job_result_stages_and_priority(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+
+    def task(job_id, value):
+        queue.set_stage(job_id, "embed")
+        assert queue.get(job_id)["progress"] == 0.5
+        return {"value": value, "priority": current_priority()}
+
+    job_id = queue.submit(task, 42, stages=["read", "embed"])
+    job = wait_for_job(queue, job_id)
+    assert job["status"] == JOB_DONE
+    assert job["result"] == {"value": 42, "priority": PRIORITY_BACKGROUND}
+    assert job["progress"] == 1.0 and job["stage"] is None
+    queue.shutdown()
+
+def test_failed_job_keeps_error(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+
+    def task(job_id):
+        raise RuntimeError("Could not read content from PDF")
+
+    job = wait_for_job(queue, queue.submit(task))
+    assert job["status"] == JOB_FAILED
+    assert job["error"] == "Could not read content from PDF"
+    queue.shutdown()
+
+def test_restart_marks_unfinished_jobs_as_failed(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+    release = threading.Event()
+    running = queue.submit(lambda job_id: release.wait(2))
+    queued = queue.submit(lambda job_id: None)
+    deadline = time.monotonic() + 2
+    while queue.get(running)["status"] != JOB_RUNNING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue.get(queued)["status"] == JOB_QUEUED
+
+    # A new process reads the job files: jobs that were still queued or running were interrupted.
+    restarted = JobQueue(str(tmp_path), max_workers=1)
+    for job_id in (running, queued):
+        job = restarted.get(job_id)
+        assert job["status"] == JOB_FAILED
+        assert "Neustart" in job["error"]
+        with open(os.path.join(str(tmp_path), f"{job_id}.json"), encoding="utf-8") as f:
+            assert json.load(f)["status"] == JOB_FAILED
+    release.set()
+    queue.shutdown()
+    restarted.shutdown()
+
+def test_restart_keeps_finished_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+    job_id = queue.submit(lambda job_id: "ok")
+    assert wait_for_job(queue, job_id)["status"] == JOB_DONE
+    queue.shutdown()
+    restarted = JobQueue(str(tmp_path), max_workers=1)
+    assert restarted.get(job_id)["status"] == JOB_DONE
+    assert restarted.get(job_id)["result"] == "ok"
+    restarted.shutdown()
+
+def test_get_reads_jobs_of_other_processes_and_rejects_paths(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1)
+    other = JobQueue(str(tmp_path), max_workers=1)
+    job_id = other.submit(lambda job_id: "ok")
+    wait_for_job(other, job_id)
+    assert queue.get(job_id)["status"] == JOB_DONE
+    assert queue.get("../" + job_id) is None
+    assert queue.get("unknown") is None
+    queue.shutdown()
+    other.shutdown()
+
+def test_finished_jobs_are_removed_after_the_retention_period(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1, retention_seconds=3600)
+    old_job = queue.submit(lambda job_id: "ok")
+    wait_for_job(queue, old_job)
+    with queue._lock: # Finished long ago (update() would set the current time).
+        queue._jobs[old_job]["updated_at"] = time.time() - 7200
+    new_job = queue.submit(lambda job_id: "ok")
+    wait_for_job(queue, new_job)
+    assert queue.get(old_job) is None
+    assert not os.path.exists(os.path.join(str(tmp_path), f"{old_job}.json"))
+    assert queue.get(new_job)["status"] == JOB_DONE
+    queue.shutdown()
+
+def test_only_the_newest_finished_jobs_are_kept(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1, max_finished_jobs=2)
+    job_ids = []
+    for _ in range(4):
+        job_ids.append(queue.submit(lambda job_id: "ok"))
+        wait_for_job(queue, job_ids[-1])
+    # Pruning happens before a new job is added: the oldest finished job is removed, the new one is kept.
+    assert [queue.get(job_id) is not None for job_id in job_ids] == [False, True, True, True]
+    queue.shutdown()
+    restarted = JobQueue(str(tmp_path), max_workers=1, max_finished_jobs=2)
+    assert [restarted.get(job_id) is not None for job_id in job_ids] == [False, False, True, True]
+    assert sorted(os.listdir(str(tmp_path))) == sorted(f"{job_id}.json" for job_id in job_ids[2:])
+    restarted.shutdown()
+
+def test_running_jobs_are_never_removed(tmp_path):
+    queue = JobQueue(str(tmp_path), max_workers=1, retention_seconds=0, max_finished_jobs=0)
+    release = threading.Event()
+    running = queue.submit(lambda job_id: release.wait(2))
+    queue.submit(lambda job_id: None)
+    assert queue.get(running)["status"] in (JOB_QUEUED, JOB_RUNNING)
+    release.set()
+    queue.shutdown()
@@ -0,0 +1,77 @@
+import time
+import pytest
+from context_builder import count_tokens
+from pdf_processing import EMBEDDING_MAX_TOKENS, PdfReadError, iter_chunk_batches, iter_chunks
+
+SENTENCE = "Das Unternehmen hat im Berichtsjahr seine Emissionen in allen Bereichen deutlich reduziert."
+
+def test_chunks_never_cross_page_boundaries():
+    pages = [(1, "\n".join([SENTENCE] * 3)), (3, "\n".join([SENTENCE] * 2))]
+    chunks = list(iter_chunks(pages, max_tokens=512, overlap_tokens=0))
+    assert [chunk["page"] for chunk in chunks] == [1, 3]
+    for chunk in chunks:
+        page_text = dict(pages)[chunk["page"]]
+        assert chunk["text"] == page_text[chunk["start"]:chunk["end"]]
+
+def test_chunks_respect_token_limit_and_overlap():
+    page = "\n".join(f"{i}. Absatz: {SENTENCE}" for i in range(20))
+    line_tokens = count_tokens(f"1. Absatz: {SENTENCE}")
+    chunks = list(iter_chunks([(1, page)], max_tokens=line_tokens * 4, overlap_tokens=line_tokens + 2))
+    assert len(chunks) > 1
+    assert all(chunk["tokens"] <= line_tokens * 4 for chunk in chunks)
+    # Consecutive chunks of a page repeat the last line of the previous chunk.
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start"] < previous["end"]
+
+def test_heading_starts_a_new_chunk():
+    heading = "2.1 Klimaziele"
+    page = "\n".join([SENTENCE] * 4 + [heading, SENTENCE])
+    chunks = list(iter_chunks([(1, page)], max_tokens=count_tokens(page) + 10, overlap_tokens=0))
+    assert len(chunks) == 2
+    assert chunks[1]["text"].startswith(heading)
+    assert heading not in chunks[0]["text"]
+
+def test_heading_at_the_start_of_a_chunk_stays_with_its_text():
+    page = "\n".join(["2.1 Klimaziele", SENTENCE, SENTENCE])
+    chunks = list(iter_chunks([(1, page)], max_tokens=512, overlap_tokens=0))
+    assert len(chunks) == 1
+
+def test_table_rows_are_kept_together():
+    text_lines = [SENTENCE] * 3
+    rows = [f"Scope {i} 2021 1.200 2022 1.100 2023 {1000 - i}" for i in range(1, 4)]
+    page = "\n".join(text_lines + rows)
+    # The budget ends in the middle of the table: the rows already in the chunk move into the next one.
+    max_tokens = sum(count_tokens(line) for line in text_lines + rows) - 1
+    chunks = list(iter_chunks([(1, page)], max_tokens=max_tokens, overlap_tokens=0))
+    assert len(chunks) == 2
+    assert all(row not in chunks[0]["text"] for row in rows)
+    assert chunks[1]["text"] == "\n".join(rows)
+
+def test_max_tokens_above_the_embedding_limit_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_chunks([(1, SENTENCE)], max_tokens=EMBEDDING_MAX_TOKENS + 1))
+
+def test_chunk_batches_keep_document_order():
+    batches = list(iter_chunk_batches(({"index": i} for i in range(10)), batch_size=4))
+    assert [[chunk["index"] for chunk in batch] for batch in batches] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+def test_chunk_batches_read_ahead_is_bounded():
+    produced = []
+    def chunks():
+        for i in range(100):
+            produced.append(i)
+            yield {"index": i}
+    batches = iter_chunk_batches(chunks(), batch_size=2, prefetch=1)
+    next(batches)
+    # One batch is consumed, one waits in the queue and the reader blocks on the next one.
+    time.sleep(0.3)
+    assert len(produced) <= 2 * 3
+    batches.close()
+
+def test_chunk_batches_raise_read_errors():
+    def chunks():
+        yield {"index": 0}
+        raise OSError("beschädigte Datei")
+    with pytest.raises(PdfReadError) as error:
+        list(iter_chunk_batches(chunks(), batch_size=4))
+    assert isinstance(error.value.__cause__, OSError)
@@ -0,0 +1,122 @@
+import threading
+import time
+from upstream_scheduler import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, MicroBatcher, PrioritySemaphore, SingleFlight, TokenBucket,
+    current_priority, priority_scope
+)
+
+# Helper function: Waits until the given number of threads is queued in a TokenBucket or PrioritySemaphore:
+def wait_for_waiters(limiter, count: int, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while len(limiter._waiters) < count:
+        assert time.monotonic() < deadline, "Waiters did not queue up in time."
+        time.sleep(0.005)
+
+# Helper function: Enters and leaves a slot of the semaphore with the given priority:
+def use_slot(semaphore: PrioritySemaphore, priority: int):
+    def run():
+        with semaphore.slot(priority):
+            pass
+    return run
+
+# Helper function: Starts a thread that records its name in 'order' once it got through the limiter:
+def start_waiter(acquire, name: str, order: list) -> threading.Thread:
+    def run():
+        acquire()
+        order.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_priority_semaphore_serves_interactive_waiters_first():
+    semaphore = PrioritySemaphore(1)
+    order = []
+    with semaphore.slot(PRIORITY_INTERACTIVE):
+        threads = [start_waiter(use_slot(semaphore, PRIORITY_BACKGROUND), "background-1", order)]
+        wait_for_waiters(semaphore, 1)
+        threads.append(start_waiter(use_slot(semaphore, PRIORITY_BACKGROUND), "background-2", order))
+        wait_for_waiters(semaphore, 2)
+        threads.append(start_waiter(use_slot(semaphore, PRIORITY_INTERACTIVE), "interactive", order))
+        wait_for_waiters(semaphore, 3)
+    for thread in threads:
+        thread.join(2)
+    assert order == ["interactive", "background-1", "background-2"]
+
+def test_priority_semaphore_keeps_slots_free_for_interactive_requests():
+    semaphore = PrioritySemaphore(2, background_limit=1)
+    with semaphore.slot(PRIORITY_BACKGROUND):
+        order = []
+        background = start_waiter(use_slot(semaphore, PRIORITY_BACKGROUND), "background", order)
+        wait_for_waiters(semaphore, 1)
+        # The second background request waits, an interactive request still gets the free slot.
+        with semaphore.slot(PRIORITY_INTERACTIVE):
+            assert order == []
+    background.join(2)
+    assert order == ["background"]
+
+def test_priority_scope_sets_the_default_priority():
+    assert current_priority() == PRIORITY_INTERACTIVE
+    with priority_scope(PRIORITY_BACKGROUND):
+        assert current_priority() == PRIORITY_BACKGROUND
+    assert current_priority() == PRIORITY_INTERACTIVE
+
+def test_token_bucket_allows_a_burst_without_waiting():
+    bucket = TokenBucket(rate=1, burst=3)
+    assert sum(bucket.acquire(PRIORITY_INTERACTIVE) for _ in range(3)) < 0.05
+
+def test_token_bucket_without_rate_does_not_limit():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+
+def test_token_bucket_serves_interactive_waiters_first():
+    bucket = TokenBucket(rate=20, burst=1)
+    bucket.acquire(PRIORITY_BACKGROUND) # Empties the bucket.
+    order = []
+    threads = [start_waiter(lambda: bucket.acquire(PRIORITY_BACKGROUND), "background", order)]
+    wait_for_waiters(bucket, 1)
+    threads.append(start_waiter(lambda: bucket.acquire(PRIORITY_INTERACTIVE), "interactive", order))
+    for thread in threads:
+        thread.join(2)
+    assert order == ["interactive", "background"]
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    single_flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        finish.wait(2)
+        return "Antwort"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(single_flight.do("frage", slow_call)))
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=lambda: results.append(single_flight.do("frage", slow_call)))
+    follower.start()
+    time.sleep(0.05)
+    finish.set()
+    leader.join(2)
+    follower.join(2)
+    assert results == ["Antwort", "Antwort"]
+    assert len(calls) == 1
+
+def test_micro_batcher_combines_concurrent_items_and_deduplicates():
+    batches = []
+
+    def batch_func(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_func, max_batch_size=8, max_wait=0.2)
+    results = {}
+    threads = [threading.Thread(target=lambda item=item: results.__setitem__(item, batcher.submit(item))) for item in ["a", "b", "a"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert results == {"a": "A", "b": "B"}
+    assert batches == [["a", "b"]]
@@ -0,0 +1,230 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from metrics import STAGE_SECONDS # Waiting times are recorded as their own stage.
+
+# Priorities of upstream requests (smaller = more important):
+PRIORITY_INTERACTIVE = 0 # Requests of a waiting user (/chat, /search).
+PRIORITY_BACKGROUND = 1 # Background jobs (embedding and JSON extraction of uploaded PDFs).
+
+# Configuration of the rate limit per API key (requests per second and burst size, 0 = no limit):
+UPSTREAM_REQUESTS_PER_SECOND = float(os.getenv("UPSTREAM_REQUESTS_PER_SECOND", "10"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "20"))
+
+# The priority of the current thread. Threads without a priority scope are interactive:
+_local = threading.local()
+
+def current_priority() -> int:
+    return getattr(_local, "priority", PRIORITY_INTERACTIVE)
+
+@contextmanager
+def priority_scope(priority: int):
+    """
+    Setzt die Priorität der Upstream-Anfragen, die im with-Block im aktuellen Thread gestellt werden.
+    Threads aus einem Pool übernehmen die Priorität nicht, sie muss dort erneut gesetzt werden.
+    """
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _local.priority
+        else:
+            _local.priority = previous
+
+# Base class for the waiting logic: Waiters are served in the order (priority, arrival), i.e. all waiting
+# interactive requests are served before the first background request.
+class _PriorityWaitQueue:
+    # Constructor for the _PriorityWaitQueue class.
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._waiters = [] # Heap of (priority, sequence number).
+        self._sequence = itertools.count()
+
+    def _wait_turn(self, priority: int, can_proceed, wait_timeout) -> float:
+        # Must be called while holding self._condition. Returns the waiting time in seconds.
+        started = time.perf_counter()
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                is_first = self._waiters[0] == ticket
+                if is_first and can_proceed(priority):
+                    heapq.heappop(self._waiters)
+                    self._condition.notify_all() # The next waiter may be able to proceed as well.
+                    return time.perf_counter() - started
+                self._condition.wait(wait_timeout() if is_first else None)
+        except BaseException:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+            self._condition.notify_all()
+            raise
+
+# This class limits the rate of requests with a token bucket: 'rate' requests per second on average, up to 'burst' at once:
+class TokenBucket(_PriorityWaitQueue):
+    # Constructor for the TokenBucket class.
+    def __init__(self, rate: float, burst: int):
+        super().__init__()
+        self.rate = rate # Refill rate in tokens per second (0 = no limit).
+        self.burst = max(1, burst) # Capacity of the bucket.
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self, priority: int = None) -> float:
+        """
+        Wartet, bis ein Token verfügbar ist (wartende interaktive Anfragen zuerst), und verbraucht es.
+
+        Returns:
+            float: Die Wartezeit in Sekunden.
+        """
+        if self.rate <= 0:
+            return 0.0
+        priority = current_priority() if priority is None else priority
+
+        def has_token(_):
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+        with self._condition:
+            return self._wait_turn(priority, has_token, lambda: (1 - self._tokens) / self.rate)
+
+# This class limits the number of concurrent requests. Background requests may only use part of the slots,
+# so that interactive requests do not have to wait until long background requests are finished:
+class PrioritySemaphore(_PriorityWaitQueue):
+    # Constructor for the PrioritySemaphore class.
+    def __init__(self, limit: int, background_limit: int = None):
+        super().__init__()
+        self.limit = limit
+        self.background_limit = min(limit, background_limit) if background_limit is not None else limit
+        self._in_use = 0
+        self._background_in_use = 0
+
+    def _has_slot(self, priority: int) -> bool:
+        if self._in_use >= self.limit:
+            return False
+        if priority >= PRIORITY_BACKGROUND and self._background_in_use >= self.background_limit:
+            return False
+        self._in_use += 1
+        if priority >= PRIORITY_BACKGROUND:
+            self._background_in_use += 1
+        return True
+
+    @contextmanager
+    def slot(self, priority: int = None):
+        priority = current_priority() if priority is None else priority
+        with self._condition:
+            self._wait_turn(priority, self._has_slot, lambda: None)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_use -= 1
+                if priority >= PRIORITY_BACKGROUND:
+                    self._background_in_use -= 1
+                self._condition.notify_all()
+
+# This class executes identical concurrent calls only once: later callers wait for the result of the first call:
+class SingleFlight:
+    # Constructor for the SingleFlight class.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {} # Key -> Future of the running call.
+
+    def do(self, key, func):
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._calls[key] = Future()
+        if not is_leader:
+            return future.result()
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+# This class collects concurrent single calls into micro-batches: the first caller waits up to max_wait seconds
+# for further calls and then executes the batch for everyone. Identical items that are still pending are only sent once:
+class MicroBatcher:
+    # Constructor for the MicroBatcher class.
+    def __init__(self, batch_func, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.batch_func = batch_func # Function that receives a list of items and returns the results in the same order.
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._futures = {} # Item -> Future, for all items whose result is not known yet.
+        self._batch = [] # Items of the batch that is still collecting.
+        self._batch_full = threading.Event()
+
+    def submit(self, item):
+        with self._lock:
+            future = self._futures.get(item)
+            is_leader = False
+            if future is None:
+                future = self._futures[item] = Future()
+                self._batch.append(item)
+                is_leader = len(self._batch) == 1
+                if len(self._batch) >= self.max_batch_size:
+                    self._batch_full.set()
+        if is_leader:
+            self._run_batch()
+        return future.result()
+
+    def _run_batch(self):
+        self._batch_full.wait(self.max_wait)
+        with self._lock:
+            batch, self._batch = self._batch, []
+            self._batch_full.clear()
+            futures = [self._futures[item] for item in batch]
+        try:
+            results = self.batch_func(batch)
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                for item in batch:
+                    del self._futures[item]
+
+# Shared rate limits: all clients with the same API key (embeddings and LLM) use the same token bucket.
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_rate_limiter(api_key: str) -> TokenBucket:
+    """
+    Gibt den gemeinsamen Token-Bucket für einen API-Schlüssel zurück (UPSTREAM_REQUESTS_PER_SECOND, UPSTREAM_BURST).
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(api_key)
+        if bucket is None:
+            bucket = _buckets[api_key] = TokenBucket(UPSTREAM_REQUESTS_PER_SECOND, UPSTREAM_BURST)
+        return bucket
+
+def wait_for_rate_limit(api_key: str, priority: int = None):
+    """
+    Wartet, bis eine Anfrage mit diesem API-Schlüssel gestellt werden darf. Die Wartezeit wird als Stage "rate_limit_wait" gemessen.
+    """
+    waited = get_rate_limiter(api_key).acquire(priority)
+    STAGE_SECONDS.observe(waited, stage="rate_limit_wait")
@@ -0,0 +1,73 @@
+import os
+from compact_vector_store import CompactVectorStoreWriter # Batch writer of the compact backend.
+
+# Helper function: Path of the compact Vector Store of a PDF (without file extension). The ID is reduced to a file name:
+def compact_store_path(compact_dir: str, pdf_id: str) -> str:
+    return os.path.join(compact_dir, os.path.basename(pdf_id).replace('.pdf', ''))
+
+# This class writes the chunks of one PDF batch by batch into its own ChromaDB collection:
+class ChromaStoreWriter:
+    # Constructor for the ChromaStoreWriter class.
+    def __init__(self, client, embedding_function, pdf_id: str):
+        self.client = client # Shared chromadb.PersistentClient.
+        self.embedding_function = embedding_function
+        self.pdf_id = pdf_id
+        self.count = 0 # Number of chunks written so far.
+        # A collection left behind by an interrupted run is removed, the chunks are always written completely.
+        self.abort()
+        self.collection = client.create_collection(name=pdf_id)
+
+    def add(self, texts: list[str], metadatas: list[dict] = None, vectors: list[list[float]] = None) -> list[list[float]]:
+        """
+        Berechnet die Embeddings eines Batches (oder verwendet die übergebenen Vektoren) und speichert sie.
+        Die IDs sind deterministisch (pdf_id:Index).
+
+        Returns:
+            list[list[float]]: Die Embeddings des Batches (z. B. für die gemeinsame Sammlung).
+        """
+        if vectors is None:
+            vectors = self.embedding_function.embed_documents(texts)
+        ids = [f"{self.pdf_id}:{self.count + i}" for i in range(len(texts))]
+        # ChromaDB limits the number of entries per call.
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(texts), batch_size):
+            end = start + batch_size
+            self.collection.upsert(
+                ids=ids[start:end],
+                documents=texts[start:end],
+                embeddings=vectors[start:end],
+                metadatas=metadatas[start:end] if metadatas else None
+            )
+        self.count += len(texts)
+        return vectors
+
+    def finish(self):
+        """
+        Gibt die geschriebene Sammlung als LangChain-Chroma-Instanz zurück (wie beim Laden von der Festplatte).
+        """
+        from langchain_community.vectorstores import Chroma # LangChain integration for ChromaDB.
+        return Chroma(client=self.client, embedding_function=self.embedding_function, collection_name=self.pdf_id)
+
+    def abort(self):
+        try:
+            self.client.delete_collection(name=self.pdf_id)
+        except Exception:
+            pass # The collection does not exist.
+
+def open_vector_store_writer(backend: str, pdf_id: str, embedding_function, chroma_client=None,
+                             compact_dir: str = None, compact_dtype: str = "float16"):
+    """
+    Öffnet einen Writer, der die Chunks einer PDF batchweise im gewählten Backend speichert.
+    Beide Writer haben dieselbe Schnittstelle: add(texts, metadatas, vectors), finish() und abort().
+
+    Args:
+        backend (str): "chroma" (eine ChromaDB-Sammlung pro PDF) oder "compact" (siehe compact_vector_store.py).
+        pdf_id (str): Die eindeutige ID der PDF.
+        embedding_function: Objekt mit embed_documents und embed_query (z. B. SAIAEmbeddings).
+        chroma_client: Der ChromaDB-Client (nur für "chroma").
+        compact_dir (str): Ordner der kompakten Vector Stores (nur für "compact").
+        compact_dtype (str): "float16" oder "int8" (nur für "compact").
+    """
+    if backend == "compact":
+        return CompactVectorStoreWriter(compact_store_path(compact_dir, pdf_id), embedding_function, compact_dtype)
+    return ChromaStoreWriter(chroma_client, embedding_function, pdf_id)
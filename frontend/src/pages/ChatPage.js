@@ -34,9 +34,17 @@ function ChatPage() {
     setMessages(prev => [...prev, userMessage]);
     setIsLoading(true);
 
-    // Send the input message to chat endpoint
+    // Appends a piece of text to the last (bot) message while the answer is streamed
+    const appendToBotMessage = (text) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, text: last.text + text }];
+      });
+    };
+
+    // Send the input message to the streaming chat endpoint, the answer arrives as Server-Sent-Events
     try {
-      const response = await fetch('http://localhost:5000/chat', {
+      const response = await fetch('http://localhost:5000/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -47,13 +55,40 @@ function ChatPage() {
         }),
       });
 
-      const data = await response.json();
+      if (!response.ok) {
+        const data = await response.json();
+        setMessages(prev => [...prev, { text: data.error || "Error while chatting.", sender: 'bot' }]);
+        return;
+      }
 
-      const botResponse = {
-        text: response.ok ? data.answer : data.error || "Error while chatting.",
-        sender: 'bot',
-      };
-      setMessages(prev => [...prev, botResponse]);
+      setMessages(prev => [...prev, { text: '', sender: 'bot' }]); // empty bot message that is filled while streaming
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by an empty line, the last part may be incomplete and stays in the buffer
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const rawEvent of events) {
+          const lines = rawEvent.split('\n');
+          const eventType = lines.find(line => line.startsWith('event: '))?.slice(7) || 'message';
+          const dataLine = lines.find(line => line.startsWith('data: '));
+          const data = dataLine ? JSON.parse(dataLine.slice(6)) : {};
+
+          if (eventType === 'error') {
+            appendToBotMessage(data.error || "Error while chatting.");
+          } else if (data.token) {
+            appendToBotMessage(data.token);
+          }
+        }
+      }
     } catch (error) {
       const botResponse = { text: 'Network error: ' + error.message, sender: 'bot' };
       setMessages(prev => [...prev, botResponse]);
@@ -16,6 +16,26 @@ import cardStyles from '../components/Card.module.css';
 function HomePage() {
   const navigate = useNavigate(); // hook from react-router-dom to navigate to other pages
   const [isUploading, setIsUploading] = useState(false); // State to manage the upload status
+  const [uploadStage, setUploadStage] = useState(null); // Current processing step reported by the backend job
+
+  /* polls the status URL of the background job until the PDF is processed or the job failed */
+  const waitForJob = async (statusUrl) => {
+    while (true) {
+      const response = await fetch(statusUrl);
+      const job = await response.json();
+      if (!response.ok) {
+        throw new Error(job.error || 'Could not load job status.');
+      }
+      if (job.status === 'done') {
+        return job;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Processing failed.');
+      }
+      setUploadStage(job.stage);
+      await new Promise(resolve => setTimeout(resolve, 1000)); // wait one second before asking again
+    }
+  };
   
   /* input of file activates this function and gives the pdf file to the backend at shown URL, then navigates to ChatPage.js  */
   const handleFileChange = async (event) => {
@@ -36,6 +56,9 @@ function HomePage() {
 
         if (response.ok) {
           console.log('Upload erfolgreich:', data);
+          if (data.status_url) {
+            await waitForJob(data.status_url); // the backend processes the PDF in the background (not needed for already known files)
+          }
           navigate('/chat', {
             state: {
               pdfId: data.pdf_id,                   
@@ -52,6 +75,7 @@ function HomePage() {
         alert('Error during upload: ' + error.message);
       } finally {
         setIsUploading(false);
+        setUploadStage(null);
       }
     } else {
       alert('Please select a valid PDF file .');
@@ -82,7 +106,7 @@ function HomePage() {
           />
 
           <label htmlFor="pdf-upload" className={`upload-button ${isUploading ? 'disabled' : ''}`}>
-            {isUploading ? 'Uploading...' : 'Choose File'}
+            {isUploading ? (uploadStage ? `Processing (${uploadStage})...` : 'Uploading...') : 'Choose File'}
           </label>
 
           {/* Spinner for loading animation */}